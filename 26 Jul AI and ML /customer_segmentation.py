@@ -0,0 +1,172 @@
+"""
+Customer segmentation (section 3 of Retail_AI_Project) for customer files of any size.
+
+    full       the notebook's path: read the whole CSV, KMeans(n_clusters=5).fit_predict, write output.csv
+    minibatch  stream the CSV in chunks: sample k-means++ seeds, MiniBatchKMeans.partial_fit over
+               shuffled mini-batches, then assign clusters chunk by chunk and append to output.csv
+
+Memory in minibatch mode depends on the chunk size, not on the number of customers.
+
+    from customer_segmentation import segment_customers
+    segment_customers("Mall_Customers.csv", "output.csv", mode="minibatch")
+
+    python3 customer_segmentation.py                         # minibatch on Mall_Customers.csv -> output.csv
+    python3 customer_segmentation.py --benchmark 10000000    # full vs minibatch: time, peak memory, inertia
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
+
+from peak_rss import peak_rss_mb, reset_peak_rss
+
+FEATURES = ['Annual Income (k$)', 'Spending Score (1-100)']
+
+
+# 1. Chunked reading
+def iter_chunks(path, chunksize=200_000, features_only=False):
+    """(chunk DataFrame, float64 feature matrix) for each chunk of the CSV (only FEATURES parsed if features_only)."""
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=FEATURES if features_only else None):
+        yield chunk, chunk[FEATURES].to_numpy(dtype=np.float64)
+
+
+def sample_rows(path, n_samples=20_000, chunksize=200_000, random_state=42):
+    """
+    Uniform sample of feature rows in one pass (keeps the rows with the smallest random keys),
+    so k-means++ seeds come from the whole file even when it is sorted, e.g. by income.
+    Returns (sample, number of rows in the file).
+    """
+    rng = np.random.default_rng(random_state)
+    keep_x, keep_key, n_rows = np.empty((0, len(FEATURES))), np.empty(0), 0
+    for _, X in iter_chunks(path, chunksize, features_only=True):
+        n_rows += len(X)
+        keep_x = np.vstack([keep_x, X])
+        keep_key = np.concatenate([keep_key, rng.random(len(X))])
+        if len(keep_key) > n_samples:
+            top = np.argpartition(keep_key, n_samples)[:n_samples]
+            keep_x, keep_key = keep_x[top], keep_key[top]
+    return keep_x, n_rows
+
+
+# 2. Fitting
+def fit_full(path, n_clusters=5, random_state=42):
+    """The notebook's path: the whole file in memory, one KMeans fit."""
+    df = pd.read_csv(path)
+    model = KMeans(n_clusters=n_clusters, random_state=random_state)
+    df['Cluster'] = model.fit_predict(df[FEATURES])
+    return model, df
+
+
+def fit_minibatch(path, n_clusters=5, chunksize=200_000, batch_size=4096, n_passes=2, min_steps=100,
+                  random_state=42):
+    """
+    MiniBatchKMeans trained from chunked reads: n_passes over the file (more for small files, so
+    there are at least min_steps mini-batch updates), batches shuffled within each chunk.
+    """
+    rng = np.random.default_rng(random_state)
+    sample, n_rows = sample_rows(path, chunksize=chunksize, random_state=random_state)
+    init, _ = kmeans_plusplus(sample, n_clusters, random_state=random_state)
+    n_passes = max(n_passes, -(-min_steps // max(1, -(-n_rows // batch_size))))
+    model = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1, batch_size=batch_size,
+                            random_state=random_state)
+    for _ in range(n_passes):
+        for _, X in iter_chunks(path, chunksize, features_only=True):
+            order = rng.permutation(len(X))
+            for start in range(0, len(X), batch_size):
+                batch = X[order[start:start + batch_size]]
+                if len(batch) >= n_clusters:
+                    model.partial_fit(batch)
+    return model
+
+
+# 3. Assignment + incremental output
+def assign_clusters(model, path, output_path='output.csv', chunksize=200_000):
+    """Predict each chunk and append it (with a Cluster column) to output_path; returns the total inertia."""
+    centers = model.cluster_centers_
+    center_sq = (centers ** 2).sum(axis=1)
+    inertia, first = 0.0, True
+    for chunk, X in iter_chunks(path, chunksize):
+        # squared distances via ||x||^2 - 2 x.c + ||c||^2, one matrix product per chunk
+        d2 = (X ** 2).sum(axis=1)[:, None] - 2 * X @ centers.T + center_sq
+        labels = d2.argmin(axis=1)
+        inertia += float(np.maximum(d2[np.arange(len(X)), labels], 0).sum())
+        chunk['Cluster'] = labels.astype(np.int32)
+        chunk.to_csv(output_path, mode='w' if first else 'a', header=first, index=False)
+        first = False
+    return inertia
+
+
+def segment_customers(path='Mall_Customers.csv', output_path='output.csv', mode='minibatch',
+                      n_clusters=5, chunksize=200_000, random_state=42, **minibatch_options):
+    """Fit, assign and write output_path; returns {"model", "inertia"}."""
+    if mode == 'full':
+        model, df = fit_full(path, n_clusters, random_state)
+        df.to_csv(output_path, index=False)
+        return {'model': model, 'inertia': float(model.inertia_)}
+    if mode != 'minibatch':
+        raise ValueError(f"mode must be 'full' or 'minibatch', got {mode!r}")
+    model = fit_minibatch(path, n_clusters, chunksize, random_state=random_state, **minibatch_options)
+    return {'model': model, 'inertia': assign_clusters(model, path, output_path, chunksize)}
+
+
+# 4. Benchmark
+def make_customers(path, n_rows, source='Mall_Customers.csv', chunksize=1_000_000, seed=0):
+    """A bigger customer file: rows resampled from `source` with a little jitter, written in chunks."""
+    base = pd.read_csv(source)
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, chunksize):
+        n = min(chunksize, n_rows - start)
+        chunk = base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+        chunk['CustomerID'] = np.arange(start + 1, start + n + 1)
+        for col in FEATURES:
+            chunk[col] = np.clip(chunk[col] + rng.integers(-3, 4, n), 1, None)
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+def _timed_run(mode, path, output_path, results):
+    reset_peak_rss()
+    start = time.perf_counter()
+    inertia = segment_customers(path, output_path, mode=mode)['inertia']
+    results.put({'mode': mode, 'seconds': time.perf_counter() - start, 'inertia': inertia,
+                 'peak_rss_mb': peak_rss_mb()})
+
+
+def benchmark(n_rows, source='Mall_Customers.csv', work_dir=None):
+    """Full vs minibatch on an n_rows file, each in a fresh process so peak RSS is its own."""
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        path = make_customers(os.path.join(tmp, 'customers.csv'), n_rows, source)
+        rows = []
+        for mode in ('full', 'minibatch'):
+            results = ctx.Queue()
+            process = ctx.Process(target=_timed_run, args=(mode, path, os.path.join(tmp, f'{mode}.csv'), results))
+            process.start()
+            rows.append(results.get())
+            process.join()
+    df = pd.DataFrame(rows).set_index('mode')
+    df['inertia_vs_full'] = df['inertia'] / df.loc['full', 'inertia']
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Customer segmentation with full or streaming mini-batch k-means')
+    parser.add_argument('--input', default='Mall_Customers.csv')
+    parser.add_argument('--output', default='output.csv')
+    parser.add_argument('--mode', choices=['minibatch', 'full'], default='minibatch')
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    parser.add_argument('--benchmark', type=int, default=None, metavar='ROWS',
+                        help='compare full vs minibatch on a synthetic file with this many customers')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(benchmark(args.benchmark, source=args.input).to_string(float_format='{:,.3f}'.format))
+    else:
+        result = segment_customers(args.input, args.output, mode=args.mode, chunksize=args.chunksize)
+        print(f"{args.mode}: inertia {result['inertia']:,.1f} -> {args.output}")
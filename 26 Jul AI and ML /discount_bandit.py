@@ -0,0 +1,145 @@
+"""
+Discount-offer optimisation (section 5 of Retail_AI_Project) as a batched simulator.
+
+The notebook learns one epsilon-greedy agent over the discount arms, one episode at a time.
+Here thousands of independent agents, each with its own learning rate, epsilon and
+discount/profit table, step together as NumPy array operations, with their exploration
+draws, random arms and reward noise drawn up front in blocks.
+
+    from discount_bandit import run_agents, sweep
+    result = run_agents(PROFITS, lr=0.1, epsilon=0.2, n_agents=10_000, n_episodes=1000)
+
+    python3 discount_bandit.py          # notebook settings, a small sweep, and episodes/s vs the loop
+"""
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+DISCOUNT = [0, 5, 10, 20]
+PROFITS = [100, 90, 80, 60]
+NOISE = (-10, 10)   # np.random.randint(-10, 10): uniform integers -10..9
+
+
+# 1. The notebook's loop (reference for the benchmark)
+def run_loop(discount=DISCOUNT, profits=PROFITS, lr=0.1, epsilon=0.2, n_episodes=1000):
+    """One agent, one episode per Python iteration, as in the notebook (torch if installed, else NumPy)."""
+    try:
+        import torch
+        q_values = torch.zeros(len(discount))
+        greedy = lambda: torch.argmax(q_values).item()
+    except ImportError:
+        q_values = np.zeros(len(discount))
+        greedy = lambda: int(np.argmax(q_values))
+    for _ in range(n_episodes):
+        action = greedy() if np.random.rand() > epsilon else np.random.randint(0, len(discount))
+        reward = profits[action] + np.random.randint(*NOISE)
+        q_values[action] = q_values[action] + lr * (reward - q_values[action])
+    return discount[greedy()]
+
+
+# 2. Batched agents
+def run_agents(profits, lr=0.1, epsilon=0.2, n_agents=None, n_episodes=1000, gamma=0.0,
+               noise=NOISE, seed=0, block=256):
+    """
+    Simulate many independent agents at once.
+
+    profits: (K,) shared arm profits, or (A, K), one profit table per agent.
+    lr, epsilon, gamma: scalars or (A,) per-agent values.
+    gamma=0 is the notebook's bandit update q += lr * (r - q); gamma > 0 bootstraps from the
+    agent's best arm, q += lr * (r + gamma * max(q) - q).
+    Random numbers are drawn `block` episodes at a time as (block, A) arrays.
+
+    Returns {"q": (A, K), "counts": (A, K) pulls per arm, "total_reward": (A,), "best_arm": (A,)}.
+    """
+    profits = np.asarray(profits, dtype=np.float64)
+    if n_agents is None:
+        n_agents = profits.shape[0] if profits.ndim == 2 else 1
+    profits = np.broadcast_to(profits, (n_agents, profits.shape[-1]))
+    n_arms = profits.shape[1]
+    lr, epsilon, gamma = (np.broadcast_to(np.asarray(v, dtype=np.float64), (n_agents,)) for v in (lr, epsilon, gamma))
+    bootstrap = bool(np.any(gamma))
+
+    rng = np.random.default_rng(seed)
+    q = np.zeros((n_agents, n_arms))
+    counts = np.zeros((n_agents, n_arms), dtype=np.int64)
+    total_reward = np.zeros(n_agents)
+    agents = np.arange(n_agents)
+
+    for start in range(0, n_episodes, block):
+        steps = min(block, n_episodes - start)
+        explore = rng.random((steps, n_agents)) <= epsilon
+        random_arm = rng.integers(0, n_arms, (steps, n_agents))
+        reward_noise = rng.integers(noise[0], noise[1], (steps, n_agents))
+        for t in range(steps):
+            action = np.where(explore[t], random_arm[t], q.argmax(axis=1))
+            reward = profits[agents, action] + reward_noise[t]
+            target = reward + gamma * q.max(axis=1) if bootstrap else reward
+            q[agents, action] += lr * (target - q[agents, action])
+            counts[agents, action] += 1
+            total_reward += reward
+    return {'q': q, 'counts': counts, 'total_reward': total_reward, 'best_arm': q.argmax(axis=1)}
+
+
+def sweep(profit_tables, lrs, epsilons, gammas=(0.0,), agents_per_config=1000, n_episodes=1000, seed=0):
+    """
+    Every (table, lr, epsilon, gamma) combination with agents_per_config agents each, all
+    simulated in one run_agents call. Returns one row per configuration: how often the
+    agents settle on the truly best arm, and their mean reward per episode.
+    """
+    configs = list(itertools.product(range(len(profit_tables)), lrs, epsilons, gammas))
+    tables = np.asarray(profit_tables, dtype=np.float64)
+    per_agent = np.repeat(np.array([[c[1], c[2], c[3]] for c in configs]), agents_per_config, axis=0)
+    table_idx = np.repeat([c[0] for c in configs], agents_per_config)
+
+    result = run_agents(tables[table_idx], lr=per_agent[:, 0], epsilon=per_agent[:, 1], gamma=per_agent[:, 2],
+                        n_episodes=n_episodes, seed=seed)
+    correct = result['best_arm'] == tables[table_idx].argmax(axis=1)
+    mean_reward = result['total_reward'] / n_episodes
+
+    rows = []
+    for i, (table, lr, epsilon, gamma) in enumerate(configs):
+        group = slice(i * agents_per_config, (i + 1) * agents_per_config)
+        rows.append({'table': table, 'lr': lr, 'epsilon': epsilon, 'gamma': gamma,
+                     'p_best_arm': correct[group].mean(), 'mean_reward': mean_reward[group].mean()})
+    return pd.DataFrame(rows)
+
+
+# 3. Benchmark
+def benchmark(n_episodes=1000, n_agents=10_000, loop_runs=20):
+    """Agent-episodes per second: the notebook loop vs run_agents."""
+    start = time.perf_counter()
+    for _ in range(loop_runs):
+        run_loop(n_episodes=n_episodes)
+    loop_rate = loop_runs * n_episodes / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    run_agents(PROFITS, lr=0.1, epsilon=0.2, n_agents=n_agents, n_episodes=n_episodes)
+    batched_rate = n_agents * n_episodes / (time.perf_counter() - start)
+    return {'loop_episodes_per_s': loop_rate, 'batched_episodes_per_s': batched_rate, 'speedup': batched_rate / loop_rate}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batched epsilon-greedy discount bandit')
+    parser.add_argument('--agents', type=int, default=10_000)
+    parser.add_argument('--episodes', type=int, default=1000)
+    args = parser.parse_args()
+
+    result = run_agents(PROFITS, lr=0.1, epsilon=0.2, n_agents=args.agents, n_episodes=args.episodes)
+    votes = np.bincount(result['best_arm'], minlength=len(DISCOUNT)) / args.agents
+    shares = ', '.join(f'{d}%: {v:.3f}' for d, v in zip(DISCOUNT, votes))
+    print('Best Discount: ', DISCOUNT[int(votes.argmax())], f'(share of agents per discount: {shares})')
+
+    # a second table where the biggest discount sells enough extra volume to be the most profitable
+    tables = [PROFITS, [70, 80, 85, 95]]
+    table = sweep(tables, lrs=[0.01, 0.1, 0.5], epsilons=[0.05, 0.2, 0.5], agents_per_config=500,
+                  n_episodes=args.episodes)
+    print(table.to_string(index=False, float_format='{:.3f}'.format))
+
+    bench = benchmark(args.episodes, args.agents)
+    print(f"\nNotebook loop: {bench['loop_episodes_per_s']:,.0f} episodes/s | "
+          f"batched ({args.agents:,} agents): {bench['batched_episodes_per_s']:,.0f} episodes/s "
+          f"({bench['speedup']:,.0f}x)")
@@ -0,0 +1,74 @@
+"""
+Tests for customer_segmentation.py on Mall_Customers.csv and a small resampled file.
+
+Run:
+    python3 -m pytest test_customer_segmentation.py
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import customer_segmentation as cs
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Mall_Customers.csv')
+
+
+@pytest.fixture(scope='module')
+def customers(tmp_path_factory):
+    return cs.make_customers(str(tmp_path_factory.mktemp('customers') / 'customers.csv'), 5000,
+                             source=SOURCE, chunksize=1500)
+
+
+def test_make_customers_writes_every_chunk(customers):
+    df = pd.read_csv(customers)
+    assert df['CustomerID'].tolist() == list(range(1, 5001))
+    assert (df[cs.FEATURES] >= 1).all().all()
+
+
+def test_minibatch_assigns_every_row_in_order(customers, tmp_path):
+    output = tmp_path / 'output.csv'
+    result = cs.segment_customers(customers, str(output), mode='minibatch', chunksize=700)
+
+    source, out = pd.read_csv(customers), pd.read_csv(output)
+    assert out.drop(columns='Cluster').equals(source)
+    assert set(out['Cluster']) == set(range(5))
+
+    # inertia is reported for the written assignment, and is near a full KMeans fit
+    centers = result['model'].cluster_centers_
+    X = source[cs.FEATURES].to_numpy(dtype=np.float64)
+    assert result['inertia'] == pytest.approx(((X - centers[out['Cluster']]) ** 2).sum())
+    full = cs.segment_customers(customers, str(tmp_path / 'full.csv'), mode='full')
+    assert result['inertia'] < 1.1 * full['inertia']
+
+
+@pytest.mark.parametrize('mode', ['full', 'minibatch'])
+def test_mall_customers_reproduce_the_notebook_output(mode, tmp_path):
+    # output.csv is the notebook's KMeans(n_clusters=5) result, written with index=False
+    output = tmp_path / 'output.csv'
+    cs.segment_customers(SOURCE, str(output), mode=mode)
+
+    notebook = pd.read_csv(os.path.join(os.path.dirname(SOURCE), 'output.csv'))
+    out = pd.read_csv(output)
+    assert list(out.columns) == list(notebook.columns)
+    assert out.drop(columns='Cluster').equals(notebook.drop(columns='Cluster'))
+    # same partition, whatever the cluster numbering
+    pairs = pd.crosstab(out['Cluster'], notebook['Cluster'])
+    assert ((pairs > 0).sum(axis=1) == 1).all() and ((pairs > 0).sum(axis=0) == 1).all()
+
+
+def test_sample_rows_counts_and_caps(customers):
+    sample, n_rows = cs.sample_rows(customers, n_samples=300, chunksize=700)
+    assert n_rows == 5000 and sample.shape == (300, len(cs.FEATURES))
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match='mode must be'):
+        cs.segment_customers(SOURCE, mode='spectral')
+
+
+def test_peak_rss_is_measured():
+    cs.reset_peak_rss()
+    assert cs.peak_rss_mb() > 0
@@ -0,0 +1,47 @@
+"""
+Tests for discount_bandit.py's batched simulator.
+
+Run:
+    python3 -m pytest test_discount_bandit.py
+"""
+
+import numpy as np
+
+import discount_bandit as db
+
+
+def test_run_agents_counts_and_best_arm():
+    result = db.run_agents(db.PROFITS, lr=0.1, epsilon=0.2, n_agents=500, n_episodes=1000, seed=1)
+
+    assert result['q'].shape == result['counts'].shape == (500, len(db.PROFITS))
+    assert (result['counts'].sum(axis=1) == 1000).all()
+    assert np.bincount(result['best_arm']).argmax() == 0     # 0% discount, the notebook's answer
+    assert (result['total_reward'] / 1000 <= max(db.PROFITS) + db.NOISE[1]).all()
+
+
+def test_run_agents_is_seeded():
+    a = db.run_agents(db.PROFITS, n_agents=50, n_episodes=100, seed=3)
+    b = db.run_agents(db.PROFITS, n_agents=50, n_episodes=100, seed=3)
+    assert all(np.array_equal(a[key], b[key]) for key in a)
+
+
+def test_per_agent_tables_and_parameters():
+    tables = np.array([db.PROFITS, [70, 80, 85, 95]] * 100, dtype=float)
+    epsilon = np.where(np.arange(200) < 100, 0.5, 1.0)   # fully random agents pull every arm
+    result = db.run_agents(tables, lr=0.1, epsilon=epsilon, n_episodes=1000, seed=0)
+
+    assert result['q'].shape == (200, 4)
+    learners = np.arange(200) < 100
+    for table, best in ((0, 0), (1, 3)):
+        agents = learners & (np.arange(200) % 2 == table)
+        assert np.bincount(result['best_arm'][agents]).argmax() == best
+    assert (result['counts'][~learners] > 150).all()
+
+
+def test_sweep_one_row_per_configuration():
+    df = db.sweep([db.PROFITS, [70, 80, 85, 95]], lrs=[0.1, 0.5], epsilons=[0.1, 0.3],
+                  agents_per_config=100, n_episodes=200)
+    assert len(df) == 8
+    assert list(df.columns) == ['table', 'lr', 'epsilon', 'gamma', 'p_best_arm', 'mean_reward']
+    assert df['p_best_arm'].between(0, 1).all()
+    assert df['mean_reward'].between(60 + db.NOISE[0], 100 + db.NOISE[1]).all()
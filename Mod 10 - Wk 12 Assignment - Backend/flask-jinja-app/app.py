@@ -1,5 +1,13 @@
-from flask import Flask, render_template, request, session
+from flask import Flask, render_template, request, session, g, stream_template, url_for, jsonify, Response
+import functools
+import hashlib
+import json
+import os
+import queue
 import sqlite3  # Q4a: Required for SQLite integration
+import threading
+import time
+from collections import OrderedDict
 
 app = Flask(__name__)
 
@@ -9,13 +17,157 @@ app = Flask(__name__)
 app.secret_key = 'flaskSecret123'  # Required for session management
 
 # ==========================================
-# Q4a: SQLite database connection helper
+# Q4a: SQLite database connection helper (pooled, WAL mode)
 # ==========================================
-def get_db_connection():
-    conn = sqlite3.connect('books.db')  # Make sure books.db exists
+app.config['DATABASE'] = os.environ.get('BOOKS_DB', 'books.db')  # Make sure books.db exists
+app.config['DB_POOL_SIZE'] = int(os.environ.get('BOOKS_DB_POOL_SIZE', 8))
+
+# Idle connections are kept here and handed to the next request instead of
+# reconnecting each time (the dev server starts a new thread per request, so a
+# shared pool gets more reuse than one connection per thread).
+_db_pool = queue.LifoQueue()
+_schema_ready = False
+_schema_lock = threading.Lock()   # the first requests may arrive on several threads at once
+
+
+def _open_db_connection():
+    conn = sqlite3.connect(
+        app.config['DATABASE'],
+        check_same_thread=False,  # pooled: a connection moves between request threads
+        cached_statements=256,    # prepared statements are reused per connection
+    )
     conn.row_factory = sqlite3.Row     # Access columns by name
+    # WAL: readers don't block behind a writer, commits append to the log instead of
+    # rewriting a rollback journal; NORMAL sync is safe in WAL mode (fsync at checkpoints)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA cache_size = -16000')   # 16 MB page cache per connection
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA busy_timeout = 5000')   # wait for a concurrent writer instead of "database is locked"
+    global _schema_ready
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                init_schema(conn)  # older books.db files get the indexes / search table on first use
+                _schema_ready = True
     return conn
 
+
+def get_db_connection():
+    """The request's connection: taken from the pool on first use, returned at teardown."""
+    if 'db' not in g:
+        try:
+            g.db = _db_pool.get_nowait()
+        except queue.Empty:
+            g.db = _open_db_connection()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    conn = g.pop('db', None)
+    if conn is None:
+        return
+    if conn.in_transaction:
+        conn.rollback()  # a route failed before its commit
+    if _db_pool.qsize() < app.config['DB_POOL_SIZE']:
+        _db_pool.put(conn)
+    else:
+        conn.close()
+
+# ==========================================
+# Rendered-page cache + conditional GET (ETag / Last-Modified)
+# ==========================================
+# Triggers on "books" bump a version row in the database on every write (see init_schema),
+# so all worker processes, restarts and writers outside this app agree on it. Cached pages
+# are stored with the version they were rendered at and only reused while it is still
+# current, and the ETag is derived from it, so a matching If-None-Match gets a 304 after
+# one single-row read and no Jinja. The row's random token changes if books.db is
+# recreated; pages that do not read books are versioned by a per-process token, so a
+# restart with changed templates never answers 304 for the old page.
+app.config['PAGE_CACHE_SIZE'] = int(os.environ.get('BOOKS_PAGE_CACHE_SIZE', 256))
+
+_cache_lock = threading.Lock()
+_page_cache = OrderedDict()   # full path -> (version, body, mimetype)
+_process_token = os.urandom(8).hex()
+_started_at = time.time()
+cache_stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+
+def books_version(conn):
+    """('token:version', last modified unix time) of the books table, as kept by the triggers."""
+    token, version, modified_at = conn.execute(
+        'SELECT token, version, modified_at FROM books_version WHERE id = 1').fetchone()
+    return f'{token}:{version}', modified_at
+
+
+def cached_page(depends_on_books=True):
+    """Serve the route from the page cache with ETag/Last-Modified validators."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.full_path
+            # read before rendering, so the cached page is at least as new as its version
+            if depends_on_books:
+                version, last_modified = books_version(get_db_connection())
+            else:
+                version, last_modified = _process_token, _started_at
+            etag = hashlib.md5(f'{version}:{key}'.encode()).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                with _cache_lock:
+                    cache_stats['not_modified'] += 1
+                response = Response(status=304)
+            else:
+                with _cache_lock:
+                    entry = _page_cache.get(key)
+                    if entry is not None and entry[0] == version:
+                        _page_cache.move_to_end(key)
+                        cache_stats['hits'] += 1
+                    else:
+                        entry = None
+                        cache_stats['misses'] += 1
+                if entry is not None:
+                    response = Response(entry[1], mimetype=entry[2])
+                else:
+                    response = app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if not response.is_streamed:  # streamed pages still get validators, not a cache slot
+                        with _cache_lock:
+                            _page_cache[key] = (version, response.get_data(), response.mimetype)
+                            _page_cache.move_to_end(key)
+                            while len(_page_cache) > app.config['PAGE_CACHE_SIZE']:
+                                _page_cache.popitem(last=False)
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True  # clients revalidate, and get a 304 when unchanged
+            return response
+        return wrapper
+    return decorator
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text format: page-cache counters and the current books version."""
+    version = books_version(get_db_connection())[0].split(':')[1]
+    with _cache_lock:
+        lines = [
+            f'books_page_cache_hits_total {cache_stats["hits"]}',
+            f'books_page_cache_misses_total {cache_stats["misses"]}',
+            f'books_page_not_modified_total {cache_stats["not_modified"]}',
+            f'books_page_cache_entries {len(_page_cache)}',
+            f'books_write_version {version}',
+        ]
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain')
+
+# Lock timeouts and other SQLite errors come back as 503 with the reason, so clients
+# (and loadtest.py) can tell "database is locked" apart from other failures
+@app.errorhandler(sqlite3.OperationalError)
+def database_error(e):
+    return f'❌ Database error: {e}', 503
+
 # ==========================================
 # ✅ DEBUG: Simple route to confirm Flask server is running
 # ==========================================
@@ -24,11 +176,9 @@ def test():
     return '✅ Flask is working!'
 
 # ==========================================
-# Q4a: One-time route to create "books" table
+# Q4a: Schema: "books" table, sort indexes, full-text search
 # ==========================================
-@app.route('/init-db')
-def init_db():
-    conn = get_db_connection()
+def init_schema(conn):
     conn.execute('''
         CREATE TABLE IF NOT EXISTS books (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,14 +186,69 @@ def init_db():
             author TEXT NOT NULL
         )
     ''')
+    # (column, id) indexes let the sorted listings seek straight to a page
+    conn.execute('CREATE INDEX IF NOT EXISTS books_title_id ON books (title, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS books_author_id ON books (author, id)')
+
+    # FTS5 index over title + author; it reads the text from "books" and the
+    # triggers keep it in step with every insert / update / delete
+    fts_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'").fetchone()
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts
+        USING fts5(title, author, content='books', content_rowid='id')
+    ''')
+    conn.executescript('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END;
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        END;
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END;
+    ''')
+
+    # one row counting writes to "books", for page-cache versions / ETags (the token is
+    # random per database file, so a recreated books.db never reuses old ETags)
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS books_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            token TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            modified_at REAL NOT NULL
+        );
+        INSERT OR IGNORE INTO books_version (id, token, version, modified_at)
+            VALUES (1, lower(hex(randomblob(8))), 0, (julianday('now') - 2440587.5) * 86400.0);
+        CREATE TRIGGER IF NOT EXISTS books_version_insert AFTER INSERT ON books BEGIN
+            UPDATE books_version SET version = version + 1, modified_at = (julianday('now') - 2440587.5) * 86400.0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS books_version_delete AFTER DELETE ON books BEGIN
+            UPDATE books_version SET version = version + 1, modified_at = (julianday('now') - 2440587.5) * 86400.0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS books_version_update AFTER UPDATE ON books BEGIN
+            UPDATE books_version SET version = version + 1, modified_at = (julianday('now') - 2440587.5) * 86400.0;
+        END;
+    ''')
+    if not fts_exists:
+        conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")  # index the existing rows
     conn.commit()
-    conn.close()
+
+# ==========================================
+# Q4a: One-time route to create "books" table
+# ==========================================
+@app.route('/init-db')
+def init_db():
+    init_schema(get_db_connection())
     return '✅ Table "books" created (if not already).'
 
 # ==========================================
 # Home route (Q3c: includes static CSS + image in template)
 # ==========================================
 @app.route('/')
+@cached_page(depends_on_books=False)
 def home():
     return render_template('index.html')
 
@@ -51,6 +256,7 @@ def home():
 # Dynamic route example
 # ==========================================
 @app.route('/hello/<name>')
+@cached_page(depends_on_books=False)
 def hello(name):
     return render_template('hello.html', username=name)
 
@@ -95,7 +301,6 @@ def flask_add_book():
     conn = get_db_connection()
     conn.execute('INSERT INTO books (title, author) VALUES (?, ?)', (title, author))
     conn.commit()
-    conn.close()
     return '✅ Book added!'
 
 # ✅ Optional: Prevent "URL not found" if GET is used accidentally
@@ -103,13 +308,71 @@ def flask_add_book():
 def flask_add_book_debug():
     return '👋 This route expects a POST request (e.g. from Postman or HTML form).'
 
-# ✅ Read: Show all books
+# ✅ Read: Show books one page at a time
+# Keyset pagination: each page starts after the last (sort value, id) of the previous
+# one, so any page is an index seek + LIMIT rows, however many books there are.
+BOOKS_PAGE_SIZE = 50
+BOOKS_MAX_PAGE_SIZE = 1000
+BOOKS_STREAM_THRESHOLD = 200   # pages bigger than this are streamed as they render
+BOOKS_SORT_COLUMNS = ('id', 'title', 'author')
+
+
+def render_books(**context):
+    if len(context['books']) > BOOKS_STREAM_THRESHOLD:
+        return stream_template('books.html', **context)
+    return render_template('books.html', **context)
+
+
 @app.route('/flask/books')
+@cached_page()
 def flask_get_books():
+    sort = request.args.get('sort', 'id')
+    if sort not in BOOKS_SORT_COLUMNS:
+        return f'❌ sort must be one of {", ".join(BOOKS_SORT_COLUMNS)}', 400
+    limit = min(max(request.args.get('limit', BOOKS_PAGE_SIZE, type=int), 1), BOOKS_MAX_PAGE_SIZE)
+    after = request.args.get('after', type=int)
+    after_key = request.args.get('after_key')
+
+    conn = get_db_connection()
+    if after is None:
+        where, params = '', ()
+    elif sort == 'id':
+        where, params = 'WHERE id > ?', (after,)
+    elif after_key is None:
+        return '❌ after_key is required when paging a title/author listing', 400
+    else:
+        where, params = f'WHERE ({sort}, id) > (?, ?)', (after_key, after)
+    order = 'id' if sort == 'id' else f'{sort}, id'
+    rows = conn.execute(f'SELECT id, title, author FROM books {where} ORDER BY {order} LIMIT ?',
+                        params + (limit + 1,)).fetchall()
+
+    books, next_url = rows[:limit], None
+    if len(rows) > limit:
+        last = books[-1]
+        next_url = url_for('flask_get_books', sort=sort, limit=limit, after=last['id'],
+                           after_key=None if sort == 'id' else last[sort])
+    return render_books(books=books, next_url=next_url)
+
+# ✅ Search: full-text match on title and author (best matches first)
+@app.route('/flask/books/search')
+@cached_page()
+def flask_search_books():
+    q = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', BOOKS_PAGE_SIZE, type=int), 1), BOOKS_MAX_PAGE_SIZE)
+    if not q:
+        return render_books(books=[], heading='Search: enter ?q=words')
+    # every word must match, as a prefix ("harr pot" finds "Harry Potter"); quoting
+    # each word keeps FTS5 query syntax in user input from raising errors
+    match = ' '.join('"' + word.replace('"', '""') + '"*' for word in q.split())
     conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books').fetchall()
-    conn.close()
-    return render_template('books.html', books=books)
+    books = conn.execute('''
+        SELECT books.id, books.title, books.author
+        FROM books_fts JOIN books ON books.id = books_fts.rowid
+        WHERE books_fts MATCH ?
+        ORDER BY books_fts.rank
+        LIMIT ?
+    ''', (match, limit)).fetchall()
+    return render_books(books=books, heading=f'Search results for "{q}"')
 
 # ✅ Update: Modify a book
 @app.route('/flask/books/update/<int:id>', methods=['POST'])
@@ -119,7 +382,6 @@ def flask_update_book(id):
     conn = get_db_connection()
     conn.execute('UPDATE books SET title = ?, author = ? WHERE id = ?', (title, author, id))
     conn.commit()
-    conn.close()
     return f'✅ Book {id} updated!'
 
 # ✅ Delete: Remove a book
@@ -128,9 +390,129 @@ def flask_delete_book(id):
     conn = get_db_connection()
     conn.execute('DELETE FROM books WHERE id = ?', (id,))
     conn.commit()
-    conn.close()
     return f'🗑️ Book {id} deleted!'
 
+# ==========================================
+# Bulk create / update / delete (one transaction per request)
+# ==========================================
+# Body: a JSON array, or NDJSON (Content-Type: application/x-ndjson, one op per line,
+# read line by line so huge uploads are never held in memory as one document):
+#   {"op": "add", "title": ..., "author": ...}
+#   {"op": "update", "id": ..., "title": ..., "author": ...}
+#   {"op": "delete", "id": ...}
+# Consecutive ops of the same kind are applied with one executemany(), and the whole
+# batch commits once. Invalid items are reported and skipped; a database error rolls
+# back everything.
+BATCH_CHUNK_SIZE = 1000
+BATCH_SQL = {
+    'add': 'INSERT INTO books (title, author) VALUES (?, ?)',
+    'update': 'UPDATE books SET title = ?, author = ? WHERE id = ?',
+    'delete': 'DELETE FROM books WHERE id = ?',
+}
+
+
+def _ndjson_items(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e  # reported as that item's error
+
+
+def _parse_batch_item(item):
+    """(op, params) for executemany, or ValueError with the reason."""
+    if isinstance(item, ValueError):
+        raise ValueError(f'invalid JSON: {item}')
+    if not isinstance(item, dict) or item.get('op') not in BATCH_SQL:
+        raise ValueError('expected an object with "op": add, update or delete')
+    op = item['op']
+    if op != 'delete' and not (isinstance(item.get('title'), str) and isinstance(item.get('author'), str)):
+        raise ValueError(f'{op} needs "title" and "author" strings')
+    if op != 'add' and not (isinstance(item.get('id'), int) and not isinstance(item.get('id'), bool)):
+        raise ValueError(f'{op} needs an integer "id"')
+    if op == 'add':
+        return op, (item['title'], item['author'])
+    if op == 'update':
+        return op, (item['title'], item['author'], item['id'])
+    return op, (item['id'],)
+
+
+def _apply_batch_run(conn, op, run, results):
+    """Apply consecutive same-op items [(index, params), ...] and record each one's result."""
+    if op == 'add':
+        conn.executemany(BATCH_SQL[op], [params for _, params in run])
+        # the write lock is held, so this run's AUTOINCREMENT ids are consecutive
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        first_id = last_id - len(run) + 1
+        results.extend({'index': i, 'op': op, 'status': 'added', 'id': first_id + n} for n, (i, _) in enumerate(run))
+        return
+
+    ids = sorted({params[-1] for _, params in run})
+    existing = set()
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ', '.join('?' * len(chunk))
+        existing.update(r[0] for r in conn.execute(f'SELECT id FROM books WHERE id IN ({placeholders})', chunk))
+
+    applied = []
+    for i, params in run:
+        book_id = params[-1]
+        if book_id in existing:
+            applied.append(params)
+            results.append({'index': i, 'op': op, 'status': 'updated' if op == 'update' else 'deleted', 'id': book_id})
+            if op == 'delete':
+                existing.discard(book_id)  # a repeated delete of the same id is not_found
+        else:
+            results.append({'index': i, 'op': op, 'status': 'not_found', 'id': book_id})
+    conn.executemany(BATCH_SQL[op], applied)
+
+
+@app.route('/flask/books/batch', methods=['POST'])
+def flask_batch_books():
+    ndjson = request.mimetype == 'application/x-ndjson'
+    if ndjson:
+        items = _ndjson_items(request.stream)
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            return jsonify({'error': 'expected a JSON array of operations (or an application/x-ndjson body)'}), 400
+
+    conn = get_db_connection()
+    results = []
+    try:
+        conn.execute('BEGIN IMMEDIATE')  # take the write lock once for the whole batch
+        run_op, run = None, []
+        for index, item in enumerate(items):
+            try:
+                op, params = _parse_batch_item(item)
+            except ValueError as e:
+                results.append({'index': index, 'status': 'error', 'error': str(e)})
+                continue
+            if run and (op != run_op or len(run) >= BATCH_CHUNK_SIZE):
+                _apply_batch_run(conn, run_op, run, results)
+                run = []
+            run_op = op
+            run.append((index, params))
+        if run:
+            _apply_batch_run(conn, run_op, run, results)
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        return jsonify({'error': f'batch rolled back: {e}'}), 503
+
+    results.sort(key=lambda r: r['index'])
+    counts = {}
+    for r in results:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    if ndjson:
+        # one line at a time, never the whole body as one string (the results are needed
+        # up front anyway, for the counts header)
+        lines = (json.dumps(r) + '\n' for r in results)
+        return Response(lines, mimetype='application/x-ndjson', headers={'X-Batch-Counts': json.dumps(counts)})
+    return jsonify({'counts': counts, 'results': results})
+
 # ==========================================
 # Start the server
 # ==========================================
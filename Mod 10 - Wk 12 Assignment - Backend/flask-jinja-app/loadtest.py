@@ -0,0 +1,234 @@
+"""
+Load test for app.py: seeds a throwaway books.db, serves the app under waitress in a
+separate process (Werkzeug's threaded server if waitress is missing), then drives a
+read / insert / update / delete mix at increasing concurrency and reports throughput,
+latency percentiles and errors (counting "database is locked" separately) as JSON.
+
+Run:
+    pip install waitress
+    python3 loadtest.py                                   # 1,2,4,8,16 clients x 10 s each
+    python3 loadtest.py --mix read=95,insert=5 --levels 1,8,32 --duration 5 --out before.json
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
+import warnings
+
+DEFAULT_MIX = 'read=80,insert=10,update=7,delete=3'
+OPERATIONS = ('read', 'insert', 'update', 'delete')
+
+
+# ==========================================
+# Seed database + server process
+# ==========================================
+def seed_database(path, n_books, seed=0):
+    """A books table with n_books rows (the app adds its indexes / search table on first use)."""
+    rng = random.Random(seed)
+    words = ['river', 'night', 'garden', 'empire', 'glass', 'winter', 'stone', 'letters', 'silent', 'road']
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO books (title, author) VALUES (?, ?)',
+        ((' '.join(rng.choices(words, k=3)).title(), f'Author {rng.randrange(1000)}') for _ in range(n_books)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def server_name():
+    return 'waitress' if importlib.util.find_spec('waitress') else 'werkzeug'
+
+
+def _serve(db_path, host, port, threads):
+    os.environ['BOOKS_DB'] = db_path  # read by app.py at import
+    from app import app
+    if server_name() == 'waitress':
+        import waitress
+        logging.getLogger('waitress.queue').setLevel(logging.ERROR)  # "Task queue depth" is expected under load
+        waitress.serve(app, host=host, port=port, threads=threads, _quiet=True)
+    else:
+        from werkzeug.serving import make_server
+        make_server(host, port, app, threaded=True).serve_forever()
+
+
+def start_server(db_path, host, port, threads):
+    if server_name() != 'waitress':
+        warnings.warn('waitress is not installed; falling back to the Werkzeug development server '
+                      '(numbers are not representative of production)')
+    process = multiprocessing.get_context('spawn').Process(
+        target=_serve, args=(db_path, host, port, threads), daemon=True)
+    process.start()
+    deadline = time.time() + 60   # the first request also builds the indexes / search table
+    while time.time() < deadline and process.is_alive():
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        try:
+            conn.request('GET', '/flask/books?limit=1')
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            pass   # not listening yet
+        finally:
+            conn.close()
+        time.sleep(0.2)   # after a refused connection and after an error status alike
+    process.terminate()
+    raise RuntimeError(f'server did not come up on {host}:{port}')
+
+
+# ==========================================
+# Load generator
+# ==========================================
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        op, _, weight = part.partition('=')
+        if op.strip() not in OPERATIONS:
+            raise ValueError(f'unknown operation {op!r} (use {", ".join(OPERATIONS)})')
+        mix[op.strip()] = float(weight)
+    return mix
+
+
+def _request_for(op, rng, n_books):
+    """(method, path, form body) for one operation against ids 1..n_books."""
+    book_id = rng.randint(1, n_books)
+    if op == 'read':
+        return 'GET', f'/flask/books?after={book_id}&limit=20', None
+    if op == 'insert':
+        return 'POST', '/flask/books/add', {'title': f'Load {rng.random():.6f}', 'author': 'Load Tester'}
+    if op == 'update':
+        return 'POST', f'/flask/books/update/{book_id}', {'title': f'Updated {rng.random():.6f}', 'author': 'Load Tester'}
+    return 'POST', f'/flask/books/delete/{book_id}', None
+
+
+def _client(host, port, mix, n_books, stop_at, seed, samples):
+    """One keep-alive connection issuing requests until stop_at; appends (op, ms, outcome)."""
+    rng = random.Random(seed)
+    ops, weights = list(mix), list(mix.values())
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    local = []
+    while time.perf_counter() < stop_at:
+        op = rng.choices(ops, weights)[0]
+        method, path, form = _request_for(op, rng, n_books)
+        body = urllib.parse.urlencode(form) if form is not None else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form is not None else {}
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            if response.status < 400:
+                outcome = 'ok'
+            elif b'database is locked' in data:
+                outcome = 'database_locked'
+            else:
+                outcome = f'http_{response.status}'
+        except (OSError, http.client.HTTPException):
+            outcome = 'connection_error'
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+        local.append((op, (time.perf_counter() - started) * 1000, outcome))
+    conn.close()
+    samples.extend(local)
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))]
+
+
+def _latency_summary(values):
+    values = sorted(values)
+    return {'count': len(values), 'p50': _percentile(values, 50), 'p90': _percentile(values, 90),
+            'p99': _percentile(values, 99), 'max': values[-1] if values else None}
+
+
+def run_level(host, port, mix, n_books, concurrency, duration, seed):
+    samples = []
+    stop_at = time.perf_counter() + duration
+    threads = [threading.Thread(target=_client, args=(host, port, mix, n_books, stop_at, seed * 1000 + i, samples))
+               for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    errors = {}
+    for _, _, outcome in samples:
+        if outcome != 'ok':
+            errors[outcome] = errors.get(outcome, 0) + 1
+    return {
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests': len(samples),
+        'throughput_rps': len(samples) / elapsed,
+        'latency_ms': _latency_summary([ms for _, ms, _ in samples]),
+        'by_operation': {op: _latency_summary([ms for o, ms, _ in samples if o == op]) for op in mix},
+        'errors': errors,
+        'error_rate': sum(errors.values()) / len(samples) if samples else 0.0,
+    }
+
+
+# ==========================================
+# Run the ramp
+# ==========================================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent read/write load test for the Flask books app')
+    parser.add_argument('--books', type=int, default=100_000, help='rows seeded into the throwaway database')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='operation weights, e.g. read=80,insert=10,update=7,delete=3')
+    parser.add_argument('--levels', default='1,2,4,8,16', help='concurrent clients per step of the ramp')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per concurrency level')
+    parser.add_argument('--server-threads', type=int, default=16)
+    parser.add_argument('--port', type=int, default=3012)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='loadtest_report.json')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    host = '127.0.0.1'
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'books.db')
+        seed_database(db_path, args.books, args.seed)
+        server = start_server(db_path, host, args.port, args.server_threads)
+        try:
+            levels = []
+            for concurrency in (int(c) for c in args.levels.split(',')):
+                level = run_level(host, args.port, mix, args.books, concurrency, args.duration, args.seed)
+                levels.append(level)
+                lat = level['latency_ms']
+                print(f"{concurrency:>4} clients: {level['throughput_rps']:>8.1f} req/s  "
+                      f"p50 {lat['p50'] or 0:>7.2f} ms  p99 {lat['p99'] or 0:>7.2f} ms  "
+                      f"errors {sum(level['errors'].values())} {level['errors'] or ''}")
+        finally:
+            server.terminate()
+            server.join()
+
+    report = {
+        'server': server_name(),
+        'books': args.books,
+        'mix': mix,
+        'duration_per_level_s': args.duration,
+        'cpus': os.cpu_count(),
+        'levels': levels,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Report written to {args.out}')
@@ -0,0 +1,280 @@
+"""
+Tests for the books routes in app.py, each against a fresh SQLite file.
+
+Run:
+    python3 -m pytest test_books_app.py
+"""
+
+import html
+import json
+import os
+import re
+import queue
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import app as books_app
+
+
+def reset_app(db_path):
+    """Point the app at db_path and forget pooled connections, schema state and cached pages."""
+    books_app.app.config['DATABASE'] = str(db_path)
+    while True:
+        try:
+            books_app._db_pool.get_nowait().close()
+        except queue.Empty:
+            break
+    books_app._schema_ready = False
+    books_app._page_cache.clear()
+
+
+@pytest.fixture
+def client(tmp_path):
+    reset_app(tmp_path / 'books.db')
+    yield books_app.app.test_client()
+    reset_app(tmp_path / 'books.db')
+
+
+def all_books(client):
+    with books_app.app.app_context():
+        rows = books_app.get_db_connection().execute('SELECT id, title, author FROM books ORDER BY id').fetchall()
+        return [tuple(r) for r in rows]
+
+
+# ==========================================
+# Connection pool + schema setup
+# ==========================================
+def test_connections_are_reused_and_the_pool_is_capped(client, monkeypatch):
+    opened = []
+    original = books_app._open_db_connection
+
+    def counting_open():
+        opened.append(original())
+        return opened[-1]
+
+    monkeypatch.setattr(books_app, '_open_db_connection', counting_open)
+
+    for _ in range(5):
+        assert client.get('/flask/books').status_code == 200
+    assert len(opened) == 1 and books_app._db_pool.qsize() == 1
+
+    monkeypatch.setitem(books_app.app.config, 'DB_POOL_SIZE', 2)
+    contexts = [books_app.app.app_context() for _ in range(4)]
+    for ctx in contexts:   # four requests at once need four connections
+        ctx.push()
+        books_app.get_db_connection()
+    for ctx in reversed(contexts):
+        ctx.pop()
+    assert len(opened) == 4 and books_app._db_pool.qsize() == 2
+
+
+def test_concurrent_first_connections_create_the_schema_once(client, monkeypatch):
+    calls = []
+    original = books_app.init_schema
+
+    def slow_init_schema(conn):
+        calls.append(threading.get_ident())
+        time.sleep(0.05)   # wide window for a second thread to slip in
+        original(conn)
+
+    monkeypatch.setattr(books_app, 'init_schema', slow_init_schema)
+    threads = [threading.Thread(target=lambda: books_app._open_db_connection().close()) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and books_app._schema_ready
+
+
+# ==========================================
+# Keyset pagination + full-text search
+# ==========================================
+def add_books(client, books):
+    ops = [{'op': 'add', 'title': title, 'author': author} for title, author in books]
+    assert client.post('/flask/books/batch', json=ops).status_code == 200
+
+
+def listed_ids(response):
+    return [int(i) for i in re.findall(r'<li>(\d+) ', response.get_data(as_text=True))]
+
+
+def walk_pages(client, url):
+    """Follow the Next links from url; returns the ids of every page, in order."""
+    ids, pages = [], 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        ids += listed_ids(response)
+        pages += 1
+        link = re.search(r'<a href="([^"]+)">Next page', response.get_data(as_text=True))
+        url = html.unescape(link.group(1)) if link else None
+    return ids, pages
+
+
+@pytest.mark.parametrize('sort', ['id', 'title', 'author'])
+def test_keyset_pages_list_every_book_once_in_order(client, sort):
+    # few distinct titles / authors: most page boundaries fall inside a run of equal keys
+    add_books(client, [(f'Title {i % 4}', f"O'Author {i % 3}") for i in range(40)])
+    column = {'id': 0, 'title': 1, 'author': 2}[sort]
+    expected = [b[0] for b in sorted(all_books(client), key=lambda b: (b[column], b[0]))]
+
+    ids, pages = walk_pages(client, f'/flask/books?sort={sort}&limit=7')
+    assert ids == expected and pages == 6
+
+
+def test_keyset_rejects_bad_parameters(client):
+    assert client.get('/flask/books?sort=year').status_code == 400
+    assert client.get('/flask/books?sort=title&after=3').status_code == 400   # no after_key
+
+
+@pytest.mark.parametrize('q, found', [
+    ('"quoted', True), ("O'Brien", True), ('tale bri', True), ('AND OR NOT (', False),
+    ('title:x* NEAR(', False), ('""', False)])
+def test_search_treats_query_syntax_as_words(client, q, found):
+    add_books(client, [('A "Quoted" Tale', "O'Brien"), ('Other', 'someone')])
+    response = client.get('/flask/books/search', query_string={'q': q})
+    assert response.status_code == 200
+    assert listed_ids(response) == ([1] if found else [])
+
+
+# ==========================================
+# Batch endpoint
+# ==========================================
+def test_batch_applies_runs_in_order(client):
+    ops = [
+        {'op': 'add', 'title': 'A', 'author': 'x'},
+        {'op': 'add', 'title': 'B', 'author': 'y'},
+        {'op': 'update', 'id': 1, 'title': 'A2', 'author': 'x2'},
+        {'op': 'delete', 'id': 2},
+        {'op': 'delete', 'id': 2},
+        {'op': 'update', 'id': 99, 'title': 'Z', 'author': 'z'},
+        {'op': 'add', 'title': 'C', 'author': 'z'},
+    ]
+    body = client.post('/flask/books/batch', json=ops).get_json()
+
+    assert [r['status'] for r in body['results']] == [
+        'added', 'added', 'updated', 'deleted', 'not_found', 'not_found', 'added']
+    assert [r['id'] for r in body['results']] == [1, 2, 1, 2, 2, 99, 3]
+    assert body['counts'] == {'added': 3, 'updated': 1, 'deleted': 1, 'not_found': 2}
+    assert all_books(client) == [(1, 'A2', 'x2'), (3, 'C', 'z')]
+    assert client.get('/flask/books/search?q=A2').get_data(as_text=True).count('A2') >= 1
+
+
+def test_batch_reports_invalid_items_and_keeps_the_rest(client):
+    ops = [{'op': 'add', 'title': 'A'}, {'op': 'delete', 'id': True}, 'nope', {'op': 'add', 'title': 'B', 'author': 'y'}]
+    body = client.post('/flask/books/batch', json=ops).get_json()
+
+    assert [r['status'] for r in body['results']] == ['error', 'error', 'error', 'added']
+    assert [r['index'] for r in body['results']] == [0, 1, 2, 3]
+    assert all_books(client) == [(1, 'B', 'y')]
+
+
+def test_batch_ndjson(client):
+    lines = [json.dumps({'op': 'add', 'title': f't{i}', 'author': 'a'}) for i in range(5)] + ['{bad', '']
+    response = client.post('/flask/books/batch', data='\n'.join(lines), content_type='application/x-ndjson')
+
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r['status'] for r in results] == ['added'] * 5 + ['error']
+    assert json.loads(response.headers['X-Batch-Counts']) == {'added': 5, 'error': 1}
+    assert len(all_books(client)) == 5
+
+
+def test_batch_ndjson_streams_mixed_results(client):
+    add_books(client, [('A', 'x'), ('B', 'y')])
+    ops = [{'op': 'update', 'id': 1, 'title': 'A2', 'author': 'x'}, {'op': 'delete', 'id': 7},
+           {'op': 'add', 'title': 'C'}, {'op': 'add', 'title': 'D', 'author': 'z'}, {'op': 'delete', 'id': 2}]
+    body = '\n'.join(json.dumps(op) for op in ops) + '\n[1, 2\n'
+    response = client.post('/flask/books/batch', data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200 and response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(r['index'], r['status'], r.get('id')) for r in results] == [
+        (0, 'updated', 1), (1, 'not_found', 7), (2, 'error', None), (3, 'added', 3), (4, 'deleted', 2), (5, 'error', None)]
+    assert 'author' in results[2]['error'] and 'invalid JSON' in results[5]['error']
+    assert json.loads(response.headers['X-Batch-Counts']) == {'updated': 1, 'not_found': 1, 'error': 2, 'added': 1, 'deleted': 1}
+    assert all_books(client) == [(1, 'A2', 'x'), (3, 'D', 'z')]
+
+
+def test_batch_json_has_no_counts_header(client):
+    response = client.post('/flask/books/batch', json=[{'op': 'add', 'title': 'A', 'author': 'x'}, {'op': 'nope'}])
+    assert response.mimetype == 'application/json' and 'X-Batch-Counts' not in response.headers
+    assert response.get_json()['counts'] == {'added': 1, 'error': 1}
+
+
+def test_batch_rejects_non_array(client):
+    assert client.post('/flask/books/batch', json={'op': 'add'}).status_code == 400
+
+
+# ==========================================
+# Page cache validators (ETag)
+# ==========================================
+def restart(db_path):
+    """What a fresh worker process sees: no pooled connections, empty page cache, new process token."""
+    reset_app(db_path)
+    books_app._process_token = os.urandom(8).hex()
+
+
+def get_etag(client, path='/flask/books'):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def test_etag_follows_writes_across_restarts_and_processes(client, tmp_path):
+    db_path = tmp_path / 'books.db'
+    empty = get_etag(client)
+    assert client.get('/flask/books', headers={'If-None-Match': empty}).status_code == 304
+
+    client.post('/flask/books/add', data={'title': 'A', 'author': 'x'})
+    one_book = get_etag(client)
+    assert one_book != empty
+
+    restart(db_path)   # a restarted worker still knows the version, so no stale 304
+    assert get_etag(client) == one_book
+    assert client.get('/flask/books', headers={'If-None-Match': empty}).status_code == 200
+
+    with sqlite3.connect(db_path) as other:   # a write from another process
+        other.execute("INSERT INTO books (title, author) VALUES ('B', 'y')")
+    response = client.get('/flask/books', headers={'If-None-Match': one_book})
+    assert response.status_code == 200 and 'B' in response.get_data(as_text=True)
+    assert 'books_write_version 2' in client.get('/metrics').get_data(as_text=True)
+
+
+def test_recreated_database_gets_new_etags(client, tmp_path):
+    db_path = tmp_path / 'books.db'
+    first = get_etag(client)
+    restart(db_path)
+    os.remove(db_path)
+    restart(db_path)
+    assert get_etag(client) != first
+
+
+def test_pages_without_books_change_etag_per_process(client, tmp_path):
+    home = get_etag(client, '/')
+    assert client.get('/', headers={'If-None-Match': home}).status_code == 304
+    restart(tmp_path / 'books.db')
+    assert client.get('/', headers={'If-None-Match': home}).status_code == 200
+
+
+@pytest.mark.parametrize('write', [
+    "INSERT INTO books (title, author) VALUES ('B', 'y')",
+    "UPDATE books SET title = 'A2' WHERE id = 1",
+    "DELETE FROM books WHERE id = 1",
+])
+def test_any_write_through_the_triggers_invalidates_cached_pages(client, tmp_path, write):
+    client.post('/flask/books/add', data={'title': 'A', 'author': 'x'})
+    paths = ['/flask/books', '/flask/books?sort=title', '/flask/books/search?q=a']
+    etags = {path: get_etag(client, path) for path in paths}
+    for path in paths:
+        assert client.get(path, headers={'If-None-Match': etags[path]}).status_code == 304
+
+    with sqlite3.connect(tmp_path / 'books.db') as other:   # bypasses the app entirely
+        other.execute(write)
+    for path in paths:
+        response = client.get(path, headers={'If-None-Match': etags[path]})
+        assert response.status_code == 200 and response.headers['ETag'] != etags[path]
+        assert response.get_data() != b''
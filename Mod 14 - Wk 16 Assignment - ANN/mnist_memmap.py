@@ -0,0 +1,292 @@
+"""
+Out-of-core MNIST pipeline for the M14 notebook.
+
+The notebook does
+
+    mnist = loadmat("./mnist-original.loadmat")
+    mnist_data = mnist["data"].T          # (70000, 784) uint8, the whole set in RAM
+    mnist_label = mnist["label"][0]
+
+convert() rewrites the .mat once into images.u8 (a raw (N, 784) uint8 file, one image per
+row) plus labels.npy. open_dataset() memory-maps it, and BatchLoader reads shuffled
+mini-batches of its rows on a background thread, so startup time and peak RSS stay about
+the same whether the file holds MNIST or ten times as much. (The conversion itself is the
+exception: scipy's loadmat cannot read part of a variable, so that one-time step holds the
+whole .mat in memory.)
+
+    convert("mnist-original.loadmat", "mnist_mm")
+    images, labels = open_dataset("mnist_mm")
+    loader = BatchLoader(images, labels, batch_size=128)
+    model.fit(loader.repeat(), steps_per_epoch=len(loader), epochs=5)     # Keras
+    for x, y in loader: ...                                                # NumPy, one epoch
+
+    python3 mnist_memmap.py convert mnist-original.loadmat mnist_mm
+    python3 mnist_memmap.py benchmark                  # in-memory loadmat vs memmap, 1x and 10x MNIST size
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+
+import numpy as np
+from scipy.io import loadmat, savemat
+
+from peak_rss import peak_rss_mb, reset_peak_rss
+
+IMAGE_SIZE = 784
+
+
+# ============================
+# Step 1: Convert the .mat once
+# ============================
+def convert(mat_path, out_dir, chunk_rows=10_000):
+    """
+    Write images.u8 (N x 784 uint8, row per image), labels.npy and meta.json; returns out_dir.
+    loadmat reads the whole .mat (its variables cannot be loaded in parts), so this one-time
+    step needs memory for the full dataset; only the transposed copy is written in chunks.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    mat = loadmat(mat_path, variable_names=["data", "label"])
+    data, labels = mat["data"], mat["label"].ravel()
+    n = data.shape[1]
+    out = np.memmap(os.path.join(out_dir, "images.u8"), dtype=np.uint8, mode="w+", shape=(n, IMAGE_SIZE))
+    for start in range(0, n, chunk_rows):
+        out[start:start + chunk_rows] = data[:, start:start + chunk_rows].T
+    out.flush()
+    del out
+    np.save(os.path.join(out_dir, "labels.npy"), labels.astype(np.uint8))
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({"n": int(n), "image_size": IMAGE_SIZE, "dtype": "uint8", "source": os.path.basename(mat_path)}, f)
+    return out_dir
+
+
+def open_dataset(path):
+    """(images, labels): images is a read-only np.memmap of shape (N, 784), uint8."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    images = np.memmap(os.path.join(path, "images.u8"), dtype=np.uint8, mode="r",
+                       shape=(meta["n"], meta["image_size"]))
+    return images, np.load(os.path.join(path, "labels.npy"))
+
+
+def _file_offset(images):
+    """
+    File position of images[0] for an np.memmap or a view of one. A view such as
+    images[60000:] keeps its parent's .offset, so it is worked out from the data pointers.
+    """
+    root = images
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    return root.offset + (images.ctypes.data - root.ctypes.data)
+
+
+def _read_rows(fd, images, rows):
+    """
+    Copy sorted rows of a memory-mapped array into a new array with positional reads, one per
+    run of consecutive rows. Faulting shuffled rows in through the mapping would map whole
+    (large-folio) chunks of the file into this process; reads go through the page cache
+    instead, so RSS stays at the batch size.
+    """
+    start, row_bytes = _file_offset(images), images.strides[0]
+    out = np.empty((len(rows),) + images.shape[1:], dtype=images.dtype)
+    runs = np.flatnonzero(np.diff(rows) != 1) + 1
+    for a, b in zip(np.r_[0, runs], np.r_[runs, len(rows)]):
+        os.preadv(fd, [out[a:b]], start + int(rows[a]) * row_bytes)
+    return out
+
+
+def _preadable(images):
+    """True if rows of images can be read from its file with os.preadv (not on Windows)."""
+    return (hasattr(os, "preadv") and isinstance(images, np.memmap) and bool(images.filename)
+            and images.flags.c_contiguous)
+
+
+# ============================
+# Step 2: Shuffled mini-batches with background prefetch
+# ============================
+class BatchLoader:
+    """
+    One epoch of shuffled (x, y) mini-batches per iteration: x float32 in [0, 1], shape
+    (batch, 784), y uint8. A thread gathers the next `prefetch` batches while the current
+    one trains. Each batch's rows are read in file order (the batch is then shuffled); for
+    an np.memmap they are read from the file rather than faulted in, to keep RSS flat
+    (where os.preadv exists; elsewhere they are copied out of the mapping).
+    """
+
+    def __init__(self, images, labels, batch_size=128, shuffle=True, seed=0, prefetch=4,
+                 normalize=True, drop_last=False):
+        self.images, self.labels = images, labels
+        self.batch_size, self.shuffle, self.prefetch = batch_size, shuffle, prefetch
+        self.normalize, self.drop_last = normalize, drop_last
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        n = len(self.labels)
+        return n // self.batch_size if self.drop_last else -(-n // self.batch_size)
+
+    def _batch(self, idx, fd=None):
+        order = np.argsort(idx, kind="stable")
+        rows = idx[order]
+        if fd is not None:
+            x = _read_rows(fd, self.images, rows)
+        else:
+            x = np.take(self.images, rows, axis=0)
+        y = self.labels[rows]
+        back = self.rng.permutation(len(rows)) if self.shuffle else np.arange(len(rows))
+        x, y = x[back], y[back]
+        return (x.astype(np.float32) / 255.0 if self.normalize else x), y
+
+    def __iter__(self):
+        n = len(self.labels)
+        perm = self.rng.permutation(n) if self.shuffle else np.arange(n)
+        batches = [perm[i:i + self.batch_size] for i in range(0, n, self.batch_size)]
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+
+        ready, stop, done = queue.Queue(maxsize=self.prefetch), threading.Event(), object()
+
+        def producer():
+            try:
+                for idx in batches:
+                    if stop.is_set():
+                        return
+                    ready.put(self._batch(idx, fd))
+                ready.put(done)
+            except BaseException as e:  # surface errors in the consumer
+                ready.put(e)
+
+        fd = os.open(self.images.filename, os.O_RDONLY) if _preadable(self.images) else None   # one per iterator
+
+        thread = threading.Thread(target=producer, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            while thread.is_alive():   # unblock a producer waiting on a full queue
+                try:
+                    ready.get_nowait()
+                except queue.Empty:
+                    thread.join(0.01)
+            if fd is not None:
+                os.close(fd)
+
+    def repeat(self):
+        """Endless batches (for Keras fit with steps_per_epoch=len(loader))."""
+        while True:
+            yield from self
+
+
+# ============================
+# Step 3: NumPy training + benchmark
+# ============================
+def train_softmax_epoch(batches, weights, lr=0.1):
+    """One epoch of softmax-regression SGD (a stand-in for model.fit that needs only NumPy)."""
+    for x, y in batches:
+        logits = x @ weights
+        logits -= logits.max(axis=1, keepdims=True)
+        p = np.exp(logits)
+        p /= p.sum(axis=1, keepdims=True)
+        p[np.arange(len(y)), y] -= 1
+        weights -= lr * (x.T @ p) / len(y)
+    return weights
+
+
+def _in_memory_batches(data, labels, batch_size, seed=0):
+    perm = np.random.default_rng(seed).permutation(len(labels))
+    for i in range(0, len(labels), batch_size):
+        idx = perm[i:i + batch_size]
+        yield data[idx].astype(np.float32) / 255.0, labels[idx]
+
+
+def _run_mode(mode, mat_path, mm_dir, batch_size, results):
+    reset_peak_rss()
+    start = time.perf_counter()
+    if mode == "in-memory":
+        mnist = loadmat(mat_path)
+        data = mnist["data"].T
+        labels = mnist["label"][0].astype(np.int64)
+        batches = _in_memory_batches(data, labels, batch_size)
+    else:
+        images, labels = open_dataset(mm_dir)
+        batches = BatchLoader(images, labels, batch_size=batch_size)
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    train_softmax_epoch(batches, np.zeros((IMAGE_SIZE, 10), dtype=np.float32))
+    results.put({"mode": mode, "startup_s": startup, "epoch_s": time.perf_counter() - start,
+                 "peak_rss_mb": peak_rss_mb()})
+
+
+def make_mnist_like_mat(path, n, source=None, seed=0):
+    """A .mat shaped like mnist-original (data 784 x n uint8, label 1 x n): tiled from `source` or random."""
+    rng = np.random.default_rng(seed)
+    if source:
+        mnist = loadmat(source)
+        reps = -(-n // mnist["data"].shape[1])
+        data = np.tile(mnist["data"], (1, reps))[:, :n]
+        label = np.tile(mnist["label"], (1, reps))[:, :n]
+    else:
+        data = rng.integers(0, 256, (IMAGE_SIZE, n), dtype=np.uint8)
+        label = rng.integers(0, 10, (1, n)).astype(np.float64)
+    savemat(path, {"data": data, "label": label}, do_compression=False)
+    return path
+
+
+def benchmark(mat_path=None, scales=(1, 10), batch_size=128, work_dir=None):
+    """Startup, one training epoch and peak RSS: notebook-style loadmat vs memmap, per dataset scale."""
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        for scale in scales:
+            mat = make_mnist_like_mat(os.path.join(tmp, f"mnist_x{scale}.mat"), 70_000 * scale, source=mat_path)
+            mm_dir = os.path.join(tmp, f"mnist_x{scale}")
+            start = time.perf_counter()
+            convert(mat, mm_dir)
+            convert_s = time.perf_counter() - start
+            for mode in ("in-memory", "memmap"):
+                results = ctx.Queue()
+                process = ctx.Process(target=_run_mode, args=(mode, mat, mm_dir, batch_size, results))
+                process.start()
+                row = results.get()
+                process.join()
+                rows.append({"scale": f"{scale}x", "images": 70_000 * scale, **row,
+                             "convert_s": convert_s if mode == "memmap" else None})
+            os.remove(mat)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory-mapped MNIST: convert the .mat once, stream shuffled batches")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_convert = sub.add_parser("convert")
+    p_convert.add_argument("mat", help="e.g. mnist-original.loadmat")
+    p_convert.add_argument("out_dir")
+    p_bench = sub.add_parser("benchmark")
+    p_bench.add_argument("--mat", default=None, help="real MNIST .mat to tile (default: random MNIST-shaped data)")
+    p_bench.add_argument("--scales", default="1,10")
+    p_bench.add_argument("--batch-size", type=int, default=128)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert(args.mat, args.out_dir)
+        images, labels = open_dataset(args.out_dir)
+        print(f"{len(labels):,} images -> {args.out_dir}")
+    else:
+        rows = benchmark(args.mat, [int(s) for s in args.scales.split(",")], args.batch_size)
+        print(f"{'scale':>5} {'images':>9} {'mode':>10} {'startup s':>10} {'epoch s':>8} {'peak RSS MB':>12} {'convert s':>10}")
+        for r in rows:
+            convert_s = f"{r['convert_s']:>10.2f}" if r["convert_s"] is not None else f"{'-':>10}"
+            print(f"{r['scale']:>5} {r['images']:>9,} {r['mode']:>10} {r['startup_s']:>10.2f} {r['epoch_s']:>8.2f} "
+                  f"{r['peak_rss_mb'] or 0:>12.1f} {convert_s}")
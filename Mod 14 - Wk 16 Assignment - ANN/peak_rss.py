@@ -0,0 +1,43 @@
+"""
+Peak resident set size of the current process, for the benchmark mode of mnist_memmap.py.
+
+Linux keeps the peak RSS across fork+exec, so a freshly spawned child starts from its parent's
+peak. Call reset_peak_rss() first thing in the child, then peak_rss_mb() once the work is done.
+
+    from peak_rss import peak_rss_mb, reset_peak_rss
+"""
+
+import sys
+from typing import Optional
+
+try:
+    import resource   # POSIX only
+except ImportError:
+    resource = None
+
+
+def reset_peak_rss():
+    """Reset this process's VmHWM to its current RSS (Linux; a no-op elsewhere)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak RSS in MiB since the last reset_peak_rss() (VmHWM), or since start where there is
+    no /proc (ru_maxrss). None where neither is available (Windows).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10   # bytes on macOS, KiB elsewhere
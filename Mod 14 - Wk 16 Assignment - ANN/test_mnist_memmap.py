@@ -0,0 +1,83 @@
+"""
+Tests for mnist_memmap.py on a small random MNIST-shaped .mat.
+
+Run:
+    python3 -m pytest test_mnist_memmap.py
+"""
+
+import numpy as np
+import pytest
+from scipy.io import loadmat
+
+import mnist_memmap as mm
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("mnist")
+    mat = mm.make_mnist_like_mat(str(tmp / "mnist.mat"), 500, seed=1)
+    images, labels = mm.open_dataset(mm.convert(mat, str(tmp / "mm"), chunk_rows=64))
+    source = loadmat(mat)
+    return images, labels, source["data"].T, source["label"].ravel().astype(np.uint8)
+
+
+def epoch(images, labels, **kwargs):
+    batches = list(mm.BatchLoader(images, labels, batch_size=32, normalize=False, **kwargs))
+    return np.concatenate([x for x, _ in batches]), np.concatenate([y for _, y in batches])
+
+
+def test_convert_matches_loadmat(dataset):
+    images, labels, data, label = dataset
+    assert isinstance(images, np.memmap) and images.shape == (500, mm.IMAGE_SIZE)
+    assert np.array_equal(images, data) and np.array_equal(labels, label)
+
+
+@pytest.mark.parametrize("view", [slice(None), slice(300, None), slice(123, 457), slice(None, None, 3)])
+def test_batches_of_memmap_views_read_the_right_rows(dataset, view):
+    images, labels, data, label = dataset
+    x, y = epoch(images[view], labels[view], shuffle=False)
+    assert np.array_equal(x, data[view]) and np.array_equal(y, label[view])
+
+
+def test_shuffled_batches_keep_images_with_their_labels(dataset):
+    images, labels, data, label = dataset
+    x, y = epoch(images[200:], labels[200:], seed=3)
+    # the random images are distinct, so each one identifies its source row
+    source_row = {row.tobytes(): i for i, row in enumerate(data[200:])}
+    rows = np.array([source_row[row.tobytes()] for row in x])
+    assert sorted(rows) == list(range(300))
+    assert np.array_equal(y, label[200:][rows])
+
+
+def test_runs_of_consecutive_rows_are_read_at_once(dataset, monkeypatch):
+    images, labels, data, _ = dataset
+    calls, preadv = [], mm.os.preadv
+
+    def counted(fd, buffers, offset):
+        calls.append(offset)
+        return preadv(fd, buffers, offset)
+
+    monkeypatch.setattr(mm.os, "preadv", counted)
+    x, _ = epoch(images, labels, shuffle=False)
+    assert np.array_equal(x, data) and len(calls) == 16   # one read per unshuffled batch
+
+
+def test_without_preadv_batches_come_from_the_mapping(dataset, monkeypatch):
+    images, labels, data, label = dataset
+    monkeypatch.delattr(mm.os, "preadv")   # Windows
+    x, y = epoch(images[100:], labels[100:], seed=5)
+    assert sorted(map(bytes, x)) == sorted(map(bytes, data[100:]))
+    assert np.array_equal(np.sort(y), np.sort(label[100:]))
+
+
+def test_closing_one_iterator_leaves_another_reading(dataset):
+    images, labels, data, label = dataset
+    loader = mm.BatchLoader(images, labels, batch_size=32, shuffle=False, normalize=False, prefetch=1)
+    first = iter(loader)
+    batches = [next(first)]
+    second = iter(loader)
+    next(second)
+    second.close()
+    batches += list(first)
+    assert np.array_equal(np.concatenate([x for x, _ in batches]), data)
+    assert np.array_equal(np.concatenate([y for _, y in batches]), label)
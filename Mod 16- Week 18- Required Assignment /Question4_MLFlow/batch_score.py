@@ -0,0 +1,156 @@
+"""
+Batch scoring with the model logged by train.py.
+
+The input (CSV or Parquet) is read in fixed-size chunks; each chunk is checked against
+the model's logged input signature and scored in a process pool whose workers load the
+model once. Predictions are written chunk by chunk in input order, with only a few
+chunks in flight, so memory stays flat however large the input is.
+
+Run:
+    python3 batch_score.py --run-id <RUN_ID> --input big.csv --output scored.csv
+    python3 batch_score.py --run-id <RUN_ID> --input big.parquet --output scored.parquet --chunk-size 200000 --workers 4
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import mlflow
+import mlflow.pyfunc
+
+DEFAULT_TRACKING_URI = "file:" + os.path.join(os.path.dirname(os.path.abspath(__file__)), "mlruns")
+
+_MODEL = None   # set once per worker process by _load_model
+
+
+# 1) Model + signature check
+def _load_model(model_uri, tracking_uri):
+    global _MODEL
+    mlflow.set_tracking_uri(tracking_uri)
+    _MODEL = mlflow.pyfunc.load_model(model_uri)
+
+
+def check_signature(chunk, schema, first_row):
+    """Columns of the signature, in order and cast to the logged types; ValueError naming the rows if not."""
+    if schema is None or not schema.has_input_names():
+        return chunk
+    rows = f"rows {first_row}-{first_row + len(chunk) - 1}"
+    missing = [c.name for c in schema.inputs if c.required and c.name not in chunk.columns]
+    if missing:
+        raise ValueError(f"{rows}: missing signature columns {missing}")
+    out = {}
+    for col in schema.inputs:
+        if col.name not in chunk.columns:
+            continue
+        dtype = col.type.to_numpy()
+        values = chunk[col.name]
+        if dtype.kind in "fiu":
+            numeric = pd.to_numeric(values, errors="coerce")
+            bad = numeric.isna() & values.notna()
+            if bad.any():
+                raise ValueError(f"{rows}: column {col.name!r} has non-numeric value {values[bad].iloc[0]!r}")
+            if dtype.kind in "iu" and numeric.isna().any():
+                raise ValueError(f"{rows}: column {col.name!r} ({col.type}) has missing values")
+            values = numeric
+        out[col.name] = values.astype(dtype)
+    return pd.DataFrame(out, index=chunk.index)
+
+
+def score_chunk(chunk, first_row):
+    """Worker task: validate one chunk and return it with a "prediction" column."""
+    features = check_signature(chunk, _MODEL.metadata.get_input_schema(), first_row)
+    scored = chunk.copy()
+    scored["prediction"] = _MODEL.predict(features)
+    return scored
+
+
+# 2) Chunked input / incremental output
+def read_chunks(path, chunk_size):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV (header once) or a Parquet file (one row group per chunk)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.writer = None
+        self.rows = 0
+
+    def write(self, chunk):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        self.rows += len(chunk)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# 3) Scoring loop
+def batch_score(model_uri, input_path, output_path, chunk_size=100_000, workers=None,
+                tracking_uri=DEFAULT_TRACKING_URI):
+    """Score input_path into output_path; returns {"rows", "chunks", "seconds", "rows_per_s"}."""
+    workers = workers or os.cpu_count() or 1
+    writer = ChunkWriter(output_path)
+    start = time.perf_counter()
+    chunks = 0
+    try:
+        if workers == 1:
+            _load_model(model_uri, tracking_uri)
+            for chunk in read_chunks(input_path, chunk_size):
+                writer.write(score_chunk(chunk, writer.rows))
+                chunks += 1
+        else:
+            # at most 2 chunks per worker in flight; results are written in submission order
+            with ProcessPoolExecutor(workers, initializer=_load_model, initargs=(model_uri, tracking_uri)) as pool:
+                pending, next_row = deque(), 0
+                for chunk in read_chunks(input_path, chunk_size):
+                    pending.append(pool.submit(score_chunk, chunk, next_row))
+                    next_row += len(chunk)
+                    if len(pending) >= 2 * workers:
+                        writer.write(pending.popleft().result())
+                        chunks += 1
+                while pending:
+                    writer.write(pending.popleft().result())
+                    chunks += 1
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+    return {"rows": writer.rows, "chunks": chunks, "seconds": seconds,
+            "rows_per_s": writer.rows / seconds if seconds else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file with the model logged by train.py")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--run-id", help="run printed by train.py (model at runs:/<RUN_ID>/model)")
+    source.add_argument("--model-uri", help="any MLflow model URI instead of a run id")
+    parser.add_argument("--input", required=True, help=".csv or .parquet")
+    parser.add_argument("--output", required=True, help=".csv or .parquet (input columns + prediction)")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--tracking-uri", default=DEFAULT_TRACKING_URI)
+    args = parser.parse_args()
+
+    model_uri = args.model_uri or f"runs:/{args.run_id}/model"
+    stats = batch_score(model_uri, args.input, args.output, args.chunk_size, args.workers, args.tracking_uri)
+    print(f"Scored {stats['rows']:,} rows in {stats['chunks']} chunks, {stats['seconds']:.2f}s "
+          f"({stats['rows_per_s']:,.0f} rows/s) -> {args.output}")
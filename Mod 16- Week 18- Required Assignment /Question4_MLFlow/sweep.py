@@ -0,0 +1,278 @@
+"""
+Hyperparameter sweep over train.py's LogisticRegression.
+
+Grid or random search over solver / C / penalty / max_iter. Trials run in a process pool
+(each worker loads the data split once) and each one is logged as a child run of one
+"sweep" parent run in a local file store. A trial is identified by a hash of the data
+split and its parameters: trials that already finished in an earlier sweep are skipped
+and their results reused. With --budget-seconds no new trials start once the budget is spent.
+
+Run:
+    python3 sweep.py                                        # full grid, one worker per CPU
+    python3 sweep.py --mode random --n-trials 40 --budget-seconds 60
+    python3 sweep.py --space space.json                     # {"C": {"log_uniform": [0.001, 100]}, "solver": [...], ...}
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from sklearn.exceptions import ConvergenceWarning
+
+import mlflow
+from mlflow.tracking import MlflowClient
+from mlflow.utils.mlflow_tags import MLFLOW_PARENT_RUN_ID
+
+from train import load_data, log_model, train_model
+
+DEFAULT_TRACKING_URI = "file:" + os.path.join(os.path.dirname(os.path.abspath(__file__)), "mlruns")
+DEFAULT_SPACE = {
+    "solver": ["lbfgs", "newton-cg", "saga"],   # liblinear is binary-only for the 3 iris classes
+    "C": [0.01, 0.1, 1.0, 10.0, 100.0],
+    "penalty": ["l2", "l1"],
+    "max_iter": [50, 200, 1000],
+}
+# penalties each solver supports (other combinations are dropped from the search)
+SOLVER_PENALTIES = {"lbfgs": {"l2"}, "newton-cg": {"l2"}, "sag": {"l2"}, "liblinear": {"l1", "l2"}, "saga": {"l1", "l2"}}
+# every sweep() result has these columns, even when no trial ran or all of them failed
+RESULT_COLUMNS = ["status", "accuracy", "fit_seconds", "converged", "run_id", "error"]
+
+
+# 1) Search space -> trial parameter sets
+def _valid(params):
+    return params.get("penalty", "l2") in SOLVER_PENALTIES.get(params.get("solver", "lbfgs"), {"l2"})
+
+
+def _sample(spec, rng):
+    """A list is a choice; {"log_uniform": [lo, hi]}, {"uniform": [lo, hi]} or {"int_uniform": [lo, hi]} are ranges."""
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    (kind, (lo, hi)), = spec.items()
+    if kind == "log_uniform":
+        return float(10 ** rng.uniform(math.log10(lo), math.log10(hi)))
+    if kind == "uniform":
+        return float(rng.uniform(lo, hi))
+    if kind == "int_uniform":
+        return rng.randint(lo, hi)
+    raise ValueError(f"Unknown range kind: {kind!r}")
+
+
+def grid_trials(space):
+    keys = sorted(space)
+    values = [space[k] if isinstance(space[k], list) else [space[k]] for k in keys]
+    return [p for p in (dict(zip(keys, combo)) for combo in itertools.product(*values)) if _valid(p)]
+
+
+def random_trials(space, n_trials, seed=0):
+    """
+    n_trials distinct valid samples (fewer if a small discrete space runs out); the same
+    seed gives the same trials, so reruns hit the cache.
+    """
+    rng, trials, seen, attempts = random.Random(seed), [], set(), 0
+    while len(trials) < n_trials and attempts < 100 * n_trials:
+        attempts += 1
+        params = {k: _sample(space[k], rng) for k in sorted(space)}
+        key = json.dumps(params, sort_keys=True)
+        if _valid(params) and key not in seen:
+            seen.add(key)
+            trials.append(params)
+    return trials
+
+
+# 2) Content hashes
+def data_hash(X_train, X_test, y_train, y_test):
+    h = hashlib.sha256()
+    for part in (X_train, X_test, y_train, y_test):
+        h.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def trial_hash(split_hash, params):
+    return hashlib.sha256((split_hash + json.dumps(params, sort_keys=True)).encode()).hexdigest()
+
+
+def finished_trials(client, experiment_id, split_hash):
+    """trial hash -> result of every FINISHED trial on this data split, from earlier sweeps."""
+    done = {}
+    for run in client.search_runs([experiment_id], filter_string=f"tags.`sweep.data_hash` = '{split_hash}'", max_results=50_000):
+        if run.info.status == "FINISHED" and "sweep.trial_hash" in run.data.tags:
+            done[run.data.tags["sweep.trial_hash"]] = {
+                "run_id": run.info.run_id,
+                "accuracy": run.data.metrics.get("accuracy"),
+                "fit_seconds": run.data.metrics.get("fit_seconds"),
+                "converged": bool(run.data.metrics.get("converged", 1)),
+            }
+    return done
+
+
+# 3) One trial (runs in a worker process)
+_DATA = None
+
+
+def _init_worker(tracking_uri, random_state):
+    global _DATA
+    mlflow.set_tracking_uri(tracking_uri)
+    warnings.filterwarnings("ignore", category=ConvergenceWarning)
+    _DATA = load_data(random_state)
+
+
+def run_trial(params, t_hash, split_hash, experiment_id, parent_run_id, log_models=False):
+    X_train, X_test, y_train, y_test = _DATA
+    tags = {MLFLOW_PARENT_RUN_ID: parent_run_id, "sweep.trial_hash": t_hash, "sweep.data_hash": split_hash}
+    name = "-".join(f"{k}={v:.3g}" if isinstance(v, float) else f"{k}={v}" for k, v in sorted(params.items()))
+    with mlflow.start_run(experiment_id=experiment_id, run_name=name, tags=tags) as run:
+        mlflow.log_params(params)
+        start = time.perf_counter()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ConvergenceWarning)
+            clf = train_model(X_train, y_train, **params)
+        fit_seconds = time.perf_counter() - start
+        converged = not any(issubclass(w.category, ConvergenceWarning) for w in caught)
+        accuracy = clf.score(X_test, y_test)
+        mlflow.log_metrics({"accuracy": accuracy, "fit_seconds": fit_seconds, "converged": float(converged)})
+        if log_models:
+            log_model(clf, X_test)
+    return {"run_id": run.info.run_id, "accuracy": accuracy, "fit_seconds": fit_seconds, "converged": converged}
+
+
+# 4) Sweep
+def sweep(trials, workers=None, budget_seconds=None, tracking_uri=DEFAULT_TRACKING_URI,
+          experiment="iris-logreg-sweep", random_state=7, log_models=False):
+    """
+    Run (or reuse) every trial; returns a DataFrame with one row per distinct trial:
+    params..., status (ran / cached / failed / not_run), accuracy, fit_seconds, converged, run_id,
+    error (the exception message of a failed trial). Best accuracy first; trials without
+    one (failed / not run) last. The parent run records trials_failed and, if any trial
+    failed, a sweep.failed_trials tag with their parameters and errors.
+    """
+    mlflow.set_tracking_uri(tracking_uri)
+    client = MlflowClient()
+    experiment_id = mlflow.set_experiment(experiment).experiment_id
+    split_hash = data_hash(*load_data(random_state))
+    done = finished_trials(client, experiment_id, split_hash)
+
+    parent = client.create_run(experiment_id, run_name="sweep")
+    parent_id = parent.info.run_id
+    client.log_param(parent_id, "n_trials", len(trials))
+    client.log_param(parent_id, "budget_seconds", budget_seconds)
+
+    rows, todo, seen = [], [], set()
+    for params in trials:
+        h = trial_hash(split_hash, params)
+        if h in seen:
+            continue   # listed twice: run (and report) it once
+        seen.add(h)
+        if h in done:
+            rows.append({**params, "status": "cached", **done[h]})
+        else:
+            todo.append((params, h))
+
+    start = time.perf_counter()
+    deadline = start + budget_seconds if budget_seconds else None
+    workers = workers or os.cpu_count() or 1
+    args = (experiment_id, parent_id, log_models)
+    status = "FINISHED"
+    try:
+        if workers == 1:
+            _init_worker(tracking_uri, random_state)
+            for i, (params, h) in enumerate(todo):
+                if deadline and time.perf_counter() > deadline:
+                    rows += [{**p, "status": "not_run"} for p, _ in todo[i:]]
+                    break
+                rows.append(_run_safely(params, h, split_hash, args))
+        else:
+            # spawn: workers must not inherit this process's MLflow run state
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(tracking_uri, random_state)) as pool:
+                pending, queue = {}, list(todo)
+                while queue or pending:
+                    while queue and len(pending) < workers and not (deadline and time.perf_counter() > deadline):
+                        params, h = queue.pop(0)
+                        pending[pool.submit(run_trial, params, h, split_hash, *args)] = params
+                    if deadline and time.perf_counter() > deadline:
+                        rows += [{**p, "status": "not_run"} for p, _ in queue]   # budget spent: start nothing new
+                        queue = []
+                    if not pending:
+                        break
+                    finished = next(as_completed(pending))
+                    params = pending.pop(finished)
+                    try:
+                        rows.append({**params, "status": "ran", **finished.result()})
+                    except Exception as e:
+                        rows.append({**params, "status": "failed", "error": str(e)})
+    except BaseException:
+        status = "KILLED"
+        raise
+    finally:
+        results = pd.DataFrame(rows)
+        results = results.reindex(columns=list(dict.fromkeys([*results.columns, *RESULT_COLUMNS])))
+        results["accuracy"] = results["accuracy"].astype(float)
+        failed = failed_trials(results)
+        client.log_metric(parent_id, "trials_ran", int((results["status"] == "ran").sum()))
+        client.log_metric(parent_id, "trials_cached", int((results["status"] == "cached").sum()))
+        client.log_metric(parent_id, "trials_failed", len(failed))
+        client.log_metric(parent_id, "wall_seconds", time.perf_counter() - start)
+        if results["accuracy"].notna().any():
+            client.log_metric(parent_id, "best_accuracy", float(results["accuracy"].max()))
+        if failed:
+            client.set_tag(parent_id, "sweep.failed_trials", json.dumps(failed, default=str)[:5000])
+        client.set_terminated(parent_id, status)
+    return results.sort_values("accuracy", ascending=False, na_position="last").reset_index(drop=True)
+
+
+def failed_trials(results):
+    """[{"params": {...}, "error": "..."}, ...] for the failed rows of a sweep() result."""
+    params = [c for c in results.columns if c not in RESULT_COLUMNS]
+    failed = results[results["status"] == "failed"]
+    return [{"params": {k: v for k, v in row[params].items() if pd.notna(v)}, "error": row["error"]}
+            for _, row in failed.iterrows()]
+
+
+def _run_safely(params, h, split_hash, args):
+    try:
+        return {**params, "status": "ran", **run_trial(params, h, split_hash, *args)}
+    except Exception as e:
+        return {**params, "status": "failed", "error": str(e)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel, cached LogisticRegression sweep logged to MLflow")
+    parser.add_argument("--mode", choices=["grid", "random"], default="grid")
+    parser.add_argument("--space", default=None, help="JSON file with the search space (default: built-in grid)")
+    parser.add_argument("--n-trials", type=int, default=30, help="random mode only")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--budget-seconds", type=float, default=None, help="start no new trials after this long")
+    parser.add_argument("--experiment", default="iris-logreg-sweep")
+    parser.add_argument("--tracking-uri", default=DEFAULT_TRACKING_URI)
+    parser.add_argument("--log-models", action="store_true", help="also log each trial's model artifact")
+    args = parser.parse_args()
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    trials = grid_trials(space) if args.mode == "grid" else random_trials(space, args.n_trials, args.seed)
+
+    t0 = time.perf_counter()
+    results = sweep(trials, args.workers, args.budget_seconds, args.tracking_uri, args.experiment, log_models=args.log_models)
+    with pd.option_context("display.width", 140, "display.max_rows", 200):
+        print(results.drop(columns=["run_id", "error"]).to_string(index=False))
+    counts = results["status"].value_counts().to_dict()
+    print(f"\n{len(results)} trials {counts} in {time.perf_counter() - t0:.1f}s")
+    failed = failed_trials(results)
+    if failed:
+        print(f"\n{len(failed)} trial(s) failed:")
+        for trial in failed:
+            print(f"  {trial['params']}: {trial['error']}")
+    if not results["accuracy"].notna().any():
+        print("No trial recorded an accuracy.")
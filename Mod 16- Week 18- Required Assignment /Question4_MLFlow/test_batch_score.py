@@ -0,0 +1,81 @@
+"""
+Tests for batch_score.py with a model logged by train.py into a throwaway MLflow file store.
+
+Run:
+    python3 -m pytest test_batch_score.py
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import mlflow
+
+import batch_score
+import train
+
+
+@pytest.fixture(scope="module")
+def logged(tmp_path_factory):
+    """(model URI, tracking URI, fitted classifier, iris features) for one logged run."""
+    os.environ.setdefault("MLFLOW_ALLOW_FILE_STORE", "true")
+    tracking_uri = "file:" + str(tmp_path_factory.mktemp("mlruns"))
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment("batch-score-test")
+    X_train, X_test, y_train, _ = train.load_data()
+    clf = train.train_model(X_train, y_train)
+    with mlflow.start_run() as run:
+        try:
+            train.log_model(clf, X_test)
+        except ModuleNotFoundError as e:   # recent MLflow releases serialize sklearn models with skops
+            pytest.skip(f"cannot log the model with this MLflow install: {e}")
+    X = pd.concat([X_train, X_test]).sort_index().reset_index(drop=True)
+    return f"runs:/{run.info.run_id}/model", tracking_uri, clf, X
+
+
+@pytest.fixture
+def input_csv(logged, tmp_path):
+    path = tmp_path / "input.csv"
+    logged[3].assign(customer=np.arange(len(logged[3]))).to_csv(path, index=False)   # extra column is kept
+    return str(path)
+
+
+def test_scores_every_row_in_order(logged, input_csv, tmp_path):
+    model_uri, tracking_uri, clf, X = logged
+    output = str(tmp_path / "scored.csv")
+    stats = batch_score.batch_score(model_uri, input_csv, output, chunk_size=40, workers=1, tracking_uri=tracking_uri)
+
+    assert (stats["rows"], stats["chunks"]) == (150, 4)
+    scored = pd.read_csv(output)
+    assert list(scored.columns) == train.FEATURES + ["customer", "prediction"]
+    assert scored["customer"].tolist() == list(range(150))
+    assert np.array_equal(scored["prediction"], clf.predict(X))
+
+
+def test_worker_pool_and_parquet_output_match_one_process(logged, input_csv, tmp_path):
+    model_uri, tracking_uri, _, _ = logged
+    one = str(tmp_path / "one.csv")
+    pooled = str(tmp_path / "pooled.parquet")
+    batch_score.batch_score(model_uri, input_csv, one, chunk_size=16, workers=1, tracking_uri=tracking_uri)
+    stats = batch_score.batch_score(model_uri, input_csv, pooled, chunk_size=16, workers=2, tracking_uri=tracking_uri)
+
+    assert (stats["rows"], stats["chunks"]) == (150, 10)   # more chunks than 2 per worker in flight
+    pd.testing.assert_frame_equal(pd.read_parquet(pooled), pd.read_csv(one), check_dtype=False)
+
+
+def test_signature_errors_name_the_rows(logged, tmp_path):
+    model_uri, tracking_uri, _, X = logged
+    bad = X.astype({"petal width (cm)": object})
+    bad.loc[57, "petal width (cm)"] = "wide"
+    path = str(tmp_path / "bad.csv")
+    bad.to_csv(path, index=False)
+    with pytest.raises(ValueError, match=r"rows 50-74: column 'petal width \(cm\)' has non-numeric value 'wide'"):
+        batch_score.batch_score(model_uri, path, str(tmp_path / "out.csv"), chunk_size=25, workers=1,
+                                tracking_uri=tracking_uri)
+
+    X.drop(columns="sepal width (cm)").to_csv(path, index=False)
+    with pytest.raises(ValueError, match=r"rows 0-24: missing signature columns \['sepal width \(cm\)'\]"):
+        batch_score.batch_score(model_uri, path, str(tmp_path / "out.csv"), chunk_size=25, workers=1,
+                                tracking_uri=tracking_uri)
@@ -0,0 +1,76 @@
+"""
+Tests for sweep.py against a throwaway MLflow file store (iris data).
+
+Run:
+    python3 -m pytest test_sweep.py
+"""
+
+import pytest
+
+import sweep
+
+
+@pytest.fixture
+def tracking_uri(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    return "file:" + str(tmp_path / "mlruns")
+
+
+def test_trials_run_then_come_from_the_cache(tracking_uri):
+    trials = [{"solver": "lbfgs", "C": 1.0}, {"solver": "lbfgs", "C": 0.01}]
+    first = sweep.sweep(trials, workers=1, tracking_uri=tracking_uri)
+    assert first["status"].tolist() == ["ran", "ran"]
+    assert first["accuracy"].is_monotonic_decreasing
+
+    second = sweep.sweep(trials, workers=1, tracking_uri=tracking_uri)
+    assert second["status"].tolist() == ["cached", "cached"]
+    assert second["accuracy"].tolist() == first["accuracy"].tolist()
+
+
+def test_all_trials_failing_are_reported(tracking_uri):
+    trials = [{"solver": "lbfgs", "penalty": "l1"}, {"solver": "no-such-solver"}]
+    results = sweep.sweep(trials, workers=1, tracking_uri=tracking_uri)
+
+    assert results["status"].tolist() == ["failed", "failed"]
+    assert results["accuracy"].isna().all()
+    failed = sweep.failed_trials(results)
+    assert [t["params"]["solver"] for t in failed] == ["lbfgs", "no-such-solver"]
+    assert all(t["error"] for t in failed)
+
+
+def test_mixed_results_put_failures_last(tracking_uri):
+    trials = [{"solver": "no-such-solver"}, {"solver": "lbfgs", "C": 1.0}]
+    results = sweep.sweep(trials, workers=1, tracking_uri=tracking_uri)
+    assert results["status"].tolist() == ["ran", "failed"]
+
+
+def test_empty_sweep(tracking_uri):
+    results = sweep.sweep([], workers=1, tracking_uri=tracking_uri)
+    assert len(results) == 0
+    assert set(sweep.RESULT_COLUMNS) <= set(results.columns)
+    assert sweep.failed_trials(results) == []
+
+
+def test_spent_budget_runs_nothing(tracking_uri):
+    results = sweep.sweep([{"solver": "lbfgs", "C": 1.0}], workers=1, budget_seconds=1e-9, tracking_uri=tracking_uri)
+    assert results["status"].tolist() == ["not_run"]
+    assert results["accuracy"].isna().all()
+
+
+def test_random_trials_are_distinct():
+    trials = sweep.random_trials(sweep.DEFAULT_SPACE, 200, seed=1)
+    keys = [tuple(sorted(t.items())) for t in trials]
+    assert len(set(keys)) == len(keys) == len(sweep.grid_trials(sweep.DEFAULT_SPACE))   # the space runs out
+    assert trials == sweep.random_trials(sweep.DEFAULT_SPACE, 200, seed=1)
+
+
+def test_worker_pool_runs_each_distinct_trial_once(tracking_uri):
+    trials = [{"solver": "lbfgs", "C": 1.0}, {"solver": "lbfgs", "C": 0.01}, {"C": 1.0, "solver": "lbfgs"},
+              {"solver": "no-such-solver"}]
+    results = sweep.sweep(trials, workers=2, tracking_uri=tracking_uri)
+    assert sorted(results["status"]) == ["failed", "ran", "ran"]
+    assert results["run_id"].dropna().nunique() == 2
+
+    again = sweep.sweep(trials, workers=2, budget_seconds=1e-9, tracking_uri=tracking_uri)
+    assert sorted(again["status"]) == ["cached", "cached", "not_run"]   # the failed trial is retried, budget permitting
+    assert set(again["run_id"].dropna()) == set(results["run_id"].dropna())
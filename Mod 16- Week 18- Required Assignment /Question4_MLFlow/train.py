@@ -7,25 +7,38 @@ import mlflow
 import mlflow.sklearn
 from mlflow.models import infer_signature
 
+FEATURES = ["sepal length (cm)", "sepal width (cm)", "petal length (cm)", "petal width (cm)"]
+
+
 # 1) Data
-iris = load_iris(as_frame=True)
-X = iris.data[["sepal length (cm)", "sepal width (cm)", "petal length (cm)", "petal width (cm)"]]
-y = iris.target
-X_train, X_test, y_train, y_test = train_test_split(X, y, random_state=7)
+def load_data(random_state=7):
+    iris = load_iris(as_frame=True)
+    X = iris.data[FEATURES]
+    y = iris.target
+    return train_test_split(X, y, random_state=random_state)   # X_train, X_test, y_train, y_test
+
 
 # 2) Train
-clf = LogisticRegression(max_iter=200).fit(X_train, y_train)
+def train_model(X_train, y_train, **params):
+    params = {"max_iter": 200, **params}
+    return LogisticRegression(**params).fit(X_train, y_train)
 
-# 3) Signature (defines input/output schema)
-preds = clf.predict(X_test)
-signature = infer_signature(X_test, preds)
 
-# 4) Log to MLflow (saves model + signature as artifacts)
-with mlflow.start_run() as run:
+# 3) Signature (defines input/output schema) + 4) Log to MLflow (saves model + signature as artifacts)
+def log_model(clf, X_test):
+    preds = clf.predict(X_test)
+    signature = infer_signature(X_test, preds)
     mlflow.sklearn.log_model(
         sk_model=clf,
         artifact_path="model",        # model lives under .../artifacts/model
         signature=signature,
         input_example=X_test.head(2)
     )
-    print("RUN_ID:", run.info.run_id)  # <-- copy this (no < >)
+
+
+if __name__ == "__main__":
+    X_train, X_test, y_train, y_test = load_data()
+    clf = train_model(X_train, y_train)
+    with mlflow.start_run() as run:
+        log_model(clf, X_test)
+        print("RUN_ID:", run.info.run_id)  # <-- copy this (no < >)
@@ -0,0 +1,134 @@
+"""
+Exact vs LSH (build_lsh_neighbour_index) user neighbours on synthetic ratings: build and
+query time, speedup and recall@K of the approximate lists, for a few table / plane settings.
+
+Ratings are sparse and true neighbours have low cosines, so random planes over all movies
+split them apart (fast, poor recall); planes drawn in the top singular subspace keep them
+together. The tables printed per size show where LSH starts to pay off on this machine;
+recommender_system.py stays exact below LSH_MIN_ROWS users.
+
+Run:
+    python3 ann_benchmark.py                     # 2k, 10k and 40k users
+    python3 ann_benchmark.py --max-users 10000 --json ann.json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from sklearn.preprocessing import normalize
+
+from recommender_system import (
+    build_lsh_neighbour_index,
+    build_neighbour_index,
+    build_user_item_matrix,
+    query_lsh_neighbours,
+)
+from synthetic_ratings import make_synthetic_ratings
+
+
+# ==========================================================
+# EXACT VS LSH NEIGHBOURS: RECALL@K AND SPEEDUP
+# ==========================================================
+
+SIZES = [(2_000, 1_000), (10_000, 4_000), (40_000, 10_000)]
+# defaults, fewer / more tables, and plain random planes over all movies (n_components=0)
+LSH_CONFIGS = [{}, {"n_tables": 8}, {"n_tables": 32}, {"n_components": 0}]
+
+
+def recall_at_k(exact: np.ndarray, approx: np.ndarray) -> float:
+    """Mean fraction of each row's exact top-K neighbours that the approximate row also found."""
+    if exact.shape[1] == 0:
+        return 1.0
+    hits = sum(len(np.intersect1d(e, a, assume_unique=True)) for e, a in zip(exact, approx))
+    return hits / exact.size
+
+
+def top_k_columns(sims: np.ndarray, k: int) -> np.ndarray:
+    """Column positions of each row's k largest values, best first (brute-force reference)."""
+    pos = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(sims, pos, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(pos, order, axis=1)
+
+
+def benchmark_size(n_users: int, n_items: int, k: int = 50, query_frac: float = 0.1, seed: int = 0) -> dict:
+    """
+    Users are split into an indexed base and held-out queries. Build: exact index vs LSH index
+    of the base (recall@K of the LSH lists). Query: neighbours of the held-out users by brute
+    force (queries @ base.T) vs query_lsh_neighbours.
+    """
+    ratings = make_synthetic_ratings(n_users, n_items, seed=seed).rename(
+        columns={"userId": "user_id", "movieId": "movie_id"})
+    uim = build_user_item_matrix(ratings, sparse=True)
+    normed = normalize(uim["matrix"], axis=1)
+
+    rng = np.random.default_rng(seed)
+    is_query = rng.random(normed.shape[0]) < query_frac
+    base, queries = normed[~is_query], normed[is_query]
+    base_uim = {"matrix": uim["matrix"][~is_query], "user_ids": uim["user_ids"][~is_query], "movie_ids": uim["movie_ids"]}
+
+    t0 = time.perf_counter()
+    exact = build_neighbour_index(base_uim, n_neighbors=k)
+    exact_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    sims = np.ascontiguousarray((base @ queries.T.toarray()).T)
+    exact_query = top_k_columns(sims, k)
+    exact_query_s = time.perf_counter() - t0
+
+    result = {
+        "users": int(normed.shape[0]), "items": int(normed.shape[1]), "ratings": int(len(ratings)), "k": k,
+        "queries": int(queries.shape[0]), "exact_build_s": exact_build, "exact_query_s": exact_query_s, "lsh": [],
+    }
+    for config in LSH_CONFIGS:
+        t0 = time.perf_counter()
+        approx = build_lsh_neighbour_index(base, base_uim["user_ids"], k, seed=seed, **config)
+        build_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        approx_query, _ = query_lsh_neighbours(approx, base, queries, k)
+        query_s = time.perf_counter() - t0
+
+        tables = approx["lsh"]
+        result["lsh"].append({
+            "n_tables": tables["order"].shape[0],
+            "n_bits": tables["planes"].shape[1] // tables["order"].shape[0],
+            "n_components": config.get("n_components", 16),
+            "build_s": build_s,
+            "build_speedup": exact_build / build_s,
+            "build_recall": recall_at_k(exact["neighbours"], approx["neighbours"]),
+            "query_s": query_s,
+            "query_speedup": exact_query_s / query_s,
+            "query_recall": recall_at_k(exact_query, approx_query),
+        })
+    return result
+
+
+def print_result(result: dict) -> None:
+    print(f"\n{result['users']} users x {result['items']} items ({result['ratings']} ratings), K={result['k']}: "
+          f"exact build {result['exact_build_s']:.2f}s, exact query ({result['queries']} users) {result['exact_query_s']:.2f}s")
+    print(f"{'tables':>6} {'bits':>4} {'dims':>4} | {'build s':>8} {'speedup':>7} {'recall':>6} | {'query s':>8} {'speedup':>7} {'recall':>6}")
+    for r in result["lsh"]:
+        print(f"{r['n_tables']:>6} {r['n_bits']:>4} {r['n_components'] or 'all':>4} | {r['build_s']:>8.2f} {r['build_speedup']:>6.1f}x {r['build_recall']:>6.3f} | "
+              f"{r['query_s']:>8.3f} {r['query_speedup']:>6.1f}x {r['query_recall']:>6.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@K and speed of LSH neighbours vs exact cosine")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--max-users", type=int, default=None, help="skip sizes with more users than this")
+    parser.add_argument("--json", default=None, help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for n_users, n_items in SIZES:
+        if args.max_users is not None and n_users > args.max_users:
+            continue
+        results.append(benchmark_size(n_users, n_items, k=args.k))
+        print_result(results[-1])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.json}")
@@ -0,0 +1,221 @@
+"""
+Benchmark recommender_system.py stages at growing synthetic scales and check for regressions.
+
+For each scale a seeded MovieLens-style ratings.csv is generated (synthetic_ratings.py),
+then loading, user–item matrix build, similarity (user + item neighbour indexes), batch
+Top-N recommendation and User-KNN evaluation are timed with the profile_stage recorder
+(wall/CPU seconds, peak RSS). Each scale runs in a fresh process, so its peak RSS is its
+own and not the high-water mark left by a previous scale. Timings are only compared with a
+baseline recorded on the same kind of machine (CPU count, Python and NumPy versions). No
+baseline is shipped: record one with --save-baseline before the first comparison run, and
+again after an intended speed change.
+
+Run:
+    python3 benchmark_suite.py --save-baseline                  # record this machine's numbers as the baseline
+    python3 benchmark_suite.py                                  # 100k + 1M ratings, compare to baseline
+    python3 benchmark_suite.py --scales 100k,1M,10M,25M --lsh   # bigger scales need approximate neighbours
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import recommender_system as rs
+from synthetic_ratings import make_synthetic_ratings, write_synthetic_ratings
+
+
+# ==========================================================
+# SCALES + STAGES
+# ==========================================================
+
+DEFAULT_SCALES = "100k,1M"
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+STAGES = ("load", "matrix", "similarity", "recommend", "evaluate")
+MACHINE_KEYS = ("cpus", "python", "numpy")   # must match for timings to be comparable (platform is only recorded)
+
+
+def parse_scale(text: str) -> int:
+    """'100k' -> 100_000, '25M' -> 25_000_000 (number of ratings)."""
+    text = text.strip().lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def scale_shape(n_ratings: int, ratings_per_user: float = 60, seed: int = 0):
+    """
+    Users/items for about n_ratings ratings, in MovieLens proportions. Repeat draws of popular
+    movies are dropped by the generator, so a small pilot measures the real ratings per user.
+    """
+    n_items = max(1000, n_ratings // 100)
+    pilot = make_synthetic_ratings(2000, n_items, ratings_per_user=ratings_per_user, seed=seed)
+    n_users = max(100, int(round(n_ratings / (len(pilot) / 2000))))
+    return n_users, n_items, ratings_per_user
+
+
+def run_scale(n_ratings: int, work_dir: str, lsh: bool = False, n_neighbors: int = 50,
+              recommend_users: int = 1000, seed: int = 0) -> dict:
+    """Time every stage at one scale; returns {"ratings", "users", "items", "stages": {stage: {...}}}."""
+    n_users, n_items, per_user = scale_shape(n_ratings, seed=seed)
+    path = os.path.join(work_dir, f"ratings_{n_ratings}.csv")
+    write_synthetic_ratings(path, n_users, n_items, seed=seed, ratings_per_user=per_user)
+    lsh_options = {} if lsh else None
+
+    rs.enable_profiling()
+    try:
+        with rs.profile_stage("load"):
+            ratings = rs.load_and_normalize_ratings(path, cache=False)
+        with rs.profile_stage("matrix"):
+            uim = rs.build_user_item_matrix(ratings, sparse=True)
+        with rs.profile_stage("similarity"):
+            neighbour_index = rs.build_neighbour_index(uim, n_neighbors=n_neighbors, lsh=lsh_options)
+            rs.build_item_neighbour_index(uim, n_neighbors=n_neighbors, lsh=lsh_options)
+        with rs.profile_stage("recommend"):
+            users = np.random.default_rng(seed).choice(uim["user_ids"], min(recommend_users, len(uim["user_ids"])), replace=False)
+            rs.recommend_movies_knn_batch(uim, neighbour_index, users, k=5, top_n=10)
+        with rs.profile_stage("evaluate"):
+            train_df, test_df = rs.make_train_test(ratings, test_size=0.2, random_state=42)
+            model = rs.fit_user_knn_predictor(train_df, sparse=True, n_neighbors=n_neighbors, lsh=lsh_options)
+            metrics = rs.evaluate_predictor(
+                test_df, lambda u, i: rs.predict_user_knn_batch(model, u, i, k=5), batch=True, verbose=False)
+        report = rs.profiling_report()
+    finally:
+        rs.disable_profiling()
+        os.remove(path)
+
+    stages = {name: {k: report["stages"][name][k] for k in ("wall_s", "cpu_s", "peak_rss_mb")} for name in STAGES}
+    return {
+        "ratings": int(len(ratings)),
+        "users": int(len(uim["user_ids"])),
+        "items": int(len(uim["movie_ids"])),
+        "rmse": metrics["rmse"] if metrics else None,
+        "stages": stages,
+    }
+
+
+def run_scale_isolated(n_ratings: int, work_dir: str, **kwargs) -> dict:
+    """run_scale in a freshly spawned interpreter (peak RSS only ever grows within a process)."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_scale, n_ratings, work_dir, **kwargs).result()
+
+
+def machine_info() -> dict:
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def machine_differences(results: dict, baseline: dict) -> dict:
+    """{key: (baseline value, current value)} for the MACHINE_KEYS that differ."""
+    old, new = baseline.get("machine", {}), results.get("machine", {})
+    return {key: (old.get(key), new.get(key)) for key in MACHINE_KEYS if old.get(key) != new.get(key)}
+
+
+# ==========================================================
+# BASELINE COMPARISON
+# ==========================================================
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = 0.25, min_seconds: float = 0.05) -> list:
+    """
+    Stages slower than baseline by more than `tolerance` (fraction) and at least `min_seconds`.
+    Scales or stages missing from the baseline are skipped. Returns a list of regression dicts.
+    A baseline from a different machine (see machine_differences) is not compared: that
+    warns and returns no regressions.
+    """
+    differences = machine_differences(results, baseline)
+    if differences:
+        warnings.warn(f"baseline was recorded on a different machine ({_describe_differences(differences)}); "
+                      "timings are not comparable, skipping the comparison")
+        return []
+
+    regressions = []
+    for scale, result in results["scales"].items():
+        base = baseline.get("scales", {}).get(scale)
+        if base is None:
+            continue
+        for stage, rec in result["stages"].items():
+            if stage not in base["stages"]:
+                continue
+            old, new = base["stages"][stage]["wall_s"], rec["wall_s"]
+            if new > old * (1 + tolerance) and new - old >= min_seconds:
+                regressions.append({"scale": scale, "stage": stage, "baseline_s": old, "current_s": new, "ratio": new / old})
+    return regressions
+
+
+def _describe_differences(differences: dict) -> str:
+    return ", ".join(f"{key}: {old!r} -> {new!r}" for key, (old, new) in differences.items())
+
+
+def print_results(results: dict, baseline: dict = None) -> None:
+    for scale, result in results["scales"].items():
+        base = (baseline or {}).get("scales", {}).get(scale, {}).get("stages", {})
+        print(f"\n{scale}: {result['ratings']:,} ratings, {result['users']:,} users x {result['items']:,} items"
+              + (f", RMSE {result['rmse']:.4f}" if result["rmse"] is not None else ""))
+        print(f"{'stage':<12} {'wall s':>9} {'cpu s':>9} {'peak RSS MB':>12} {'baseline s':>11} {'ratio':>7}")
+        for stage, rec in result["stages"].items():
+            old = base.get(stage, {}).get("wall_s")
+            ratio = f"{rec['wall_s'] / old:>6.2f}x" if old else f"{'-':>7}"
+            old_text = f"{old:>11.3f}" if old else f"{'-':>11}"
+            print(f"{stage:<12} {rec['wall_s']:>9.3f} {rec['cpu_s']:>9.3f} {rec['peak_rss_mb'] or 0:>12.1f} {old_text} {ratio}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage timings at synthetic scales, compared with a stored baseline")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated rating counts, e.g. 100k,1M,10M,25M")
+    parser.add_argument("--lsh", action="store_true", help="approximate neighbours (needed for 10M+ in reasonable time)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a stage counts as a regression")
+    parser.add_argument("--json", default=None, help="also write the results here")
+    parser.add_argument("--work-dir", default=None, help="where the synthetic CSVs are written (default: a temp dir)")
+    args = parser.parse_args()
+
+    results = {
+        "machine": machine_info(),
+        "lsh": args.lsh,
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        for scale in args.scales.split(","):
+            t0 = time.perf_counter()
+            results["scales"][scale.strip()] = run_scale_isolated(parse_scale(scale), work_dir, lsh=args.lsh)
+            print(f"[{scale.strip()}] done in {time.perf_counter() - t0:.1f}s (including data generation)")
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        differences = machine_differences(results, baseline)
+        if baseline.get("lsh") != args.lsh:
+            print(f"(baseline was recorded with lsh={baseline.get('lsh')}; not comparable, skipping comparison)")
+            baseline = None
+        elif differences:
+            print(f"(baseline was recorded on a different machine: {_describe_differences(differences)};"
+                  " not comparable, skipping comparison - record one here with --save-baseline)")
+            baseline = None
+    elif not args.save_baseline:
+        print(f"(no baseline at {args.baseline}; record one here with --save-baseline)")
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+    elif baseline is not None:
+        regressions = compare_to_baseline(results, baseline, tolerance=args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for r in regressions:
+                print(f"  {r['scale']} {r['stage']}: {r['baseline_s']:.3f}s -> {r['current_s']:.3f}s ({r['ratio']:.2f}x)")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
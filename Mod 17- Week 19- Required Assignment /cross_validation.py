@@ -0,0 +1,205 @@
+"""
+Parallel cross-validation of the User-KNN model and the popularity baseline.
+
+The ratings columns (and each row's fold number) are copied into shared memory once;
+worker processes attach to them by name instead of receiving pickled copies, fit both
+models on the fold's train rows and score the held-out rows. Each worker is limited to
+one BLAS/OpenMP thread so N folds on N cores run side by side without oversubscription.
+
+Run:
+    python3 cross_validation.py --folds 5 --workers 5
+    python3 cross_validation.py --scheme leave-last-out   # each user's latest rating is the test set
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from recommender_system import (
+    evaluate_predictor,
+    fit_popularity_predictor,
+    fit_user_knn_predictor,
+    load_and_normalize_ratings,
+    predict_popularity_batch,
+    predict_user_knn_batch,
+)
+
+
+# ==========================================================
+# FOLD ASSIGNMENT
+# ==========================================================
+
+FOLD_COLUMNS = ["model", "fold", "mse", "rmse", "coverage", "n", "seconds"]
+
+
+def kfold_assignment(n_rows: int, n_folds: int = 5, seed: int = 42) -> np.ndarray:
+    """Row -> fold number (int32), shuffled and as even as possible."""
+    if not 2 <= n_folds <= n_rows:
+        raise ValueError(f"n_folds must be between 2 and the number of rows ({n_rows}), got {n_folds}")
+    fold = np.empty(n_rows, dtype=np.int32)
+    fold[np.random.default_rng(seed).permutation(n_rows)] = np.arange(n_rows) % n_folds
+    return fold
+
+
+def leave_last_out_assignment(ratings: pd.DataFrame) -> np.ndarray:
+    """
+    One fold: each user's most recent rating (by timestamp) is test (0), the rest train (-1).
+    Users with a single rating stay in train only.
+    """
+    order = np.lexsort((ratings["timestamp"].to_numpy(), ratings["user_id"].to_numpy()))
+    users = ratings["user_id"].to_numpy()[order]
+    last = np.append(users[1:] != users[:-1], True)     # last row of each user's run
+    first = np.insert(users[1:] != users[:-1], 0, True)
+    fold = np.full(len(ratings), -1, dtype=np.int32)
+    fold[order[last & ~first]] = 0
+    return fold
+
+
+# ==========================================================
+# SHARED-MEMORY RATINGS
+# ==========================================================
+
+_WORKER_ARRAYS = {}   # column -> ndarray view of shared memory (set in each worker)
+_WORKER_SHM = []
+
+
+def _share_arrays(arrays: dict):
+    """Copy arrays into new shared-memory blocks; returns (blocks, {name: (block name, dtype, shape)})."""
+    blocks, spec = [], {}
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+        blocks.append(shm)
+        spec[name] = (shm.name, values.dtype.str, values.shape)
+    return blocks, spec
+
+
+def _attach_worker(spec: dict, single_thread: bool = True) -> None:
+    """Pool initializer: map the shared blocks (no copy) and keep BLAS to one thread per process."""
+    for name, (shm_name, dtype, shape) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _WORKER_SHM.append(shm)
+        _WORKER_ARRAYS[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    if single_thread:
+        threadpool_limits(1)
+
+
+def _detach_worker() -> None:
+    _WORKER_ARRAYS.clear()
+    while _WORKER_SHM:
+        _WORKER_SHM.pop().close()
+
+
+def _run_fold(fold: int, sparse: bool, n_neighbors: int, k: int) -> list:
+    """Fit both models on rows whose fold != `fold` and score the rows whose fold == `fold`."""
+    is_test = _WORKER_ARRAYS["fold"] == fold
+    columns = {c: _WORKER_ARRAYS[c] for c in ("user_id", "movie_id", "rating")}
+    train_df = pd.DataFrame({c: v[~is_test] for c, v in columns.items()})
+    test_df = pd.DataFrame({c: v[is_test] for c, v in columns.items()})
+
+    results = []
+    t0 = time.perf_counter()
+    user_knn_model = fit_user_knn_predictor(train_df, sparse=sparse, n_neighbors=n_neighbors)
+    metrics = evaluate_predictor(
+        test_df, lambda u, i: predict_user_knn_batch(user_knn_model, u, i, k=k, weighted=True),
+        name="User-KNN", batch=True, verbose=False)
+    results.append({"model": "User-KNN", "fold": fold, **(metrics or {}), "seconds": time.perf_counter() - t0})
+
+    t0 = time.perf_counter()
+    popularity_model = fit_popularity_predictor(train_df)
+    metrics = evaluate_predictor(
+        test_df, lambda u, i: predict_popularity_batch(popularity_model, u, i),
+        name="Popularity Baseline", batch=True, verbose=False)
+    results.append({"model": "Popularity Baseline", "fold": fold, **(metrics or {}), "seconds": time.perf_counter() - t0})
+    return results
+
+
+# ==========================================================
+# CROSS-VALIDATION
+# ==========================================================
+
+def cross_validate(
+    ratings: pd.DataFrame,
+    n_folds: int = 5,
+    scheme: str = "kfold",
+    n_workers: Optional[int] = None,
+    sparse: bool = True,
+    n_neighbors: int = 50,
+    k: int = 5,
+    seed: int = 42,
+) -> dict:
+    """
+    Evaluate User-KNN and the popularity baseline on every fold, folds in parallel.
+      scheme="kfold": n_folds shuffled row folds (each row is tested exactly once).
+      scheme="leave-last-out": one fold, each user's latest rating (needs a timestamp column).
+    n_workers: processes (default min(folds, CPUs)); 1 runs the folds in this process.
+
+    Returns {"folds": per-fold DataFrame (model, fold, mse, rmse, coverage, n, seconds),
+             "summary": per-model mean/std of mse, rmse, coverage, "wall_seconds": float}.
+    """
+    if scheme == "kfold":
+        fold = kfold_assignment(len(ratings), n_folds, seed)
+        folds = list(range(n_folds))
+    elif scheme == "leave-last-out":
+        if "timestamp" not in ratings:
+            raise ValueError("leave-last-out needs a timestamp column (load_and_normalize_ratings(..., include_timestamp=True))")
+        fold = leave_last_out_assignment(ratings)
+        folds = [0]
+    else:
+        raise ValueError(f"Unknown scheme: {scheme!r} (use 'kfold' or 'leave-last-out')")
+
+    arrays = {c: ratings[c].to_numpy() for c in ("user_id", "movie_id", "rating")}
+    arrays["fold"] = fold
+    n_workers = n_workers or min(len(folds), os.cpu_count() or 1)
+
+    t0 = time.perf_counter()
+    blocks, spec = _share_arrays(arrays)
+    try:
+        if n_workers == 1:
+            _attach_worker(spec, single_thread=False)
+            try:
+                rows = [r for f in folds for r in _run_fold(f, sparse, n_neighbors, k)]
+            finally:
+                _detach_worker()
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_attach_worker, initargs=(spec,)) as pool:
+                futures = [pool.submit(_run_fold, f, sparse, n_neighbors, k) for f in folds]
+                rows = [r for fut in futures for r in fut.result()]
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    wall = time.perf_counter() - t0
+
+    # a fold without predictions has no mse/rmse/coverage/n: keep the columns (as NaN) anyway
+    per_fold = pd.DataFrame(rows, columns=FOLD_COLUMNS)
+    summary = per_fold.groupby("model", sort=False)[["mse", "rmse", "coverage"]].agg(["mean", "std"])
+    return {"folds": per_fold, "summary": summary, "wall_seconds": wall}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel cross-validation: User-KNN vs popularity baseline")
+    parser.add_argument("--ratings", default="ratings.csv")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--scheme", choices=["kfold", "leave-last-out"], default="kfold")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per fold, up to the CPU count)")
+    parser.add_argument("--dense", action="store_true", help="use the dense DataFrame backend instead of CSR")
+    args = parser.parse_args()
+
+    ratings = load_and_normalize_ratings(args.ratings, include_timestamp=args.scheme == "leave-last-out")
+    result = cross_validate(ratings, n_folds=args.folds, scheme=args.scheme, n_workers=args.workers, sparse=not args.dense)
+
+    with pd.option_context("display.width", 120, "display.float_format", "{:.4f}".format):
+        print(result["folds"].to_string(index=False))
+        print()
+        print(result["summary"])
+    print(f"\nWall time: {result['wall_seconds']:.2f}s "
+          f"(sum of fold times {result['folds']['seconds'].sum():.2f}s)")
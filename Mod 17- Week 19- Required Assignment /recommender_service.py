@@ -0,0 +1,279 @@
+"""
+Local HTTP service for the recommender: the fitted model is loaded once, Top-N results are
+served from a bounded per-user LRU cache, and posted ratings update the model in place
+(add_ratings) while evicting only the users whose results can change.
+
+Endpoints:
+    GET  /recommendations/<user_id>?n=5&k=5   recommend_movies_knn for a known user
+    POST /recommendations/new-user            {"rated_movies": [...], "n": 5} -> recommend_for_new_user
+    POST /ratings                             {"ratings": [{"user_id", "movie_id", "rating"}, ...]}
+    GET  /stats                               cache size / hit rate, p50 / p99 latency per endpoint
+
+Run:
+    python3 recommender_system.py --sparse --save-model model/
+    python3 recommender_service.py --model model/            # memory-mapped, starts in milliseconds
+    python3 recommender_service.py --ratings ratings.csv     # or fit at startup
+"""
+
+import argparse
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify, request
+
+from recommender_system import (
+    add_ratings,
+    fit_recommender,
+    has_user,
+    load_and_normalize_ratings,
+    load_model,
+    recommend_for_new_user,
+    recommend_movies_knn,
+    user_position,
+)
+
+
+# ==========================================================
+# PER-USER LRU RESULT CACHE
+# ==========================================================
+
+class RecommendationCache:
+    """
+    Bounded LRU of recommendation results. Keys are (user_id, *params) for known users and
+    ("new-user", *params) for cold-start lists, so all of one user's entries can be evicted
+    together. A result computed against an older model version is not stored.
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.keys_by_user = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, version: int, current_version) -> None:
+        with self.lock:
+            if version != current_version():
+                return   # the model changed while this result was computed
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self.keys_by_user.setdefault(key[0], set()).add(key)
+            while len(self.entries) > self.capacity:
+                old_key, _ = self.entries.popitem(last=False)
+                self._forget(old_key)
+
+    def evict_users(self, users) -> int:
+        """Drop every entry of the given user ids (or "new-user"); returns how many entries went."""
+        removed = 0
+        with self.lock:
+            for user in users:
+                for key in self.keys_by_user.pop(user, ()):
+                    if self.entries.pop(key, None) is not None:
+                        removed += 1
+        return removed
+
+    def evict_entries(self, user, predicate) -> int:
+        """Drop the entries of one user id (or "new-user") whose key satisfies predicate; returns how many went."""
+        removed = 0
+        with self.lock:
+            for key in [key for key in self.keys_by_user.get(user, ()) if predicate(key)]:
+                self._forget(key)
+                if self.entries.pop(key, None) is not None:
+                    removed += 1
+        return removed
+
+    def _forget(self, key) -> None:
+        keys = self.keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_user[key[0]]
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {"size": len(self.entries), "capacity": self.capacity, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": self.hits / total if total else None}
+
+
+# ==========================================================
+# SERVICE (FLASK APP FACTORY)
+# ==========================================================
+
+def _positive_int(value, default: int) -> int:
+    """A query-string or JSON count: default when absent, otherwise an int >= 1 or its digits (ValueError if not)."""
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"expected a positive integer, got {value!r}")
+    number = int(value)   # "abc" / "2.5" raise ValueError too
+    if number < 1:
+        raise ValueError(f"expected a positive integer, got {value!r}")
+    return number
+
+
+def create_app(model: dict, cache_size: int = 10_000, latency_window: int = 10_000) -> Flask:
+    """
+    Flask app around a fit_recommender() / load_model() model. Reads use whichever model
+    object is current when the request starts; POST /ratings updates a shallow copy and
+    swaps it in (add_ratings only rebinds keys), so readers never see a half-applied batch.
+    The model and its version are one tuple, swapped in a single assignment, so a reader
+    always gets a matching pair.
+    """
+    app = Flask(__name__)
+    state = {"current": (model, 0)}   # (model, version)
+    write_lock = threading.Lock()
+    cache = RecommendationCache(cache_size)
+    latencies = {}
+
+    def record_latency(endpoint: str, started: float) -> None:
+        latencies.setdefault(endpoint, deque(maxlen=latency_window)).append((time.perf_counter() - started) * 1000)
+
+    def as_items(recs: pd.Series) -> list:
+        return [{"movie_id": int(m), "score": float(s)} for m, s in recs.items()]
+
+    # --- Known users: user-based KNN ---
+    @app.route('/recommendations/<int:user_id>')
+    def user_recommendations(user_id):
+        started = time.perf_counter()
+        try:
+            n = _positive_int(request.args.get('n'), 5)
+            k = _positive_int(request.args.get('k'), 5)
+        except ValueError as e:
+            record_latency("user", started)
+            return jsonify({"error": f"n and k must be positive integers ({e})"}), 400
+        key = (user_id, "knn", n, k)
+
+        items = cache.get(key)
+        cached = items is not None
+        if not cached:
+            current, version = state["current"]
+            if not has_user(current, user_id):
+                record_latency("user", started)
+                return jsonify({"error": f"unknown user_id {user_id}; use /recommendations/new-user"}), 404
+            try:
+                recs = recommend_movies_knn(current["uim_train"], current["neighbour_index"], user_id, k=k, top_n=n)
+            except ValueError as e:
+                record_latency("user", started)
+                return jsonify({"error": str(e)}), 400
+            items = as_items(recs)
+            cache.put(key, items, version, lambda: state["current"][1])
+
+        record_latency("user", started)
+        return jsonify({"user_id": user_id, "items": items, "cached": cached})
+
+    # --- Cold start: item-based for seed movies, popularity for none ---
+    @app.route('/recommendations/new-user', methods=['POST'])
+    def new_user_recommendations():
+        started = time.perf_counter()
+        body = request.get_json(silent=True) or {}
+        try:
+            rated = sorted({int(m) for m in body.get("rated_movies") or []})
+            n = _positive_int(body.get("n"), 5)
+        except (AttributeError, TypeError, ValueError):
+            record_latency("new-user", started)
+            return jsonify({"error": "expected {\"rated_movies\": [movie ids], \"n\": positive int}"}), 400
+        key = ("new-user", tuple(rated), n)
+
+        items = cache.get(key)
+        cached = items is not None
+        if not cached:
+            current, version = state["current"]
+            recs = recommend_for_new_user(current["popularity"], current["item_index"], rated, top_n=n)
+            items = as_items(recs)
+            cache.put(key, items, version, lambda: state["current"][1])
+
+        record_latency("new-user", started)
+        return jsonify({"rated_movies": rated, "items": items, "cached": cached})
+
+    # --- New ratings: update the model, evict affected users ---
+    @app.route('/ratings', methods=['POST'])
+    def post_ratings():
+        started = time.perf_counter()
+        body = request.get_json(silent=True)
+        records = body.get("ratings") if isinstance(body, dict) else body
+        try:
+            batch = pd.DataFrame(records)[["user_id", "movie_id", "rating"]]
+            batch = batch.astype({"user_id": np.int64, "movie_id": np.int64, "rating": np.float64})
+        except (KeyError, TypeError, ValueError):
+            record_latency("ratings", started)
+            return jsonify({"error": "expected {\"ratings\": [{\"user_id\", \"movie_id\", \"rating\"}, ...]}"}), 400
+        if batch.empty:
+            record_latency("ratings", started)
+            return jsonify({"added": 0, "evicted_users": 0, "evicted_entries": 0})
+
+        with write_lock:
+            current, version = state["current"]
+            updated = dict(current)
+            changed = add_ratings(updated, batch)
+            state["current"] = (updated, version + 1)
+
+            # a user's results change if they rated, their neighbour list changed,
+            # or one of their neighbours rated
+            index = updated["neighbour_index"]
+            raters = user_position(updated, changed["users"])
+            reverse = np.flatnonzero(np.isin(np.asarray(index["neighbours"]), raters).any(axis=1))
+            affected = np.union1d(np.union1d(changed["users"], changed["neighbour_users"]), index["ids"][reverse])
+            evicted = cache.evict_users([int(u) for u in affected])
+
+            # cold-start lists: popularity scores move with every rating, so those always go;
+            # an item-based list only if one of its seeds was rated, or its neighbour list or
+            # a listed neighbour (whose weight is then new) was
+            items = updated["item_index"]
+            reverse = np.isin(items["ids"][np.asarray(items["neighbours"])], changed["movies"]).any(axis=1)
+            stale = set(np.union1d(np.union1d(changed["movies"], changed["neighbour_movies"]),
+                                   items["ids"][reverse]).tolist())
+            evicted += cache.evict_entries("new-user", lambda key: not key[1] or not stale.isdisjoint(key[1]))
+
+        record_latency("ratings", started)
+        return jsonify({"added": int(len(batch)), "evicted_users": int(len(affected)), "evicted_entries": evicted})
+
+    # --- Sizing: cache hit rate + latency percentiles ---
+    @app.route('/stats')
+    def stats():
+        latency = {}
+        for endpoint, samples in list(latencies.items()):
+            values = np.fromiter(samples, dtype=float)
+            if len(values):
+                latency[endpoint] = {"count": int(len(values)), "p50_ms": float(np.percentile(values, 50)),
+                                     "p99_ms": float(np.percentile(values, 99))}
+        current, version = state["current"]
+        return jsonify({
+            "cache": cache.stats(),
+            "latency_ms": latency,
+            "model": {"version": version, "users": int(len(current["uim_train"]["user_ids"])),
+                      "movies": int(len(current["uim_train"]["movie_ids"]))},
+        })
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recommendation HTTP service")
+    parser.add_argument("--model", default=None, help="save_model() directory (memory-mapped at startup)")
+    parser.add_argument("--ratings", default="ratings.csv", help="fit from this CSV when --model is not given")
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    parser.add_argument("--port", type=int, default=5001)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.model:
+        model = load_model(args.model)
+    else:
+        model = fit_recommender(load_and_normalize_ratings(args.ratings))
+    print(f"Model ready in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    create_app(model, cache_size=args.cache_size).run(port=args.port, threaded=True)
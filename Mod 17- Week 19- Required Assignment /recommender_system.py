@@ -7,89 +7,375 @@ Recommender System — Q3 & Q4
     * New user with SOME ratings -> item-based CF (similar items, computed from ratings only)
     * COMPLETELY new user (no ratings) -> popularity baseline
 - Q4 Evaluate Collaborative Filtering (User-KNN) vs Popularity Baseline (MSE/RMSE)
+    * --mf adds a matrix-factorization (ALS) model: fit time, predictions/s and RMSE side by side
 
 Run:
     python3 recommender_system.py
+    python3 recommender_system.py --sparse   # CSR backend, never builds a dense user-item copy
+    python3 recommender_system.py --sparse --save-model model/   # + memory-mappable model for serving
+    python3 recommender_system.py --sparse --profile profile.json [--cprofile-dir prof/]   # per-stage timings
+    python3 recommender_system.py --sparse --mf --incremental   # + ALS in Q4, add_ratings vs a refit
 """
 
+import argparse
+import cProfile
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
 from math import sqrt
 from typing import Optional, List
 
+from peak_rss import peak_rss_mb
+
+
+# =======================================
+# PROFILING (OFF UNLESS enable_profiling)
+# =======================================
+
+_PROFILER = None   # set by enable_profiling(); None = every profile_stage is a pass-through
+
+
+def enable_profiling(cprofile_dir: Optional[str] = None) -> None:
+    """
+    Start recording every profile_stage: calls, wall/CPU seconds, peak RSS and result sizes.
+    cprofile_dir: also dump a cProfile file per outermost stage call (<dir>/<stage>.prof,
+    view with `python -m pstats` or snakeviz).
+    """
+    global _PROFILER
+    if cprofile_dir:
+        os.makedirs(cprofile_dir, exist_ok=True)
+    _PROFILER = {"stages": {}, "cprofile_dir": cprofile_dir, "depth": 0, "started": time.perf_counter()}
+
+
+def disable_profiling() -> None:
+    global _PROFILER
+    _PROFILER = None
+
+
+def profiling_report() -> dict:
+    """Machine-readable summary of the recorded stages (times are inclusive of nested stages)."""
+    if _PROFILER is None:
+        return {"stages": {}}
+    return {
+        "stages": _PROFILER["stages"],
+        "total_wall_s": time.perf_counter() - _PROFILER["started"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def write_profiling_report(path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(profiling_report(), f, indent=2)
+
+
+class profile_stage:
+    """
+    Record a pipeline stage, as a decorator (@profile_stage("build_user_item_matrix"))
+    or a context manager (with profile_stage("q3_demo"): ...). When profiling is off the
+    decorator costs one global check per call and the context manager does nothing.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _PROFILER is None:
+                return fn(*args, **kwargs)
+            with profile_stage(self.name) as stage:   # fresh instance: safe under recursion / threads
+                result = fn(*args, **kwargs)
+                stage.result = result
+                return result
+        return wrapper
+
+    def __enter__(self):
+        self.result = None
+        if _PROFILER is None:
+            return self
+        self._prof = _PROFILER
+        self._cprofile = None
+        if _PROFILER["cprofile_dir"] and _PROFILER["depth"] == 0:   # cProfile cannot nest
+            self._cprofile = cProfile.Profile()
+        _PROFILER["depth"] += 1
+        self._rss0 = peak_rss_mb()
+        self._cpu0, self._wall0 = time.process_time(), time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        prof = getattr(self, "_prof", None)
+        if prof is None:
+            return False
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(os.path.join(prof["cprofile_dir"], f"{self.name}.prof"))
+        wall, cpu = time.perf_counter() - self._wall0, time.process_time() - self._cpu0
+        prof["depth"] -= 1
+        peak = peak_rss_mb()
+
+        rec = prof["stages"].setdefault(self.name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                                    "peak_rss_mb": None, "peak_rss_growth_mb": 0.0})
+        rec["calls"] += 1
+        rec["wall_s"] += wall
+        rec["cpu_s"] += cpu
+        if peak is not None:
+            rec["peak_rss_mb"] = peak
+            rec["peak_rss_growth_mb"] = max(rec["peak_rss_growth_mb"], peak - self._rss0)
+        if self.result is not None:
+            rec["size"] = _describe_size(self.result)
+        self._prof = None
+        return False
+
+
+def _describe_size(obj):
+    """Shapes / nnz / bytes of a stage result (DataFrames, arrays, CSR, and dicts or tuples of them)."""
+    if isinstance(obj, pd.DataFrame):
+        return {"shape": list(obj.shape), "mb": obj.memory_usage(deep=False).sum() / 2**20}
+    if isinstance(obj, pd.Series):
+        return {"shape": [len(obj)]}
+    if sp.issparse(obj):
+        return {"shape": list(obj.shape), "nnz": int(obj.nnz),
+                "mb": (obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes) / 2**20}
+    if isinstance(obj, np.ndarray):
+        return {"shape": list(obj.shape), "mb": obj.nbytes / 2**20}
+    if isinstance(obj, dict):
+        sizes = {k: _describe_size(v) for k, v in obj.items()}
+        return {k: v for k, v in sizes.items() if v is not None} or None
+    if isinstance(obj, tuple):
+        return [_describe_size(v) for v in obj]
+    return None
+
 
 # =======================================
 # 0) DATA LOADING 
 # =======================================
 
-def load_and_normalize_ratings(path: str = "ratings.csv") -> pd.DataFrame:
+RATINGS_COLUMNS = ("user_id", "movie_id", "rating")
+CACHE_VERSION = 1
+
+
+@profile_stage("load_and_normalize_ratings")
+def load_and_normalize_ratings(path: str = "ratings.csv", chunksize: int = 1_000_000, cache: bool = True,
+                               include_timestamp: bool = False) -> pd.DataFrame:
     """
     Loads ratings CSV and standardizes columns to: user_id, movie_id, rating.
     Works with MovieLens headers: userId, movieId, rating, timestamp.
-    """
-    df = pd.read_csv(path)
+    include_timestamp=True also keeps timestamp (int64), e.g. for time-ordered splits.
 
-    # normalize headers
-    df.columns = (
-        df.columns
+    The CSV is parsed chunksize rows at a time and each chunk is narrowed straight to
+    int32 user_id / movie_id and float32 rating, so peak memory is one text chunk plus
+    the compact columns. With cache=True those columns are saved as .npy files in
+    "<path>.cache/" and reused while the CSV's size, mtime and content hash match
+    (and the cache holds every requested column).
+    """
+    columns = RATINGS_COLUMNS + (("timestamp",) if include_timestamp else ())
+    if cache:
+        cached = _read_ratings_cache(path, columns)
+        if cached is not None:
+            return cached
+
+    # normalize headers (header row only)
+    header = pd.read_csv(path, nrows=0).columns
+    names = (
+        header
           .str.strip()
           .str.lower()
           .str.replace(r'[^0-9a-z]+', '_', regex=True)
     )
 
     # map to canonical names
-    if "userid" in df.columns:
-        df = df.rename(columns={"userid": "user_id"})
-    if "movieid" in df.columns:
-        df = df.rename(columns={"movieid": "movie_id"})
+    names = names.map(lambda c: {"userid": "user_id", "movieid": "movie_id"}.get(c, c))
 
     # verify required columns
-    need = {"user_id", "movie_id", "rating"}
-    if not need.issubset(df.columns):
-        raise ValueError(f"ratings.csv must contain userId/user_id, movieId/movie_id, and rating. Found: {list(df.columns)}")
-
-    # keep only required fields
-    df = df[["user_id", "movie_id", "rating"]].copy()
+    need = set(RATINGS_COLUMNS)
+    if not need.issubset(names):
+        raise ValueError(f"ratings.csv must contain userId/user_id, movieId/movie_id, and rating. Found: {list(names)}")
+    if include_timestamp and "timestamp" not in set(names):
+        raise ValueError(f"ratings.csv has no timestamp column. Found: {list(names)}")
+
+    # keep only required fields (by position, so duplicate raw headers cannot confuse usecols)
+    usecols = [list(names).index(c) for c in columns]
+    parts = {c: [] for c in columns}
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize, low_memory=False):
+        chunk.columns = [names[i] for i in sorted(usecols)]
+
+        # coerce & clean
+        cols = {c: pd.to_numeric(chunk[c], errors="coerce").to_numpy(dtype=np.float64) for c in columns}
+        keep = ~np.any([np.isnan(cols[c]) for c in columns], axis=0)
+        for c in columns:
+            parts[c].append(_narrow_ratings_column(c, cols[c][keep]))
+
+    # a chunk whose ids overflow int32 stays int64, and concatenate promotes the rest to match
+    empty = {"user_id": np.int32, "movie_id": np.int32, "rating": np.float32, "timestamp": np.int64}
+    arrays = {c: np.concatenate(parts[c]) if parts[c] else np.empty(0, dtype=empty[c]) for c in columns}
+    del parts
+
+    if cache:
+        _write_ratings_cache(path, arrays)
+    return pd.DataFrame(arrays, copy=False)
+
+
+def _narrow_ratings_column(name: str, values: np.ndarray) -> np.ndarray:
+    """One chunk's float64 column as its compact dtype: int32 ids (int64 if out of range), float32 rating, int64 timestamp."""
+    if name == "rating":
+        return values.astype(np.float32)
+    ids = values.astype(np.int64)
+    if name == "timestamp":
+        return ids
+    fits = len(ids) == 0 or (ids.min() >= np.iinfo(np.int32).min and ids.max() <= np.iinfo(np.int32).max)
+    return ids.astype(np.int32) if fits else ids
+
+
+def _ratings_fingerprint(path: str) -> dict:
+    """Cache key: size + mtime + SHA-1 of the first/last MiB (cheap even for multi-GB files)."""
+    st = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(2**20))
+        if st.st_size > 2**20:
+            f.seek(max(2**20, st.st_size - 2**20))
+            digest.update(f.read())
+    return {"version": CACHE_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": digest.hexdigest()}
+
+
+def _read_ratings_cache(path: str, columns=RATINGS_COLUMNS) -> Optional[pd.DataFrame]:
+    cache_dir = f"{path}.cache"
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+        cached_columns = meta.pop("columns", list(RATINGS_COLUMNS))
+        if meta != _ratings_fingerprint(path) or not set(columns) <= set(cached_columns):
+            return None
+        return pd.DataFrame({c: np.load(os.path.join(cache_dir, f"{c}.npy")) for c in columns})
+    except (OSError, ValueError):
+        return None
 
-    # coerce & clean
-    df["user_id"]  = pd.to_numeric(df["user_id"], errors="coerce").astype("Int64")
-    df["movie_id"] = pd.to_numeric(df["movie_id"], errors="coerce").astype("Int64")
-    df["rating"]   = pd.to_numeric(df["rating"], errors="coerce")
-    df = df.dropna(subset=["user_id", "movie_id", "rating"])
-    df["user_id"]  = df["user_id"].astype(int)
-    df["movie_id"] = df["movie_id"].astype(int)
 
-    return df
+def _write_ratings_cache(path: str, arrays: dict) -> None:
+    """Write <path>.cache/ atomically (temp dir + rename); an unwritable location just skips caching."""
+    cache_dir = f"{path}.cache"
+    try:
+        tmp_dir = tempfile.mkdtemp(prefix=".ratings-cache-", dir=os.path.dirname(os.path.abspath(path)))
+        for c in arrays:
+            np.save(os.path.join(tmp_dir, f"{c}.npy"), arrays[c])
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({**_ratings_fingerprint(path), "columns": list(arrays)}, f)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.replace(tmp_dir, cache_dir)
+    except OSError as e:
+        print(f"(ratings cache not written: {e})")
 
 
 # ==========================================
 # Q3(a) BUILD USER–ITEM (UTILITY) MATRIX
 # ==========================================
 
-def build_user_item_matrix(ratings: pd.DataFrame) -> pd.DataFrame:
+@profile_stage("build_user_item_matrix")
+def build_user_item_matrix(ratings: pd.DataFrame, sparse: bool = False):
     """
     rows   = user_id
     cols   = movie_id
     values = mean rating
     NaN means 'unrated'
+
+    sparse=True returns a dict instead of a DataFrame:
+      {"matrix": CSR (users x movies), "user_ids": int32, "movie_ids": int32}
+    The id arrays are sorted (same order as the pivot_table index/columns) and map
+    row/col positions back to ids. Unrated cells are simply not stored.
     """
+    if sparse:
+        return _build_sparse_user_item_matrix(ratings)
     return ratings.pivot_table(
         index="user_id",
         columns="movie_id",
         values="rating",
         aggfunc="mean"
-    )
+    ).astype(np.float64)  # similarity math in float64 even for float32 ratings
+
+
+def _build_sparse_user_item_matrix(ratings: pd.DataFrame, with_counts: bool = False) -> dict:
+    """
+    CSR version of the pivot: duplicate (user, movie) cells are averaged like aggfunc="mean".
+    with_counts=True also keeps "counts" (int32, aligned with matrix.data) so cell means
+    can be updated incrementally (see add_ratings).
+    """
+    user_ids, u_pos = np.unique(ratings["user_id"].to_numpy(), return_inverse=True)
+    movie_ids, m_pos = np.unique(ratings["movie_id"].to_numpy(), return_inverse=True)
+    values = ratings["rating"].to_numpy(dtype=np.float64)
+    ones = np.ones_like(values)
+
+    matrix, counts = _ratings_to_csr(u_pos, m_pos, values, ones, (len(user_ids), len(movie_ids)))
+    uim = {
+        "matrix": matrix,
+        "user_ids": user_ids.astype(np.int32),
+        "movie_ids": movie_ids.astype(np.int32),
+    }
+    if with_counts:
+        uim["counts"] = counts
+    return uim
+
+
+def _ratings_to_csr(rows, cols, sums, counts, shape):
+    """Per-cell mean CSR + aligned int32 counts; COO -> CSR sums repeated cells, then sum / count."""
+    matrix = sp.coo_matrix((sums, (rows, cols)), shape=shape).tocsr()
+    matrix.sort_indices()
+    if matrix.nnz == len(sums) and np.all(counts == 1):
+        return matrix, np.ones(matrix.nnz, dtype=np.int32)  # no repeated cells: nothing to average
+    cell_counts = sp.coo_matrix((counts, (rows, cols)), shape=shape).tocsr()
+    cell_counts.sort_indices()
+    matrix.data /= cell_counts.data
+    return matrix, cell_counts.data.astype(np.int32)
+
+
+def _positions(ids: np.ndarray, query) -> np.ndarray:
+    """Map ids -> positions in a sorted id array (-1 where the id is unknown)."""
+    query = np.asarray(query)
+    if len(ids) == 0:
+        return np.full(query.shape, -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(ids, query), len(ids) - 1)
+    return np.where(ids[pos] == query, pos, -1)
+
+
+def _rank_desc(scores: pd.Series) -> pd.Series:
+    """
+    Sort high -> low with a deterministic tie-break on id. Scores are compared at
+    12 decimals so float noise between the dense and sparse backends cannot reorder ties.
+    """
+    order = np.lexsort((scores.index.to_numpy(), -scores.round(12).to_numpy()))
+    return scores.iloc[order]
+
+
+def _rows_to_dense(matrix: sp.csr_matrix, rows, cols) -> np.ndarray:
+    """Small dense (rows x cols) block of a CSR matrix, NaN where unrated (mirrors the pivot)."""
+    sub = matrix[rows][:, cols].tocoo()
+    out = np.full(sub.shape, np.nan)
+    out[sub.row, sub.col] = sub.data
+    return out
 
 
 # ==========================================
 # Q3(b) SPARSITY CALCULATION
 # ==========================================
 
-def calc_sparsity(user_item_matrix: pd.DataFrame) -> float:
+def calc_sparsity(user_item_matrix) -> float:
     """Sparsity = 1 - (non-empty cells / total possible cells)."""
+    if isinstance(user_item_matrix, dict):
+        matrix = user_item_matrix["matrix"]
+        return 1.0 - (matrix.nnz / (matrix.shape[0] * matrix.shape[1]))
+
     total = user_item_matrix.shape[0] * user_item_matrix.shape[1]
     non_null = user_item_matrix.count().sum()
     return 1.0 - (non_null / total)
@@ -99,12 +385,34 @@ def calc_sparsity(user_item_matrix: pd.DataFrame) -> float:
 # Similarity Matrices (USER-USER, ITEM-ITEM) for CF
 # ==========================================================
 
-def build_similarity_matrices(user_item_matrix: pd.DataFrame):
+@profile_stage("build_similarity_matrices")
+def build_similarity_matrices(user_item_matrix):
     """
     user_sim_df: user–user cosine similarity (rows/cols = user_id)
     item_sim_df: item–item cosine similarity (rows/cols = movie_id)
     Computed from ratings only (NaN filled with 0 for the math).
+
+    For a sparse user_item_matrix (see build_user_item_matrix(sparse=True)):
+      user_sim = {"matrix": sparse user–user cosine (CSR), "ids": user_ids}
+      item_sim = {"normalized": column-normalized ratings (CSC), "ids": movie_ids}
+    Item similarities are computed on demand (normalized[:, seeds].T @ normalized),
+    so the item–item matrix is never materialized. The user–user matrix is not: it is
+    the full U x U sparse product, and since most users share a movie it is close to
+    dense. Beyond a few tens of thousands of users use build_neighbour_index instead
+    (recommend_movies_knn accepts either), which keeps only K neighbours per user.
     """
+    if isinstance(user_item_matrix, dict):
+        matrix = user_item_matrix["matrix"]
+        user_sim = {
+            "matrix": cosine_similarity(matrix, dense_output=False).tocsr(),
+            "ids": user_item_matrix["user_ids"],
+        }
+        item_sim = {
+            "normalized": normalize(matrix.tocsc(), axis=0),
+            "ids": user_item_matrix["movie_ids"],
+        }
+        return user_sim, item_sim
+
     filled = user_item_matrix.fillna(0.0)
 
     user_sim = cosine_similarity(filled.values)
@@ -116,13 +424,317 @@ def build_similarity_matrices(user_item_matrix: pd.DataFrame):
     return user_sim_df, item_sim_df
 
 
+# ==========================================================
+# Top-K NEIGHBOUR INDEX (built once, O(K) per lookup)
+# ==========================================================
+
+@profile_stage("build_neighbour_index")
+def build_neighbour_index(user_item_matrix, n_neighbors: int = 50, block_rows: int = 1024,
+                          lsh: Optional[dict] = None) -> dict:
+    """
+    Top-K most similar users for every user, computed once:
+      {"ids": user_ids (int32), "neighbours": (U, K) int32 row positions, "weights": (U, K) float32}
+    Cosine similarities are produced block_rows users at a time (never U x U at once),
+    the top-K per row is picked with argpartition, and each row is ordered like
+    _rank_desc (similarity desc, then lower id), self excluded. K = min(n_neighbors, U - 1).
+
+    lsh: None = exact all-pairs cosine; a dict of build_lsh_neighbour_index options
+    (e.g. {"n_tables": 8, "n_bits": 10}, {} for defaults) switches to approximate neighbours
+    once there are at least lsh["min_rows"] users (default LSH_MIN_ROWS); below that exact
+    search is as fast and is used instead.
+    """
+    if isinstance(user_item_matrix, dict):
+        normed = normalize(user_item_matrix["matrix"], axis=1)
+        ids = user_item_matrix["user_ids"]
+    else:
+        normed = normalize(user_item_matrix.fillna(0.0).to_numpy(), axis=1)
+        ids = user_item_matrix.index.to_numpy().astype(np.int32)
+
+    lsh = _lsh_options(lsh, normed.shape[0])
+    if lsh is not None:
+        return build_lsh_neighbour_index(normed, ids, n_neighbors, block_rows=block_rows, **lsh)
+    return _build_top_k_index(normed, ids, n_neighbors, block_rows)
+
+
+@profile_stage("build_item_neighbour_index")
+def build_item_neighbour_index(
+    user_item_matrix,
+    n_neighbors: int = 50,
+    memory_budget_mb: float = 256,
+    out_dir: Optional[str] = None,
+    lsh: Optional[dict] = None,
+) -> dict:
+    """
+    Top-N most similar movies per movie (item–item cosine), for item_based_similar_recs.
+    Same layout as build_neighbour_index with ids = movie_ids. Similarities are computed
+    in float32 row tiles sized to roughly memory_budget_mb, and only the top-N of each
+    tile row is kept, so the full item–item matrix never exists.
+    out_dir: write neighbours/weights/ids as .npy memmaps there (see load_neighbour_index)
+    so several processes can share one copy through the page cache.
+    lsh: approximate neighbours instead, as in build_neighbour_index (same min_rows rule).
+    """
+    if isinstance(user_item_matrix, dict):
+        normed = normalize(user_item_matrix["matrix"].T.tocsr().astype(np.float32), axis=1)
+        ids = user_item_matrix["movie_ids"]
+    else:
+        normed = normalize(user_item_matrix.fillna(0.0).to_numpy(dtype=np.float32).T, axis=1)
+        ids = user_item_matrix.columns.to_numpy().astype(np.int32)
+
+    # per tile row: float32 sims (x2 for the product's transpose) + rounded key + int64 argpartition output
+    bytes_per_row = normed.shape[0] * (4 + 4 + 4 + 8) + normed.shape[1] * 4
+    block_rows = max(1, int(memory_budget_mb * 2**20 // max(bytes_per_row, 1)))
+    lsh = _lsh_options(lsh, normed.shape[0])
+    if lsh is not None:
+        index = build_lsh_neighbour_index(normed, ids, n_neighbors, **lsh)
+        if out_dir is None:
+            return index
+        os.makedirs(out_dir, exist_ok=True)
+        for name in ("ids", "neighbours", "weights"):
+            np.save(os.path.join(out_dir, f"{name}.npy"), index[name])
+        return load_neighbour_index(out_dir)
+    return _build_top_k_index(normed, ids, n_neighbors, block_rows, out_dir=out_dir)
+
+
+def load_neighbour_index(path: str, mmap_mode: Optional[str] = "r") -> dict:
+    """Open a neighbour index written with out_dir=...; arrays stay memory-mapped (mmap_mode=None loads them)."""
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ("ids", "neighbours", "weights")}
+
+
+def _build_top_k_index(normed, ids: np.ndarray, n_neighbors: int, block_rows: int, out_dir: Optional[str] = None) -> dict:
+    """Blocked top-K cosine neighbours of the rows of an L2-normalized (dense or CSR) matrix."""
+    n_rows = normed.shape[0]
+    k = max(0, min(n_neighbors, n_rows - 1))
+
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+        np.save(os.path.join(out_dir, "ids.npy"), np.asarray(ids, dtype=np.int32))
+        neighbours = np.lib.format.open_memmap(os.path.join(out_dir, "neighbours.npy"), mode="w+", dtype=np.int32, shape=(n_rows, k))
+        weights = np.lib.format.open_memmap(os.path.join(out_dir, "weights.npy"), mode="w+", dtype=np.float32, shape=(n_rows, k))
+    else:
+        neighbours = np.empty((n_rows, k), dtype=np.int32)
+        weights = np.empty((n_rows, k), dtype=np.float32)
+
+    if k > 0:
+        for start in range(0, n_rows, block_rows):
+            stop = min(start + block_rows, n_rows)
+            if sp.issparse(normed):
+                # sparse @ dense tile is much faster than a sparse @ sparse product with a dense result
+                sims = np.ascontiguousarray((normed @ normed[start:stop].T.toarray()).T)
+            else:
+                sims = normed[start:stop] @ normed.T
+            sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # never your own neighbour
+            pos, vals = _top_k_rows(sims, k)
+            neighbours[start:stop] = pos
+            weights[start:stop] = vals
+
+    if out_dir is not None:
+        neighbours.flush()
+        weights.flush()
+        return load_neighbour_index(out_dir)
+    return {"ids": ids, "neighbours": neighbours, "weights": weights}
+
+
+def _top_k_rows(sims: np.ndarray, k: int):
+    """Per-row top-k (positions, values) via argpartition; ties broken by lower position."""
+    key = np.round(sims, 12) if sims.dtype == np.float64 else sims  # float32 is already coarser
+    pos = np.argpartition(-key, k - 1, axis=1)[:, :k]
+    picked = np.take_along_axis(key, pos, axis=1)
+
+    # a tie straddling the k-th slot makes argpartition's choice arbitrary: settle those rows exactly
+    kth = picked.min(axis=1, keepdims=True)
+    straddle = (key == kth).sum(axis=1) != (picked == kth).sum(axis=1)
+    for r in np.flatnonzero(straddle):
+        above = np.flatnonzero(key[r] > kth[r])
+        ties = np.flatnonzero(key[r] == kth[r])[:k - len(above)]  # lowest positions win
+        pos[r] = np.concatenate([above, ties])
+    picked = np.take_along_axis(key, pos, axis=1)
+
+    order = np.lexsort((pos, -picked), axis=-1)
+    pos = np.take_along_axis(pos, order, axis=1)
+    return pos, np.take_along_axis(sims, pos, axis=1)
+
+
+def _is_neighbour_index(obj) -> bool:
+    return isinstance(obj, dict) and "neighbours" in obj
+
+
+# ==========================================================
+# APPROXIMATE NEIGHBOURS (RANDOM-PROJECTION LSH)
+# ==========================================================
+
+# Below this many rows exact search is faster than LSH on MovieLens-shaped ratings
+# (ann_benchmark.py, default options: 10k users 0.4x at recall 0.99, 40k users 1.3x at
+# recall 0.94; 8 tables trade recall for speed, 2.1x at 0.82). Break-even is about 30k.
+LSH_MIN_ROWS = 30_000
+
+
+def _lsh_options(lsh: Optional[dict], n_rows: int) -> Optional[dict]:
+    """build_lsh_neighbour_index options for an lsh= argument, or None where exact search is used."""
+    if lsh is None:
+        return None
+    options = dict(lsh)
+    return options if n_rows >= options.pop("min_rows", LSH_MIN_ROWS) else None
+
+
+def build_lsh_neighbour_index(
+    normed,
+    ids: np.ndarray,
+    n_neighbors: int = 50,
+    n_tables: int = 16,
+    n_bits: Optional[int] = None,
+    n_components: int = 16,
+    seed: int = 0,
+    block_rows: int = 4096,
+) -> dict:
+    """
+    Approximate top-K cosine neighbours of the rows of an L2-normalized (dense or CSR) matrix.
+    Each of n_tables hash tables buckets rows by the signs of n_bits random projections;
+    similarities are computed exactly, but only between rows that share a bucket, and the
+    best K over all tables are kept. Same layout as build_neighbour_index, plus "lsh" (the
+    hash tables) so query_lsh_neighbours can look up vectors that are not in the index.
+
+    The projections are random directions inside the top n_components singular vectors of
+    the rows (0 = over all columns). True neighbours of sparse rating rows often have a
+    cosine of only ~0.2, which random planes over all columns barely tell apart from
+    unrelated rows; in the principal subspace they are much closer, so they share buckets.
+
+    Tuning: more tables -> higher recall, proportionally slower build/query; more bits ->
+    smaller buckets, faster but lower recall. n_bits=None picks buckets of about 8*K rows.
+    Rows that found fewer than K neighbours are topped up from the lowest row positions.
+    """
+    n_rows = normed.shape[0]
+    k = max(0, min(n_neighbors, n_rows - 1))
+    if n_bits is None:
+        n_bits = max(1, int(round(np.log2(max(n_rows, 1) / (8 * max(k, 1))))))
+    rng = np.random.default_rng(seed)
+    planes = _lsh_planes(normed, n_tables * n_bits, n_components, rng)
+
+    codes = _lsh_codes(normed, planes, n_tables, n_bits)                  # (n, T)
+    order = np.argsort(codes, axis=0, kind="stable").T.astype(np.int32)   # (T, n) rows by bucket
+    tables = {"planes": planes, "order": order, "codes": np.take_along_axis(codes.T, order, axis=1)}
+
+    neighbours, weights = _lsh_top_k(normed, codes, normed, tables, k, block_rows, same_rows=True)
+    return {"ids": ids, "neighbours": neighbours, "weights": weights, "lsh": tables}
+
+
+def query_lsh_neighbours(index: dict, normed, vectors, k: int, block_rows: int = 4096):
+    """
+    Approximate top-k neighbours (row positions, float32 cosine) among the rows of `normed`
+    for new L2-normalized vectors with the same columns, using the tables of an LSH index.
+    """
+    tables = index["lsh"]
+    n_tables = tables["order"].shape[0]
+    n_bits = tables["planes"].shape[1] // n_tables
+    k = max(0, min(k, normed.shape[0]))
+    codes = _lsh_codes(vectors, tables["planes"], n_tables, n_bits)
+    return _lsh_top_k(vectors, codes, normed, tables, k, block_rows, same_rows=False)
+
+
+def _lsh_planes(normed, n_planes: int, n_components: int, rng: np.random.Generator) -> np.ndarray:
+    """(n_cols, n_planes) float32 hyperplane normals, random within the top singular subspace of the rows."""
+    n_components = min(n_components, min(normed.shape) - 1)
+    if n_components < 1:
+        return rng.standard_normal((normed.shape[1], n_planes)).astype(np.float32)
+    _, _, vt = sp.linalg.svds(normed, k=n_components, random_state=rng)
+    return (vt.T @ rng.standard_normal((n_components, n_planes))).astype(np.float32)
+
+
+def _lsh_codes(normed, planes: np.ndarray, n_tables: int, n_bits: int) -> np.ndarray:
+    """(n, n_tables) int64 bucket codes: sign bits of the random projections, packed per table."""
+    bits = np.asarray(normed @ planes) > 0
+    return (bits.reshape(-1, n_tables, n_bits) * (1 << np.arange(n_bits, dtype=np.int64))).sum(axis=2)
+
+
+def _lsh_top_k(queries, q_codes: np.ndarray, base, tables: dict, k: int, block_rows: int, same_rows: bool):
+    """Best k base rows per query over all tables' shared buckets, as (n_queries, k) positions/weights."""
+    n_queries, n_base = queries.shape[0], base.shape[0]
+    neighbours = np.full((n_queries, k), -1, dtype=np.int64)
+    weights = np.full((n_queries, k), -np.inf)
+    if k == 0:
+        return neighbours.astype(np.int32), weights.astype(np.float32)
+
+    for t in range(q_codes.shape[1]):
+        found = _bucket_top_k(queries, q_codes[:, t], base, tables["order"][t], tables["codes"][t],
+                              k, block_rows, same_rows)
+        neighbours, weights = _merge_top_k_rows(neighbours, weights, *found, k)
+
+    # rows whose buckets were too small: top up from the lowest positions (with their true cosine)
+    short = np.flatnonzero(np.isinf(weights[:, -1]))
+    if len(short):
+        fill = np.broadcast_to(np.arange(min(k + 1, n_base)), (len(short), min(k + 1, n_base)))
+        dots = _pair_dots(queries, base, np.repeat(short, fill.shape[1]), fill.ravel()).reshape(fill.shape)
+        if same_rows:
+            dots[fill == short[:, None]] = -np.inf
+        neighbours[short], weights[short] = _merge_top_k_rows(neighbours[short], weights[short],
+                                                              fill, np.round(dots, 12), k)
+    return neighbours.astype(np.int32), weights.astype(np.float32)
+
+
+def _bucket_top_k(queries, q_codes: np.ndarray, base, base_order: np.ndarray, base_codes: np.ndarray,
+                  k: int, block_rows: int, same_rows: bool):
+    """One table: exact cosine between queries and base rows in the same bucket; top-k per query (-inf padded)."""
+    neighbours = np.full((queries.shape[0], k), -1, dtype=np.int64)
+    weights = np.full((queries.shape[0], k), -np.inf)
+
+    q_order = np.argsort(q_codes, kind="stable")
+    bucket_codes, q_start = np.unique(q_codes[q_order], return_index=True)
+    q_stop = np.append(q_start[1:], len(q_order))
+    b_start = np.searchsorted(base_codes, bucket_codes, side="left")
+    b_stop = np.searchsorted(base_codes, bucket_codes, side="right")
+
+    # permute once so every bucket is a contiguous slice
+    q_perm, b_perm = queries[q_order], base[base_order]
+    for qs, qe, bs, be in zip(q_start, q_stop, b_start, b_stop):
+        if be == bs:
+            continue
+        b_rows = base_order[bs:be]
+        b_tile = b_perm[bs:be].T
+        kk = min(k, be - bs)
+        for start in range(qs, qe, block_rows):
+            stop = min(start + block_rows, qe)
+            sims = q_perm[start:stop] @ b_tile
+            sims = sims.toarray() if sp.issparse(sims) else np.asarray(sims)
+            q_rows = q_order[start:stop]
+            if same_rows:
+                sims[q_rows[:, None] == b_rows[None, :]] = -np.inf   # never your own neighbour
+            pos = np.argpartition(-sims, kk - 1, axis=1)[:, :kk] if kk < be - bs else np.broadcast_to(np.arange(kk), sims.shape)
+            neighbours[q_rows, :kk] = b_rows[pos]
+            weights[q_rows, :kk] = np.round(np.take_along_axis(sims, pos, axis=1), 12)
+    return neighbours, weights
+
+
+def _merge_top_k_rows(pos_a: np.ndarray, w_a: np.ndarray, pos_b: np.ndarray, w_b: np.ndarray, k: int):
+    """Row-wise union of two candidate lists, deduplicated, best k ordered like _rank_desc (-inf = empty slot)."""
+    pos = np.concatenate([pos_a, pos_b], axis=1)
+    w = np.concatenate([w_a, w_b], axis=1)
+    order = np.argsort(pos, axis=1, kind="stable")
+    pos, w = np.take_along_axis(pos, order, axis=1), np.take_along_axis(w, order, axis=1)
+    w[:, 1:][pos[:, 1:] == pos[:, :-1]] = -np.inf   # a pair always gets the same cosine: drop repeats
+    order = np.argsort(-w, axis=1, kind="stable")[:, :k]   # stable: equal weights keep the lower position first
+    return np.take_along_axis(pos, order, axis=1), np.take_along_axis(w, order, axis=1)
+
+
+def _pair_dots(a, b, ai: np.ndarray, bj: np.ndarray, chunk: int = 200_000) -> np.ndarray:
+    """Row-wise dot products a[ai[p]] . b[bj[p]] for every pair p, in bounded chunks."""
+    out = np.empty(len(ai))
+    for start in range(0, len(ai), chunk):
+        i, j = ai[start:start + chunk], bj[start:start + chunk]
+        if sp.issparse(a):
+            out[start:start + chunk] = np.asarray(a[i].multiply(b[j]).sum(axis=1)).ravel()
+        else:
+            out[start:start + chunk] = np.einsum("ij,ij->i", a[i], b[j])
+    return out
+
+
 # ==========================================================
 # Q3(c) USER-BASED KNN RECOMMENDATIONS (COSINE, WEIGHTED)
 # ==========================================================
 
+@profile_stage("recommend_movies_knn")
 def recommend_movies_knn(
-    user_item_matrix: pd.DataFrame,
-    user_sim_df: pd.DataFrame,
+    user_item_matrix,
+    user_sim_df,
     user_id: int,
     k: int = 5,
     top_n: int = 5,
@@ -133,16 +745,21 @@ def recommend_movies_knn(
     2) Aggregate their ratings for movies target user hasn't rated:
        - similarity-weighted average (default) or simple mean.
     3) Return Top-N highest-scoring movies.
+
+    Accepts the dense DataFrames or the sparse dicts from build_user_item_matrix /
+    build_similarity_matrices; both return the same recommendations.
+    user_sim_df may also be a build_neighbour_index() result (then k <= its K).
     """
+    if isinstance(user_item_matrix, dict):
+        return _recommend_movies_knn_sparse(user_item_matrix, user_sim_df, user_id, k, top_n, weighted)
+
     if user_id not in user_item_matrix.index:
         raise ValueError(f"user_id {user_id} not found in user_item_matrix.")
 
-    sims = user_sim_df.loc[user_id].drop(index=user_id).sort_values(ascending=False)
-    if sims.empty:
+    neighbours = _knn_neighbours(user_sim_df, user_id, user_item_matrix.index.get_loc(user_id), k)
+    if neighbours.empty:
         return pd.Series(dtype=float)
 
-    k_eff = min(k, len(sims))
-    neighbours = sims.iloc[:k_eff]
     neigh_ratings = user_item_matrix.loc[neighbours.index]
 
     already_rated = user_item_matrix.loc[user_id].dropna().index
@@ -150,9 +767,64 @@ def recommend_movies_knn(
     if candidate_ratings.shape[1] == 0:
         return pd.Series(dtype=float)
 
+    return _score_candidates(neighbours, candidate_ratings.values, candidate_ratings.columns, top_n, weighted)
+
+
+def _recommend_movies_knn_sparse(uim: dict, user_sim: dict, user_id: int, k: int, top_n: int, weighted: bool) -> pd.Series:
+    """Sparse twin of recommend_movies_knn: only the K neighbour rows are ever densified."""
+    matrix, user_ids, movie_ids = uim["matrix"], uim["user_ids"], uim["movie_ids"]
+    u = int(_positions(user_ids, user_id))
+    if u < 0:
+        raise ValueError(f"user_id {user_id} not found in user_item_matrix.")
+
+    neighbours = _knn_neighbours(user_sim, user_id, u, k)
+    if neighbours.empty:
+        return pd.Series(dtype=float)
+
+    neigh_pos = _positions(user_ids, neighbours.index.to_numpy())
+
+    # candidates = movies some neighbour rated that the target user has not
+    neigh_cols = np.unique(matrix[neigh_pos].indices)
+    already_rated = matrix.indices[matrix.indptr[u]:matrix.indptr[u + 1]]
+    cand_cols = np.setdiff1d(neigh_cols, already_rated, assume_unique=True)
+    if len(cand_cols) == 0:
+        return pd.Series(dtype=float)
+
+    R = _rows_to_dense(matrix, neigh_pos, cand_cols)
+    return _score_candidates(neighbours, R, pd.Index(movie_ids[cand_cols], name="movie_id"), top_n, weighted)
+
+
+def _knn_neighbours(user_sim, user_id: int, u: int, k: int) -> pd.Series:
+    """
+    The k nearest users of user_id (row position u) as a Series: neighbour user_id -> similarity.
+    user_sim is a dense similarity DataFrame, a sparse similarity dict, or a neighbour index;
+    only the index avoids touching all U similarities.
+    """
+    if _is_neighbour_index(user_sim):
+        if k > user_sim["neighbours"].shape[1] and user_sim["neighbours"].shape[1] < len(user_sim["ids"]) - 1:
+            raise ValueError(f"k={k} exceeds the neighbour index size ({user_sim['neighbours'].shape[1]}).")
+        neigh = user_sim["neighbours"][u, :k]
+        return pd.Series(user_sim["weights"][u, :k].astype(np.float64),
+                         index=pd.Index(user_sim["ids"][neigh], name="user_id"))
+
+    if isinstance(user_sim, dict):
+        sims = _sparse_user_sims(user_sim, u)
+    else:
+        sims = _rank_desc(user_sim.loc[user_id].drop(index=user_id))
+    return sims.iloc[:min(k, len(sims))]
+
+
+def _sparse_user_sims(user_sim: dict, u: int) -> pd.Series:
+    """One user's similarity row (self dropped, sorted desc) — same Series the dense path builds."""
+    row = user_sim["matrix"].getrow(u).toarray().ravel()
+    sims = pd.Series(row, index=pd.Index(user_sim["ids"], name="user_id"))
+    return _rank_desc(sims.drop(index=user_sim["ids"][u]))
+
+
+def _score_candidates(neighbours: pd.Series, R: np.ndarray, columns, top_n: int, weighted: bool) -> pd.Series:
+    """Aggregate neighbour ratings R (k, M; NaN where unrated) into Top-N scores."""
     if weighted:
         w = neighbours.values.reshape(-1, 1)  # (k, 1)
-        R = candidate_ratings.values          # (k, M), NaN where unrated
         mask = ~np.isnan(R)
 
         weighted_sum = np.nansum(R * w, axis=0)
@@ -161,46 +833,253 @@ def recommend_movies_knn(
         with np.errstate(invalid="ignore", divide="ignore"):
             scores = weighted_sum / weight_total
     else:
-        scores = np.nanmean(candidate_ratings.values, axis=0)
+        scores = np.nanmean(R, axis=0)
+
+    return _rank_desc(pd.Series(scores, index=columns).dropna()).head(top_n)
+
+
+@profile_stage("recommend_movies_knn_batch")
+def recommend_movies_knn_batch(
+    user_item_matrix,
+    neighbour_index: dict,
+    user_ids,
+    k: int = 5,
+    top_n: int = 5,
+    weighted: bool = True,
+    block_users: int = 512,
+):
+    """
+    recommend_movies_knn for many users at once, e.g. precomputing every user's Top-N:
+      (ids, scores) = (len(user_ids), top_n) int32 movie ids / float32 scores, one row per user,
+    ordered like recommend_movies_knn (padded with -1 / NaN when a user has fewer candidates).
+
+    Scores are sparse products: W @ R (neighbour weights x ratings) over W @ rated, where W
+    holds each user's k neighbour weights (from a build_neighbour_index() result). Only the
+    candidate cells (rated by a neighbour, not by the user) are ranked, block_users rows at a time.
+    """
+    matrix, uim_user_ids, movie_ids = _as_csr(user_item_matrix)
+    if k > neighbour_index["neighbours"].shape[1] and neighbour_index["neighbours"].shape[1] < len(neighbour_index["ids"]) - 1:
+        raise ValueError(f"k={k} exceeds the neighbour index size ({neighbour_index['neighbours'].shape[1]}).")
+
+    users = _positions(uim_user_ids, np.asarray(user_ids))
+    if (users < 0).any():
+        raise ValueError(f"user_id {np.asarray(user_ids)[users < 0][0]} not found in user_item_matrix.")
+
+    rated = _sorted_csr(matrix.copy())
+    rated.data = np.ones_like(rated.data)
+    n_users = matrix.shape[0]
+
+    ids = np.full((len(users), top_n), -1, dtype=np.int32)
+    scores = np.full((len(users), top_n), np.nan, dtype=np.float32)
+    for start in range(0, len(users), block_users):
+        block = users[start:start + block_users]
+        neigh = np.asarray(neighbour_index["neighbours"][block, :k])
+        w = np.asarray(neighbour_index["weights"][block, :k], dtype=np.float64) if weighted else np.ones(neigh.shape)
+        rows = np.repeat(np.arange(len(block)), neigh.shape[1])
+        W = sp.csr_matrix((w.ravel(), (rows, neigh.ravel())), shape=(len(block), n_users))
+        W_any = sp.csr_matrix((np.ones(len(rows)), (rows, neigh.ravel())), shape=(len(block), n_users))
+
+        # candidates: movies some neighbour rated ... that the user has not
+        r, c = (W_any @ rated).nonzero()
+        unrated = np.isnan(_csr_gather(_sorted_csr(rated[block]), r, c))
+        r, c = r[unrated], c[unrated]
+        numerator, denominator = _sorted_csr(W @ matrix), _sorted_csr(W @ rated)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pair_scores = _csr_gather(numerator, r, c) / _csr_gather(denominator, r, c)
+
+        block_ids, block_scores = _top_n_pairs(r, c, pair_scores, len(block), top_n, movie_ids)
+        ids[start:start + len(block)] = block_ids
+        scores[start:start + len(block)] = block_scores
+    return ids, scores
+
+
+def _as_csr(user_item_matrix):
+    """(CSR ratings, user_ids, movie_ids) for either user–item matrix form."""
+    if isinstance(user_item_matrix, dict):
+        return user_item_matrix["matrix"], user_item_matrix["user_ids"], user_item_matrix["movie_ids"]
+    values = user_item_matrix.to_numpy(dtype=np.float64)
+    rows, cols = np.nonzero(~np.isnan(values))
+    matrix = sp.csr_matrix((values[rows, cols], (rows, cols)), shape=values.shape)
+    return matrix, user_item_matrix.index.to_numpy(), user_item_matrix.columns.to_numpy()
+
+
+def _sorted_csr(matrix: sp.csr_matrix) -> sp.csr_matrix:
+    """CSR with sorted column indices (as _csr_gather expects)."""
+    matrix.sort_indices()
+    return matrix
+
+
+def _top_n_pairs(rows: np.ndarray, cols: np.ndarray, scores: np.ndarray, n_rows: int, top_n: int, col_ids: np.ndarray):
+    """
+    Per-row Top-N of scored (row, col) candidates (NaN scores dropped) as (n_rows, top_n)
+    int32 ids / float32 scores, ordered like _rank_desc and padded with -1 / NaN.
 
-    return pd.Series(scores, index=candidate_ratings.columns).dropna().sort_values(ascending=False).head(top_n)
+    Rows with more than top_n candidates are cut to their top_n with np.partition (plus
+    any ties at the cut-off) first, so only about n_rows * top_n pairs are fully sorted.
+    """
+    keep = ~np.isnan(scores)
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+    keys = -np.round(scores, 12)
+    if len(rows) > 1 and (rows[1:] < rows[:-1]).any():
+        by_row = np.argsort(rows, kind="stable")
+        rows, cols, scores, keys = rows[by_row], cols[by_row], scores[by_row], keys[by_row]
+
+    bounds = np.searchsorted(rows, np.arange(n_rows + 1))
+    sizes = np.diff(bounds)
+    selected = [np.flatnonzero(np.repeat(sizes <= top_n, sizes))]
+    for row in np.flatnonzero(sizes > top_n):
+        start, stop = bounds[row], bounds[row + 1]
+        cutoff = np.partition(keys[start:stop], top_n - 1)[top_n - 1]
+        selected.append(start + np.flatnonzero(keys[start:stop] <= cutoff))
+    selected = np.concatenate(selected)
+    rows, cols, scores, keys = rows[selected], cols[selected], scores[selected], keys[selected]
+
+    order = np.lexsort((cols, keys, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < top_n
+
+    ids = np.full((n_rows, top_n), -1, dtype=np.int32)
+    out = np.full((n_rows, top_n), np.nan, dtype=np.float32)
+    ids[rows[keep], rank[keep]] = col_ids[cols[keep]]
+    out[rows[keep], rank[keep]] = scores[keep]
+    return ids, out
 
 
 # ==========================================================
 # Q3(d) COLD-START (ITEM-BASED + POPULARITY)
 # ==========================================================
 
-def item_based_similar_recs(item_sim_df: pd.DataFrame, seed_movies: List[int], top_n: int = 5) -> pd.Series:
-    """New user with SOME ratings: recommend items similar to rated ones (from ratings-only item similarities)."""
+@profile_stage("item_based_similar_recs")
+def item_based_similar_recs(item_sim_df, seed_movies: List[int], top_n: int = 5) -> pd.Series:
+    """
+    New user with SOME ratings: recommend items similar to rated ones (from ratings-only item similarities).
+    item_sim_df may be a build_item_neighbour_index() result: each seed then contributes only
+    its top-N neighbours (exact for one seed whenever top_n <= N).
+    """
     if not seed_movies:
         return pd.Series(dtype=float)
 
-    scores = pd.Series(dtype=float)
-    for m in seed_movies:
-        if m in item_sim_df.index:
-            sim_col = item_sim_df[m].drop(index=m, errors="ignore")
-            scores = scores.add(sim_col, fill_value=0.0)
+    if _is_neighbour_index(item_sim_df):
+        return _item_based_similar_recs_index(item_sim_df, seed_movies, top_n)
+    if isinstance(item_sim_df, dict):
+        return _item_based_similar_recs_sparse(item_sim_df, seed_movies, top_n)
 
-    return scores.sort_values(ascending=False).head(top_n)
+    seeds = [m for m in seed_movies if m in item_sim_df.index]
+    if not seeds:
+        return pd.Series(dtype=float)
+
+    # sum of the seed columns, each without its own movie (which stays only if another seed scores it)
+    sim_cols = item_sim_df[seeds].to_numpy(dtype=np.float64, copy=True)
+    seed_pos = item_sim_df.index.get_indexer(seeds)
+    sim_cols[seed_pos, np.arange(len(seeds))] = 0.0
+    present = (item_sim_df.index.to_numpy()[:, None] != np.asarray(seeds)[None, :]).any(axis=1)
+    scores = pd.Series(sim_cols.sum(axis=1)[present], index=item_sim_df.index[present])
+
+    return _rank_desc(scores).head(top_n)
+
+
+def _item_based_similar_recs_sparse(item_sim: dict, seed_movies: List[int], top_n: int) -> pd.Series:
+    """Sparse twin of item_based_similar_recs: only the seed columns of item–item similarity are computed."""
+    normalized, movie_ids = item_sim["normalized"], item_sim["ids"]
+    seeds = _positions(movie_ids, seed_movies)
+    seeds = seeds[seeds >= 0]
+    if len(seeds) == 0:
+        return pd.Series(dtype=float)
+
+    sim_cols = (normalized.T @ normalized[:, seeds]).toarray()  # (M, n_seeds)
+
+    # same accumulation as the dense loop: each seed adds its column without itself
+    scores = np.zeros(len(movie_ids))
+    present = np.zeros(len(movie_ids), dtype=bool)
+    for j, m in enumerate(seeds):
+        col = sim_cols[:, j]
+        col[m] = 0.0
+        scores += col
+        present |= np.arange(len(movie_ids)) != m
+
+    out = pd.Series(scores[present], index=pd.Index(movie_ids[present], name="movie_id"))
+    return _rank_desc(out).head(top_n)
 
 
-def popularity_fallback(ratings: pd.DataFrame, top_n: int = 5) -> pd.Series:
+def _item_based_similar_recs_index(item_index: dict, seed_movies: List[int], top_n: int) -> pd.Series:
+    """Scatter-add each seed's stored top-N neighbour weights (no item–item matrix needed)."""
+    movie_ids = item_index["ids"]
+    seeds = _positions(movie_ids, seed_movies)
+    seeds = seeds[seeds >= 0]
+    if len(seeds) == 0:
+        return pd.Series(dtype=float)
+
+    neigh = np.asarray(item_index["neighbours"][seeds]).ravel()
+    weights = np.asarray(item_index["weights"][seeds], dtype=np.float64).ravel()
+    scores = np.bincount(neigh, weights=weights, minlength=len(movie_ids))
+    present = np.bincount(neigh, minlength=len(movie_ids)) > 0
+
+    out = pd.Series(scores[present], index=pd.Index(movie_ids[present], name="movie_id"))
+    return _rank_desc(out).head(top_n)
+
+
+def item_based_similar_recs_batch(item_index: dict, seed_lists, top_n: int = 5, exclude_seeds: bool = True):
+    """
+    item_based_similar_recs (neighbour-index form) for many new users at once:
+      (ids, scores) = (len(seed_lists), top_n) int32 movie ids / float32 scores, padded with -1 / NaN.
+
+    One sparse product (seeds x items) @ (items x items top-N neighbour weights) scores every
+    list; exclude_seeds=True masks each list's own seed movies (the user already rated them).
+    Unknown seed ids are ignored.
+    """
+    movie_ids = item_index["ids"]
+    n_items = len(movie_ids)
+    neigh = np.asarray(item_index["neighbours"])
+    weights = np.asarray(item_index["weights"], dtype=np.float64)
+    item_rows = np.repeat(np.arange(n_items), neigh.shape[1])
+    N = sp.csr_matrix((weights.ravel(), (item_rows, neigh.ravel())), shape=(n_items, n_items))
+    N_any = sp.csr_matrix((np.ones(len(item_rows)), (item_rows, neigh.ravel())), shape=(n_items, n_items))
+
+    lists = [_positions(movie_ids, np.asarray(list(s or []), dtype=np.int64)) for s in seed_lists]
+    lengths = np.array([len(p) for p in lists])
+    seeds = np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+    rows = np.repeat(np.arange(len(lists)), lengths)
+    known = seeds >= 0
+    S = sp.csr_matrix((np.ones(known.sum()), (rows[known], seeds[known])), shape=(len(lists), n_items))
+
+    r, c = (S @ N_any).nonzero()
+    if exclude_seeds:
+        outside = np.isnan(_csr_gather(_sorted_csr(S), r, c))
+        r, c = r[outside], c[outside]
+    return _top_n_pairs(r, c, _csr_gather(_sorted_csr(S @ N), r, c), len(lists), top_n, movie_ids)
+
+
+def popularity_fallback(ratings, top_n: int = 5) -> pd.Series:
     """
     COMPLETELY new user: recommend 'popular' items using a simple Bayesian-style score:
       score = (C*m + mean*count) / (C + count)
+    ratings may also be a fit_popularity_predictor() model (scores already computed).
     """
+    if isinstance(ratings, dict):
+        scores = pd.Series(ratings["scores"], index=pd.Index(ratings["movie_ids"], name="movie_id"), name="score")
+    else:
+        scores = _popularity_scores(ratings)
+    if len(scores) == 0:
+        return pd.Series(dtype=float)
+    return scores.sort_values(ascending=False).head(top_n)
+
+
+def _popularity_scores(ratings: pd.DataFrame) -> pd.Series:
+    """Bayesian-style popularity score per movie_id (index sorted by movie_id)."""
     by_movie = ratings.groupby("movie_id")["rating"].agg(["mean", "count"])
     if len(by_movie) == 0:
-        return pd.Series(dtype=float)
+        return pd.Series(dtype=float, name="score")
     C = by_movie["count"].median()
     m = ratings["rating"].mean()
     by_movie["score"] = (C * m + by_movie["mean"] * by_movie["count"]) / (C + by_movie["count"])
-    return by_movie["score"].sort_values(ascending=False).head(top_n)
+    return by_movie["score"]
 
 
+@profile_stage("recommend_for_new_user")
 def recommend_for_new_user(
-    ratings: pd.DataFrame,
-    item_sim_df: pd.DataFrame,
+    ratings,
+    item_sim_df,
     rated_movies: Optional[List[int]],
     top_n: int = 5
 ) -> pd.Series:
@@ -226,98 +1105,688 @@ def make_train_test(ratings: pd.DataFrame, test_size: float = 0.2, random_state:
 
 
 # --- Train a user-KNN predictor on TRAIN only ---
-def fit_user_knn_predictor(train_df: pd.DataFrame):
-    uim_train = build_user_item_matrix(train_df)
-    user_sim_df, _ = build_similarity_matrices(uim_train)
-    return {"uim_train": uim_train, "user_sim_df": user_sim_df}
+@profile_stage("fit_user_knn_predictor")
+def fit_user_knn_predictor(train_df: pd.DataFrame, sparse: bool = False, n_neighbors: int = 50,
+                           lsh: Optional[dict] = None):
+    """
+    User-KNN model on TRAIN only. The neighbour index is built once here, so every
+    later prediction reads its K neighbours instead of sorting all U similarities.
+    lsh: approximate neighbours (see build_lsh_neighbour_index) instead of exact cosine.
+    """
+    uim_train = build_user_item_matrix(train_df, sparse=sparse)
+    neighbour_index = build_neighbour_index(uim_train, n_neighbors=n_neighbors, lsh=lsh)
+    return {"uim_train": uim_train, "neighbour_index": neighbour_index}
 
 
 def predict_user_knn(model: dict, user_id: int, movie_id: int, k: int = 5, weighted: bool = True) -> Optional[float]:
-    """Predict a single (user, movie) rating with user-based KNN on TRAIN-only data."""
-    uim = model["uim_train"]
-    sim = model["user_sim_df"]
+    """Predict a single (user, movie) rating with user-based KNN on TRAIN-only data (O(K) lookup)."""
+    preds, covered = predict_user_knn_batch(model, [user_id], [movie_id], k=k, weighted=weighted)
+    return float(preds[0]) if covered[0] else None  # None: unseen in train or no rated neighbours
 
-    if user_id not in uim.index or movie_id not in uim.columns:
-        return None  # unseen in train
 
-    sims = sim.loc[user_id].drop(index=user_id).sort_values(ascending=False)
-    if sims.empty:
-        return None
-
-    k_eff = min(k, len(sims))
-    neighbours = sims.iloc[:k_eff]
-
-    neigh_ratings = uim.loc[neighbours.index, movie_id]
-    mask = ~neigh_ratings.isna()
-    if mask.sum() == 0:
-        return None
+def predict_user_knn_batch(model: dict, user_ids, movie_ids, k: int = 5, weighted: bool = True):
+    """
+    Vectorized predict_user_knn over aligned arrays of user_ids / movie_ids.
+    Returns (predictions, covered): float64 predictions (NaN where not covered) and a
+    bool mask of rows where the model produced a prediction. Neighbour ratings are
+    gathered as one (N, k) block, so there is no per-row Python work.
+    """
+    uim = model["uim_train"]
+    index = model["neighbour_index"]
+    movie_index = uim["movie_ids"] if isinstance(uim, dict) else uim.columns.to_numpy()
+
+    u = _positions(index["ids"], np.asarray(user_ids))
+    m = _positions(movie_index, np.asarray(movie_ids))
+    preds = np.full(len(u), np.nan)
+    known = (u >= 0) & (m >= 0)
+    if not known.any() or index["neighbours"].shape[1] == 0:
+        return preds, np.zeros(len(u), dtype=bool)
+
+    if k > index["neighbours"].shape[1] and index["neighbours"].shape[1] < len(index["ids"]) - 1:
+        raise ValueError(f"k={k} exceeds the neighbour index size ({index['neighbours'].shape[1]}).")
+    neigh = index["neighbours"][u[known], :k]                  # (n, k) row positions
+    w = index["weights"][u[known], :k].astype(np.float64)      # (n, k)
+    if isinstance(uim, dict):
+        r = _csr_gather(uim["matrix"], neigh, m[known][:, None])
+    else:
+        r = uim.to_numpy()[neigh, m[known][:, None]]
+    mask = ~np.isnan(r)
 
     if weighted:
-        w = neighbours[mask].values
-        r = neigh_ratings[mask].values
-        if w.sum() == 0:
-            return None
-        return float((w * r).sum() / w.sum())
+        num = np.where(mask, w * r, 0.0).sum(axis=1)
+        den = np.where(mask, w, 0.0).sum(axis=1)
+        ok = mask.any(axis=1) & (den != 0)
     else:
-        return float(neigh_ratings[mask].mean())
-
-
-def evaluate_predictor(test_df: pd.DataFrame, predict_fn, max_rows: Optional[int] = None, name: str = "model"):
+        num = np.where(mask, r, 0.0).sum(axis=1)
+        den = mask.sum(axis=1)
+        ok = den > 0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        preds[known] = np.where(ok, num / den, np.nan)
+    return preds, ~np.isnan(preds)
+
+
+def _csr_gather(matrix: sp.csr_matrix, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """Vectorized CSR cell lookup for broadcastable rows/cols (NaN where unrated)."""
+    rows, cols = np.broadcast_arrays(rows, cols)
+    n_cols = matrix.shape[1]
+    # rows ascending + sorted column indices within a row -> these keys are globally sorted
+    keys = np.repeat(np.arange(matrix.shape[0], dtype=np.int64), np.diff(matrix.indptr)) * n_cols + matrix.indices
+    query = rows.astype(np.int64) * n_cols + cols
+    out = np.full(rows.shape, np.nan)
+    if len(keys) == 0:
+        return out
+    j = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    hit = keys[j] == query
+    out[hit] = matrix.data[j[hit]]
+    return out
+
+
+# --- Popularity baseline on TRAIN only ---
+@profile_stage("fit_popularity_predictor")
+def fit_popularity_predictor(train_df: pd.DataFrame) -> dict:
+    """
+    Popularity model: {"movie_ids": sorted int32 ids, "scores": float64 Bayesian scores}
+    plus the per-movie rating "sums" / "counts" behind the scores (kept for add_ratings).
+    """
+    movie_ids, m_pos = np.unique(train_df["movie_id"].to_numpy(), return_inverse=True)
+    values = train_df["rating"].to_numpy(dtype=np.float64)
+    model = {
+        "movie_ids": movie_ids.astype(np.int32),
+        "sums": np.bincount(m_pos, weights=values, minlength=len(movie_ids)),
+        "counts": np.bincount(m_pos, minlength=len(movie_ids)).astype(np.int64),
+    }
+    model["scores"] = _bayesian_scores(model["sums"], model["counts"])
+    return model
+
+
+def _bayesian_scores(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """score = (C*m + mean*count) / (C + count), with mean*count = sum; C = median count, m = global mean."""
+    if len(counts) == 0:
+        return np.empty(0)
+    C = np.median(counts)
+    m = sums.sum() / counts.sum()
+    return (C * m + sums) / (C + counts)
+
+
+def predict_popularity(model: dict, user_id: int, movie_id: int) -> Optional[float]:
+    """Popularity score as a proxy rating (same for every user); None for movies unseen in train."""
+    m = int(_positions(model["movie_ids"], movie_id))
+    return float(model["scores"][m]) if m >= 0 else None
+
+
+def predict_popularity_batch(model: dict, user_ids, movie_ids):
+    """Vectorized predict_popularity: (predictions, covered) like predict_user_knn_batch."""
+    m = _positions(model["movie_ids"], np.asarray(movie_ids))
+    covered = m >= 0
+    preds = np.full(len(m), np.nan)
+    preds[covered] = model["scores"][m[covered]]
+    return preds, covered
+
+
+@profile_stage("evaluate_predictor")
+def evaluate_predictor(test_df: pd.DataFrame, predict_fn, max_rows: Optional[int] = None, name: str = "model",
+                       batch: bool = False, verbose: bool = True):
     """
     Iterate over a (possibly sampled) test set and compute MSE / RMSE + coverage.
     Coverage = fraction of rows where the model produced a prediction.
+
+    batch=True: predict_fn(user_ids, movie_ids) -> (predictions, covered) is called once
+    for the whole test set (see predict_user_knn_batch / predict_popularity_batch).
+    verbose=False skips the printed summary line (e.g. inside worker processes).
     """
     rows = test_df if max_rows is None else test_df.sample(n=min(max_rows, len(test_df)), random_state=42)
 
-    y_true, y_pred = [], []
-    skipped = 0
-
-    for _, row in rows.iterrows():
-        u, i, r = int(row["user_id"]), int(row["movie_id"]), float(row["rating"])
-        pred = predict_fn(u, i)
-        if pred is None or np.isnan(pred):
-            skipped += 1
-            continue
-        y_true.append(r)
-        y_pred.append(pred)
+    if batch:
+        preds, covered = predict_fn(rows["user_id"].to_numpy(), rows["movie_id"].to_numpy())
+        covered = covered & ~np.isnan(preds)
+        y_true = rows["rating"].to_numpy(dtype=np.float64)[covered]
+        y_pred = preds[covered]
+        skipped = int(len(rows) - covered.sum())
+    else:
+        y_true, y_pred = [], []
+        skipped = 0
+
+        for _, row in rows.iterrows():
+            u, i, r = int(row["user_id"]), int(row["movie_id"]), float(row["rating"])
+            pred = predict_fn(u, i)
+            if pred is None or np.isnan(pred):
+                skipped += 1
+                continue
+            y_true.append(r)
+            y_pred.append(pred)
 
     if len(y_true) == 0:
-        print(f"[{name}] No predictions produced (likely too cold/sparse).")
+        if verbose:
+            print(f"[{name}] No predictions produced (likely too cold/sparse).")
         return None
 
     mse_val = mean_squared_error(y_true, y_pred)
     rmse_val = sqrt(mse_val)
     coverage = 1 - (skipped / len(rows))
-    print(f"[{name}] N={len(y_true)} | Coverage={coverage:.2%} | MSE={mse_val:.4f} | RMSE={rmse_val:.4f}")
+    if verbose:
+        print(f"[{name}] N={len(y_true)} | Coverage={coverage:.2%} | MSE={mse_val:.4f} | RMSE={rmse_val:.4f}")
     return {"mse": mse_val, "rmse": rmse_val, "coverage": coverage, "n": len(y_true)}
 
 
+# ==========================================================
+# MATRIX FACTORIZATION (ALS) — FAST ALTERNATIVE TO USER-KNN
+# ==========================================================
+
+@profile_stage("fit_mf_predictor")
+def fit_mf_predictor(
+    train_df: pd.DataFrame,
+    n_factors: int = 32,
+    reg: float = 0.1,
+    n_iters: int = 10,
+    seed: int = 0,
+) -> dict:
+    """
+    Biased matrix factorization  r ~ mu + b_u + b_i + p_u . q_i  fitted by alternating least
+    squares on TRAIN only. Each half-step solves every user's (or movie's) small ridge system
+    at once: the Gram matrices come from one sparse product and the stacked (n, d, d)
+    systems go to one np.linalg.solve call. reg is scaled by each row's rating count (ALS-WR).
+
+    Model: {"user_ids", "movie_ids" (sorted int32), "user_factors" (U, f), "item_factors" (I, f),
+            "user_bias" (U,), "item_bias" (I,) — contiguous float32 —, "global_mean",
+            "rating_range", "rated" (train CSR pattern, for masking in recommendations)}.
+    """
+    uim = _build_sparse_user_item_matrix(train_df)
+    by_user = _sorted_csr(uim["matrix"].copy())
+    by_item = _sorted_csr(by_user.T.tocsr())
+    mu = float(by_user.data.mean()) if by_user.nnz else 0.0
+
+    rng = np.random.default_rng(seed)
+    n_users, n_items = by_user.shape
+    P = (0.1 * rng.standard_normal((n_users, n_factors))).astype(np.float32)
+    Q = (0.1 * rng.standard_normal((n_items, n_factors))).astype(np.float32)
+    b_u = np.zeros(n_users, dtype=np.float32)
+    b_i = np.zeros(n_items, dtype=np.float32)
+
+    for _ in range(n_iters):
+        # users: unknowns [p_u, b_u] against fixed [q_i, 1], targets r - mu - b_i
+        P, b_u = _als_half_step(by_user, Q, b_i, mu, reg)
+        Q, b_i = _als_half_step(by_item, P, b_u, mu, reg)
+
+    return {
+        "user_ids": uim["user_ids"],
+        "movie_ids": uim["movie_ids"],
+        "user_factors": np.ascontiguousarray(P),
+        "item_factors": np.ascontiguousarray(Q),
+        "user_bias": b_u,
+        "item_bias": b_i,
+        "global_mean": mu,
+        "rating_range": (float(by_user.data.min()), float(by_user.data.max())) if by_user.nnz else (0.0, 0.0),
+        "rated": by_user,
+    }
+
+
+def _als_half_step(ratings: sp.csr_matrix, fixed: np.ndarray, fixed_bias: np.ndarray, mu: float, reg: float):
+    """
+    Solve every row of `ratings` for [factors, bias] given the other side's factors/biases.
+    All Gram matrices come from one sparse product: rated-indicator @ (per-column x x^T, flattened).
+    """
+    n_rows, d = ratings.shape[0], fixed.shape[1] + 1
+    X = np.hstack([fixed, np.ones((fixed.shape[0], 1), dtype=np.float32)]).astype(np.float64)   # (n_cols, d)
+    counts = np.diff(ratings.indptr)
+
+    indicator = sp.csr_matrix((np.ones(ratings.nnz), ratings.indices, ratings.indptr), shape=ratings.shape)
+    target = sp.csr_matrix((ratings.data - mu - fixed_bias[ratings.indices], ratings.indices, ratings.indptr),
+                           shape=ratings.shape)
+    # Gram matrices are symmetric: compute the upper triangle only, then mirror it with one take
+    iu = np.triu_indices(d)
+    tri_of = np.zeros((d, d), dtype=np.int64)
+    tri_of[iu] = np.arange(len(iu[0]))
+    tri_of = np.maximum(tri_of, tri_of.T)
+    A = np.take(indicator @ (X[:, iu[0]] * X[:, iu[1]]), tri_of.ravel(), axis=1).reshape(n_rows, d, d)
+    b = target @ X
+    A += (reg * np.maximum(counts, 1))[:, None, None] * np.eye(d)   # rows without ratings solve to 0
+
+    out = np.linalg.solve(A, b[:, :, None])[:, :, 0]
+    return out[:, :-1].astype(np.float32), out[:, -1].astype(np.float32)
+
+
+def predict_mf(model: dict, user_id: int, movie_id: int) -> Optional[float]:
+    """One dot product: mu + b_u + b_i + p_u . q_i (clipped to the train rating range); None if unseen."""
+    u = int(_positions(model["user_ids"], user_id))
+    m = int(_positions(model["movie_ids"], movie_id))
+    if u < 0 or m < 0:
+        return None
+    pred = (model["global_mean"] + model["user_bias"][u] + model["item_bias"][m]
+            + float(model["user_factors"][u] @ model["item_factors"][m]))
+    return float(np.clip(pred, *model["rating_range"]))
+
+
+def predict_mf_batch(model: dict, user_ids, movie_ids):
+    """Vectorized predict_mf: (predictions, covered) like predict_user_knn_batch."""
+    u = _positions(model["user_ids"], np.asarray(user_ids))
+    m = _positions(model["movie_ids"], np.asarray(movie_ids))
+    covered = (u >= 0) & (m >= 0)
+    uk, mk = u[covered], m[covered]
+    preds = np.full(len(u), np.nan)
+    dots = np.einsum("ij,ij->i", model["user_factors"][uk], model["item_factors"][mk], dtype=np.float64)
+    preds[covered] = np.clip(model["global_mean"] + model["user_bias"][uk] + model["item_bias"][mk] + dots,
+                             *model["rating_range"])
+    return preds, covered
+
+
+def recommend_movies_mf(model: dict, user_id: int, top_n: int = 5) -> pd.Series:
+    """Top-N unrated movies for a known user: one item_factors @ p_u product, ordered like recommend_movies_knn."""
+    ids, scores = recommend_movies_mf_batch(model, [user_id], top_n=top_n)
+    found = ids[0] >= 0
+    return pd.Series(scores[0][found].astype(np.float64), index=pd.Index(ids[0][found], name="movie_id"))
+
+
+def recommend_movies_mf_batch(model: dict, user_ids, top_n: int = 5, block_users: int = 1024):
+    """
+    Top-N unrated movies for many users: one (block, f) @ (f, I) product per block of users,
+    train-rated movies masked, argpartition per row. Same (ids, scores) layout as
+    recommend_movies_knn_batch.
+    """
+    users = _positions(model["user_ids"], np.asarray(user_ids))
+    if (users < 0).any():
+        raise ValueError(f"user_id {np.asarray(user_ids)[users < 0][0]} not found in the model.")
+
+    n = min(top_n, len(model["movie_ids"]))
+    ids = np.full((len(users), top_n), -1, dtype=np.int32)
+    scores = np.full((len(users), top_n), np.nan, dtype=np.float32)
+    if n == 0:
+        return ids, scores
+    for start in range(0, len(users), block_users):
+        block = users[start:start + block_users]
+        s = model["user_factors"][block] @ model["item_factors"].T
+        s += model["item_bias"][None, :] + (model["global_mean"] + model["user_bias"][block])[:, None]
+        s[model["rated"][block].nonzero()] = -np.inf
+        pos, vals = _top_k_rows(s, n)
+        found = np.isfinite(vals)
+        ids[start:start + len(block), :n] = np.where(found, model["movie_ids"][pos], -1)
+        scores[start:start + len(block), :n] = np.where(found, np.clip(vals, *model["rating_range"]), np.nan)
+    return ids, scores
+
+
+# ==========================================================
+# FITTED MODEL + INCREMENTAL RATING INGESTION
+# ==========================================================
+
+@profile_stage("fit_recommender")
+def fit_recommender(ratings: pd.DataFrame, n_neighbors: int = 50, item_neighbors: int = 50) -> dict:
+    """
+    Everything needed to serve (and later update) recommendations, on the sparse backend:
+      uim_train       sparse user–item dict + per-cell "counts"
+      neighbour_index user top-K (predict_user_knn / recommend_movies_knn)
+      item_index      item top-N (item_based_similar_recs / recommend_for_new_user)
+      user_norms, item_norms  L2 norms of the rating rows / columns
+      popularity      fit_popularity_predictor() stats (popularity_fallback)
+    """
+    uim = _build_sparse_user_item_matrix(ratings, with_counts=True)
+    matrix = uim["matrix"]
+    return {
+        "uim_train": uim,
+        "neighbour_index": build_neighbour_index(uim, n_neighbors=n_neighbors),
+        "item_index": build_item_neighbour_index(uim, n_neighbors=item_neighbors),
+        "user_norms": sp.linalg.norm(matrix, axis=1),
+        "item_norms": sp.linalg.norm(matrix, axis=0),
+        "popularity": fit_popularity_predictor(ratings),
+        "n_neighbors": n_neighbors,
+        "item_neighbors": item_neighbors,
+    }
+
+
+def user_position(model: dict, user_ids):
+    """Row positions of user ids in a fit_recommender() / load_model() model (-1 for unknown users)."""
+    return _positions(model["uim_train"]["user_ids"], user_ids)
+
+
+def has_user(model: dict, user_id: int) -> bool:
+    """Whether the model has ratings (and a neighbour list) for user_id."""
+    return bool(user_position(model, user_id) >= 0)
+
+
+def add_ratings(model: dict, batch) -> dict:
+    """
+    Apply new ratings (DataFrame / records with user_id, movie_id, rating) to a
+    fit_recommender() model in place, without refitting:
+      - ratings merged into the CSR (repeated cells keep a running mean via "counts");
+        unseen users / movies are added to the id maps
+      - norms refreshed for the touched users and movies only
+      - neighbour lists: touched rows are recomputed from their new cosine row; every
+        other row merges the touched rows into its existing top-K, and is recomputed
+        only if a touched neighbour's similarity dropped (it could fall below an unseen row)
+      - popularity sums/counts/scores updated
+    Every structure equals fit_recommender() on the concatenated ratings: matrix, counts,
+    id maps and popularity exactly, norms to rounding, and both neighbour indexes entry for
+    entry, ties included (similarities use the fit's normalized rows and dtypes).
+    Returns {"users", "movies"}: touched ids, and "neighbour_users" / "neighbour_movies": users /
+    movies whose neighbour list (ids or their order) differs from before; rows whose listed
+    neighbours only got new weights are not included.
+    """
+    batch = pd.DataFrame(batch)
+    b_users = batch["user_id"].to_numpy().astype(np.int64)
+    b_movies = batch["movie_id"].to_numpy().astype(np.int64)
+    b_ratings = batch["rating"].to_numpy(dtype=np.float64)
+
+    uim = model["uim_train"]
+    old_users, old_movies = uim["user_ids"], uim["movie_ids"]
+    user_ids = np.union1d(old_users, b_users).astype(np.int32)
+    movie_ids = np.union1d(old_movies, b_movies).astype(np.int32)
+    user_map = np.searchsorted(user_ids, old_users)    # old position -> new position (order preserved)
+    movie_map = np.searchsorted(movie_ids, old_movies)
+
+    # --- ratings: old cells (sum = mean * count) + new ratings, re-averaged per cell
+    old = uim["matrix"].tocoo()
+    old_counts = np.asarray(uim["counts"], dtype=np.float64)
+    matrix, counts = _ratings_to_csr(
+        np.concatenate([user_map[old.row], np.searchsorted(user_ids, b_users)]),
+        np.concatenate([movie_map[old.col], np.searchsorted(movie_ids, b_movies)]),
+        np.concatenate([old.data * old_counts, b_ratings]),
+        np.concatenate([old_counts, np.ones_like(b_ratings)]),
+        (len(user_ids), len(movie_ids)),
+    )
+    model["uim_train"] = {"matrix": matrix, "user_ids": user_ids, "movie_ids": movie_ids, "counts": counts}
+
+    # --- norms: only touched rows / columns change
+    touched_u = np.unique(np.searchsorted(user_ids, b_users))
+    touched_m = np.unique(np.searchsorted(movie_ids, b_movies))
+    user_norms = np.zeros(len(user_ids))
+    user_norms[user_map] = model["user_norms"]
+    user_norms[touched_u] = sp.linalg.norm(matrix[touched_u], axis=1)
+    item_norms = np.zeros(len(movie_ids))
+    item_norms[movie_map] = model["item_norms"]
+    item_t = matrix.T.tocsr()
+    item_norms[touched_m] = sp.linalg.norm(item_t[touched_m], axis=1)
+    model["user_norms"], model["item_norms"] = user_norms, item_norms
+
+    # --- neighbour lists
+    remapped = _remap_index(model["neighbour_index"], user_map, len(user_ids))
+    before = remapped["neighbours"].copy()
+    # similarities come from the same normalized rows (and dtype) the fit builds from, so
+    # ties and float32 weights come out exactly as in a refit
+    model["neighbour_index"] = _update_top_k_index(remapped, normalize(matrix, axis=1), touched_u,
+                                                   model["n_neighbors"], user_ids)
+    changed = _changed_rows(before, model["neighbour_index"]["neighbours"])
+    remapped = _remap_index(model["item_index"], movie_map, len(movie_ids))
+    before = remapped["neighbours"].copy()
+    model["item_index"] = _update_top_k_index(remapped, normalize(item_t.astype(np.float32), axis=1),
+                                              touched_m, model["item_neighbors"], movie_ids)
+    changed_m = _changed_rows(before, model["item_index"]["neighbours"])
+
+    # --- popularity stats (raw ratings, not cell means)
+    pop = model["popularity"]
+    pop_ids = np.union1d(pop["movie_ids"], b_movies).astype(np.int32)
+    pop_map = np.searchsorted(pop_ids, pop["movie_ids"])
+    sums = np.zeros(len(pop_ids))
+    sums[pop_map] = pop["sums"]
+    pop_counts = np.zeros(len(pop_ids), dtype=np.int64)
+    pop_counts[pop_map] = pop["counts"]
+    b_pos = np.searchsorted(pop_ids, b_movies)
+    np.add.at(sums, b_pos, b_ratings)
+    np.add.at(pop_counts, b_pos, 1)
+    model["popularity"] = {"movie_ids": pop_ids, "sums": sums, "counts": pop_counts,
+                           "scores": _bayesian_scores(sums, pop_counts)}
+
+    return {
+        "users": user_ids[touched_u],
+        "movies": movie_ids[touched_m],
+        "neighbour_users": user_ids[changed],
+        "neighbour_movies": movie_ids[changed_m],
+    }
+
+
+def _changed_rows(before: np.ndarray, after: np.ndarray) -> np.ndarray:
+    """Rows whose neighbour ids or order differ; a listed neighbour's new weight alone does not count."""
+    if after.shape != before.shape:
+        return np.arange(len(after))   # K grew: every list got longer
+    return np.flatnonzero((after != before).any(axis=1))
+
+
+def _remap_index(index: dict, row_map: np.ndarray, n_rows: int) -> dict:
+    """Move an index into a grown id space (row_map: old position -> new); new rows start empty (-1)."""
+    k = index["neighbours"].shape[1]
+    neighbours = np.full((n_rows, k), -1, dtype=np.int32)
+    weights = np.full((n_rows, k), -np.inf, dtype=np.float32)
+    neighbours[row_map] = row_map[np.asarray(index["neighbours"])]
+    weights[row_map] = index["weights"]
+    return {"ids": index["ids"], "neighbours": neighbours, "weights": weights}
+
+
+def _cosine_rows_vs_all(normed: sp.csr_matrix, rows: np.ndarray) -> np.ndarray:
+    """(len(rows), n) cosine similarities of the given rows against every row, self = -inf (as in _build_top_k_index)."""
+    sims = np.ascontiguousarray((normed @ normed[rows].T.toarray()).T)
+    sims[np.arange(len(rows)), rows] = -np.inf
+    return sims
+
+
+def _update_top_k_index(index: dict, normed: sp.csr_matrix, touched: np.ndarray,
+                        n_neighbors: int, ids: np.ndarray) -> dict:
+    """Bring a (remapped) top-K index up to date after the rows in `touched` changed (normed: L2-normalized rows)."""
+    n_rows = normed.shape[0]
+    k = max(0, min(n_neighbors, n_rows - 1))
+    if index["neighbours"].shape[1] != k:  # K was capped by the old row count: rebuild
+        return _build_top_k_index(normed, ids, n_neighbors, block_rows=1024)
+    neighbours, weights = index["neighbours"], index["weights"]
+    if k == 0 or len(touched) == 0:
+        return {"ids": ids, "neighbours": neighbours, "weights": weights}
+
+    # 1) touched rows: fresh top-K from their new similarity rows
+    sims_t = _cosine_rows_vs_all(normed, touched)                      # (T, n)
+    neighbours[touched], weights[touched] = _top_k_rows(sims_t, k)
+
+    # 2) other rows: similarity to each touched row is now sims_t[:, row]
+    slot = np.full(n_rows, -1)
+    slot[touched] = np.arange(len(touched))
+    others = np.flatnonzero(slot < 0)
+    if len(others) == 0:
+        return {"ids": ids, "neighbours": neighbours, "weights": weights}
+    # skip rows that list no touched row and that no touched row can enter (below their K-th weight)
+    hit = slot[neighbours[others]] >= 0
+    reach = sims_t[:, others].max(axis=0) >= weights[others][:, -1] - 1e-6
+    others = others[hit.any(axis=1) | reach]
+    if len(others) == 0:
+        return {"ids": ids, "neighbours": neighbours, "weights": weights}
+
+    neigh_o = neighbours[others]
+    old_w = weights[others].astype(np.float64)
+    hit = slot[neigh_o] >= 0
+    new_w = np.where(hit, sims_t[np.maximum(slot[neigh_o], 0), others[:, None]], old_w)
+
+    # unseen rows are bounded by the old K-th weight; a touched neighbour that dropped to
+    # (or below) that bound may now rank under one of them -> recompute that row exactly
+    kth = weights[others][:, -1:]
+    new_w32 = new_w.astype(np.float32)
+    dropped = (hit & (new_w32 < weights[others]) & (new_w32 <= kth)).any(axis=1)
+
+    # otherwise the new top-K lies within (current list ∪ touched rows): merge
+    extra = sims_t[:, others].T.copy()                                  # (O, T)
+    r_idx, c_idx = np.nonzero(hit)
+    extra[r_idx, slot[neigh_o[r_idx, c_idx]]] = -np.inf                # already listed with its new weight
+    cand_pos = np.concatenate([neigh_o, np.broadcast_to(touched, extra.shape)], axis=1)
+    cand_w = np.concatenate([new_w, extra], axis=1)
+    order = np.lexsort((cand_pos, -np.round(cand_w, 12)), axis=-1)     # small rows: full sort, _rank_desc order
+    pick = order[:, :k]
+    neighbours[others] = np.take_along_axis(cand_pos, pick, axis=1)
+    weights[others] = np.take_along_axis(cand_w, pick, axis=1)
+
+    # a float64 fit ranks by the exact similarity, but listed rows only kept a float32 weight:
+    # candidates tied in float32 may rank differently -> recompute those rows exactly too
+    if normed.dtype != np.float32:
+        top = np.take_along_axis(cand_w, order[:, :k + 1], axis=1).astype(np.float32)
+        dropped |= ((top[:, 1:] == top[:, :-1]) & np.isfinite(top[:, 1:])).any(axis=1)
+
+    redo = others[dropped]
+    if len(redo):
+        neighbours[redo], weights[redo] = _top_k_rows(_cosine_rows_vs_all(normed, redo), k)
+    return {"ids": ids, "neighbours": neighbours, "weights": weights}
+
+
+# ==========================================================
+# MODEL PERSISTENCE (MEMORY-MAPPED .npy DIRECTORY)
+# ==========================================================
+
+MODEL_FORMAT_VERSION = 1
+
+
+def save_model(model: dict, path: str) -> str:
+    """
+    Write a fitted model dict (fit_recommender, fit_user_knn_predictor(sparse=True),
+    fit_popularity_predictor, fit_mf_predictor, ...) to directory `path`:
+    one .npy per array (CSR matrices as data/indices/indptr) plus meta.json for the
+    structure and scalars. Written to a temp dir next to `path` and renamed into place, so
+    readers never see a half-written model. An existing `path` is only replaced if it is
+    an earlier save_model directory; anything else raises FileExistsError.
+    """
+    if os.path.lexists(path) and not _is_saved_model(path):
+        raise FileExistsError(f"{path} exists and is not a saved model; not replacing it")
+
+    entries = {}
+    parent = os.path.dirname(os.path.abspath(path))
+    tmp_dir = tempfile.mkdtemp(prefix=".model-", dir=parent)
+    try:
+        _save_entries(model, "", tmp_dir, entries)
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({"version": MODEL_FORMAT_VERSION, "entries": entries}, f, indent=1)
+        if os.path.lexists(path):
+            old_dir = tempfile.mkdtemp(prefix=".model-old-", dir=parent)
+            os.replace(path, old_dir)        # an empty dir can be renamed over
+            try:
+                os.replace(tmp_dir, path)
+            except BaseException:
+                os.replace(old_dir, path)    # put the previous model back
+                raise
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return path
+
+
+def _is_saved_model(path: str) -> bool:
+    """True if `path` is a directory written by save_model (a meta.json with version + entries)."""
+    if os.path.islink(path) or not os.path.isdir(path):
+        return False
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return isinstance(meta, dict) and "version" in meta and "entries" in meta
+
+
+def load_model(path: str, mmap_mode: Optional[str] = "r") -> dict:
+    """
+    Reopen a save_model directory. Arrays are memory-mapped (nothing is parsed or copied),
+    so startup is near-instant and processes loading the same directory share one copy
+    through the OS page cache. mmap_mode: "r" read-only (serving), "c" copy-on-write
+    (private in-memory changes, e.g. add_ratings), None to read everything into memory.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("version") != MODEL_FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported model format {meta.get('version')!r} (expected {MODEL_FORMAT_VERSION})")
+
+    model = {}
+    for key, entry in meta["entries"].items():
+        *parents, name = key.split("/")
+        node = model
+        for p in parents:
+            node = node.setdefault(p, {})
+        node[name] = _load_entry(path, key, entry, mmap_mode)
+    return model
+
+
+def _save_entries(obj: dict, prefix: str, out_dir: str, entries: dict) -> None:
+    for name, value in obj.items():
+        if "/" in str(name):
+            raise ValueError(f"model key {name!r} may not contain '/'")
+        key = f"{prefix}{name}"
+        file = key.replace("/", ".")
+        if isinstance(value, dict):
+            if not value:
+                entries[key] = {"type": "dict"}
+            _save_entries(value, f"{key}/", out_dir, entries)
+        elif sp.issparse(value):
+            value = value.tocsr()
+            for part in ("data", "indices", "indptr"):
+                np.save(os.path.join(out_dir, f"{file}.{part}.npy"), getattr(value, part))
+            entries[key] = {"type": "csr", "shape": list(value.shape)}
+        elif isinstance(value, np.ndarray):
+            np.save(os.path.join(out_dir, f"{file}.npy"), np.ascontiguousarray(value))
+            entries[key] = {"type": "array"}
+        elif isinstance(value, (pd.DataFrame, pd.Series)):
+            raise TypeError(f"{key}: DataFrames are not memory-mappable; fit with sparse=True")
+        elif isinstance(value, np.generic):
+            entries[key] = {"type": "value", "value": value.item()}
+        elif isinstance(value, tuple):
+            entries[key] = {"type": "tuple", "value": [v.item() if isinstance(v, np.generic) else v for v in value]}
+        else:
+            json.dumps(value)   # scalars / lists of scalars only; anything else fails here
+            entries[key] = {"type": "value", "value": value}
+
+
+def _load_entry(path: str, key: str, entry: dict, mmap_mode: Optional[str]):
+    file = os.path.join(path, key.replace("/", "."))
+    if entry["type"] == "array":
+        return np.load(f"{file}.npy", mmap_mode=mmap_mode)
+    if entry["type"] == "csr":
+        data, indices, indptr = (np.load(f"{file}.{part}.npy", mmap_mode=mmap_mode) for part in ("data", "indices", "indptr"))
+        return sp.csr_matrix((data, indices, indptr), shape=tuple(entry["shape"]), copy=False)
+    if entry["type"] == "dict":
+        return {}
+    if entry["type"] == "tuple":
+        return tuple(entry["value"])
+    return entry["value"]
+
+
 # =========================
 # MAIN: Q3 Demo + Q4 Eval
 # =========================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommender System — Q3 & Q4")
+    parser.add_argument("--sparse", action="store_true", help="use the CSR backend instead of dense DataFrames")
+    parser.add_argument("--item-index-dir", default=None, help="write the item neighbour index as shareable .npy memmaps")
+    parser.add_argument("--lsh", action="store_true", help="approximate (LSH) user/item neighbours instead of exact cosine")
+    parser.add_argument("--mf", action="store_true", help="also fit and evaluate matrix factorization (ALS) in Q4")
+    parser.add_argument("--incremental", action="store_true",
+                        help="fold 100 test ratings into a fitted model with add_ratings and compare with a refit")
+    parser.add_argument("--save-model", default=None, help="save the fitted recommender here as memory-mappable .npy files")
+    parser.add_argument("--profile", default=None, metavar="REPORT.json",
+                        help="record wall/CPU time, peak RSS and sizes per stage and write them here")
+    parser.add_argument("--cprofile-dir", default=None, help="with --profile: also dump one cProfile file per stage here")
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(cprofile_dir=args.cprofile_dir)
+
     # --- Load ratings (MovieLens-friendly) ---
     ratings = load_and_normalize_ratings("ratings.csv")
     print("Loaded ratings columns:", list(ratings.columns))
     print(ratings.head())
 
     # Q3(a) Build user–item matrix
-    user_item_matrix = build_user_item_matrix(ratings)
-    print("\nUser–Item matrix shape:", user_item_matrix.shape)
+    user_item_matrix = build_user_item_matrix(ratings, sparse=args.sparse)
+    if args.sparse:
+        user_ids, movie_ids = user_item_matrix["user_ids"], user_item_matrix["movie_ids"]
+        print("\nUser–Item matrix shape:", user_item_matrix["matrix"].shape, f"(CSR, nnz={user_item_matrix['matrix'].nnz})")
+    else:
+        user_ids, movie_ids = user_item_matrix.index, user_item_matrix.columns
+        print("\nUser–Item matrix shape:", user_item_matrix.shape)
 
     # Q3(b) Sparsity
     sparsity = calc_sparsity(user_item_matrix)
     print(f"Sparsity: {sparsity:.2%}  (higher = emptier matrix; typical for CF)")
 
     # Build similarities once for Q3(c) & Q3(d)
-    user_sim_df, item_sim_df = build_similarity_matrices(user_item_matrix)
+    # (top-K neighbour lists instead of full user–user / item–item matrices)
+    lsh = {} if args.lsh else None   # exact below LSH_MIN_ROWS users / movies, i.e. on ratings.csv itself
+    neighbour_index = build_neighbour_index(user_item_matrix, n_neighbors=50, lsh=lsh)
+    item_sim_df = build_item_neighbour_index(user_item_matrix, n_neighbors=50, out_dir=args.item_index_dir, lsh=lsh)
 
     # Q3(c) User-based KNN recs for an example existing user
     try:
-        example_user = int(user_item_matrix.index[0])
+        example_user = int(user_ids[0])
         recs_user = recommend_movies_knn(
             user_item_matrix=user_item_matrix,
-            user_sim_df=user_sim_df,
+            user_sim_df=neighbour_index,
             user_id=example_user,
             k=5,
             top_n=5,
@@ -328,9 +1797,14 @@ if __name__ == "__main__":
     except Exception as e:
         print("\nQ3(c) KNN Recommendations skipped:", e)
 
+    # Same Top-5 for every user in one batch call (what a nightly precompute exports)
+    t0 = time.perf_counter()
+    all_ids, all_scores = recommend_movies_knn_batch(user_item_matrix, neighbour_index, user_ids, k=5, top_n=5)
+    print(f"Batch Top-5 for all {len(user_ids)} users: ids/scores {all_ids.shape} in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
     # Q3(d) Cold-start handling
     # Case A: New user with SOME ratings (use first movie as a seed example)
-    seed_movies = [int(user_item_matrix.columns[0])] if user_item_matrix.shape[1] > 0 else []
+    seed_movies = [int(movie_ids[0])] if len(movie_ids) > 0 else []
     recs_warm = recommend_for_new_user(
         ratings=ratings,
         item_sim_df=item_sim_df,
@@ -356,28 +1830,89 @@ if __name__ == "__main__":
     train_df, test_df = make_train_test(ratings, test_size=0.2, random_state=42)
     print(f"\nSplit: train={len(train_df)} rows, test={len(test_df)} rows")
 
-    MAX_EVAL_ROWS = 5000  # set to None for full test
+    MAX_EVAL_ROWS = None  # optional: an int samples the test set (no longer needed for speed)
 
     # Q4a: Collaborative Filtering (User-KNN)
-    user_knn_model = fit_user_knn_predictor(train_df)
+    t0 = time.perf_counter()
+    user_knn_model = fit_user_knn_predictor(train_df, sparse=args.sparse, lsh=lsh)
+    fit_seconds = {"User-KNN": time.perf_counter() - t0}
 
     def _predict_user_knn(u, i):
-        return predict_user_knn(user_knn_model, user_id=u, movie_id=i, k=5, weighted=True)
+        return predict_user_knn_batch(user_knn_model, user_ids=u, movie_ids=i, k=5, weighted=True)
 
     print("\nEvaluating Collaborative Filtering (User-KNN):")
-    evaluate_predictor(test_df, _predict_user_knn, max_rows=MAX_EVAL_ROWS, name="User-KNN")
+    t0 = time.perf_counter()
+    results = {"User-KNN": evaluate_predictor(test_df, _predict_user_knn, max_rows=MAX_EVAL_ROWS, name="User-KNN", batch=True)}
+    eval_seconds = {"User-KNN": time.perf_counter() - t0}
 
     # Q4a: Popularity Baseline (no content features needed)
     # Predict with the same Bayesian-style popularity score used earlier,
     # evaluated as a proxy rating for test rows.
-    by_movie_train = train_df.groupby("movie_id")["rating"].agg(["mean", "count"])
-    C = by_movie_train["count"].median() if len(by_movie_train) else 0
-    m = train_df["rating"].mean() if len(train_df) else 0
-    by_movie_train["score"] = (C * m + by_movie_train["mean"] * by_movie_train["count"]) / (C + by_movie_train["count"])
-    movie_pop_score = by_movie_train["score"]  # Series: movie_id -> score
+    t0 = time.perf_counter()
+    popularity_model = fit_popularity_predictor(train_df)
+    fit_seconds["Popularity Baseline"] = time.perf_counter() - t0
 
     def _predict_popularity(u, i):
-        return float(movie_pop_score.loc[i]) if i in movie_pop_score.index else None
+        return predict_popularity_batch(popularity_model, user_ids=u, movie_ids=i)
 
     print("\nEvaluating Popularity Baseline:")
-    evaluate_predictor(test_df, _predict_popularity, max_rows=MAX_EVAL_ROWS, name="Popularity Baseline")
\ No newline at end of file
+    t0 = time.perf_counter()
+    results["Popularity Baseline"] = evaluate_predictor(test_df, _predict_popularity, max_rows=MAX_EVAL_ROWS,
+                                                        name="Popularity Baseline", batch=True)
+    eval_seconds["Popularity Baseline"] = time.perf_counter() - t0
+
+    # Matrix factorization (ALS): one dot product per prediction
+    if args.mf:
+        t0 = time.perf_counter()
+        mf_model = fit_mf_predictor(train_df)
+        fit_seconds["Matrix Factorization"] = time.perf_counter() - t0
+
+        def _predict_mf(u, i):
+            return predict_mf_batch(mf_model, user_ids=u, movie_ids=i)
+
+        print("\nEvaluating Matrix Factorization (ALS):")
+        t0 = time.perf_counter()
+        results["Matrix Factorization"] = evaluate_predictor(test_df, _predict_mf, max_rows=MAX_EVAL_ROWS,
+                                                             name="Matrix Factorization", batch=True)
+        eval_seconds["Matrix Factorization"] = time.perf_counter() - t0
+
+    n_eval = len(test_df) if MAX_EVAL_ROWS is None else min(MAX_EVAL_ROWS, len(test_df))
+    print(f"\n{'model':<22} {'fit s':>7} {'predictions/s':>14} {'RMSE':>7} {'coverage':>9}")
+    for name, res in results.items():
+        if res is not None:
+            print(f"{name:<22} {fit_seconds[name]:>7.2f} {n_eval / eval_seconds[name]:>14,.0f} "
+                  f"{res['rmse']:>7.4f} {res['coverage']:>9.2%}")
+
+    # ------------------
+    # Incremental ingestion: fold a few TEST ratings into the fitted model vs a full refit
+    # ------------------
+    if args.incremental:
+        recommender = fit_recommender(train_df)
+        new_ratings = test_df.head(100)
+        t0 = time.perf_counter()
+        changed = add_ratings(recommender, new_ratings)
+        t1 = time.perf_counter()
+        refit = fit_recommender(pd.concat([train_df, new_ratings], ignore_index=True))
+        t2 = time.perf_counter()
+        same = all(np.array_equal(recommender[name][part], refit[name][part])
+                   for name in ("neighbour_index", "item_index") for part in ("ids", "neighbours", "weights"))
+        same = same and np.allclose(recommender["popularity"]["scores"], refit["popularity"]["scores"])
+        print(f"\nadd_ratings: {len(new_ratings)} ratings in {(t1 - t0) * 1000:.0f} ms "
+              f"(full refit {(t2 - t1) * 1000:.0f} ms); {len(changed['neighbour_users'])} of "
+              f"{len(recommender['neighbour_index']['ids'])} users' neighbour lists changed; matches refit: {same}")
+
+    # ------------------
+    # Persist the fitted model: later processes memory-map it instead of refitting
+    # ------------------
+    if args.save_model:
+        save_model(fit_recommender(ratings), args.save_model)
+        t0 = time.perf_counter()
+        load_model(args.save_model)
+        print(f"\nSaved model to {args.save_model}; reopened (memory-mapped) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    if args.profile:
+        write_profiling_report(args.profile)
+        print(f"\n{'stage':<28} {'calls':>6} {'wall s':>8} {'cpu s':>8} {'peak RSS MB':>12}")
+        for name, rec in profiling_report()["stages"].items():
+            print(f"{name:<28} {rec['calls']:>6} {rec['wall_s']:>8.3f} {rec['cpu_s']:>8.3f} {rec['peak_rss_mb'] or 0:>12.1f}")
+        print(f"Profile report written to {args.profile}")
@@ -0,0 +1,104 @@
+"""
+Seeded synthetic ratings in the shape of MovieLens, for benchmarks at sizes ratings.csv cannot reach.
+
+Popularity is Zipf-like, taste follows a few preferred genres per user, and ratings come from
+latent factors on the half-star scale, so neighbour structure, sparsity and timings behave
+like the real data. ann_benchmark.py and benchmark_suite.py generate their inputs here.
+
+Run:
+    python3 synthetic_ratings.py ratings_1m.csv --users 16000 --items 10000 --ratings-per-user 60
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# ==========================================================
+# SYNTHETIC MOVIELENS-STYLE RATINGS
+# ==========================================================
+
+def make_synthetic_ratings(
+    n_users: int,
+    n_items: int,
+    ratings_per_user: float = 40,
+    n_genres: int = 18,
+    n_factors: int = 8,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Seeded ratings table with the columns of ratings.csv (userId, movieId, rating, timestamp),
+    shaped like MovieLens so timings and recalls transfer:
+      - item popularity is Zipf-like (a few blockbusters, a long tail),
+      - each item has one of n_genres genres and each user prefers a few of them, so
+        users with similar taste rate overlapping items (real neighbours exist),
+      - user activity is lognormal around ratings_per_user (at least 5 ratings each),
+      - ratings come from latent user/item factors, rounded to the 0.5..5.0 half-star scale,
+      - each user has a block of consecutive timestamps.
+    """
+    rng = np.random.default_rng(seed)
+
+    popularity = 1.0 / np.arange(1, n_items + 1) ** 0.9
+    popularity = popularity[rng.permutation(n_items)]
+    genre = rng.integers(0, n_genres, n_items)
+    preference = rng.dirichlet(np.full(n_genres, 0.3), n_users)
+
+    counts = np.clip(rng.lognormal(np.log(ratings_per_user), 0.8, n_users), 5, n_items).astype(np.int64)
+    users = np.repeat(np.arange(n_users), counts)
+
+    # genre from the user's preference, then item within that genre by popularity
+    # (draws are with replacement; repeats of the same (user, item) cell are dropped below)
+    # one searchsorted over all users' cumulative preferences, row u shifted by u, instead of
+    # a (ratings, genres) comparison (several GB at 25M ratings)
+    cum_pref = np.cumsum(preference, axis=1) + np.arange(n_users)[:, None]
+    picked_genre = np.searchsorted(cum_pref.ravel(), users + rng.random(len(users))) - users * n_genres
+    picked_genre = np.clip(picked_genre, 0, n_genres - 1)
+    by_genre = np.argsort(genre, kind="stable")
+    genre_start = np.searchsorted(genre[by_genre], np.arange(n_genres + 1))
+    cum_pop = np.cumsum(popularity[by_genre])
+    lo = np.concatenate([[0.0], cum_pop])[genre_start[picked_genre]]
+    hi = np.concatenate([[0.0], cum_pop])[genre_start[picked_genre + 1]]
+    slot = np.searchsorted(cum_pop, lo + rng.random(len(users)) * (hi - lo), side="right")
+    slot = np.clip(slot, genre_start[picked_genre], np.maximum(genre_start[picked_genre + 1] - 1, 0))
+    items = by_genre[slot]
+
+    cells = np.unique(users * np.int64(n_items) + items)
+    users, items = cells // n_items, cells % n_items
+
+    user_f = rng.standard_normal((n_users, n_factors)).astype(np.float32)
+    item_f = rng.standard_normal((n_items, n_factors)).astype(np.float32)
+    raw = 3.5 + 0.6 * np.einsum("ij,ij->i", user_f[users], item_f[items]) / np.sqrt(n_factors)
+    raw += 0.5 * rng.standard_normal(len(users))
+    rating = np.clip(np.round(raw * 2) / 2, 0.5, 5.0)
+
+    start = rng.integers(1_000_000_000, 1_500_000_000, n_users)
+    timestamp = start[users] + rng.integers(0, 86_400 * 365, len(users))
+
+    return pd.DataFrame(
+        {
+            "userId": (users + 1).astype(np.int32),
+            "movieId": (items + 1).astype(np.int32),
+            "rating": rating.astype(np.float32),
+            "timestamp": timestamp.astype(np.int64),
+        }
+    )
+
+
+def write_synthetic_ratings(path: str, n_users: int, n_items: int, seed: int = 0, **kwargs) -> str:
+    """Write make_synthetic_ratings(...) as a ratings.csv-style file; returns the path."""
+    make_synthetic_ratings(n_users, n_items, seed=seed, **kwargs).to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic MovieLens-style ratings.csv")
+    parser.add_argument("path")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--items", type=int, default=5_000)
+    parser.add_argument("--ratings-per-user", type=float, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_synthetic_ratings(args.path, args.users, args.items, seed=args.seed, ratings_per_user=args.ratings_per_user)
+    print(f"Wrote {args.path}")
@@ -0,0 +1,38 @@
+"""
+Tests for benchmark_suite.py's baseline comparison (no benchmarks are run).
+
+Run:
+    python3 -m pytest test_benchmark_suite.py
+"""
+
+import pytest
+
+import benchmark_suite as bs
+
+
+def results_with(wall_s, **machine):
+    return {
+        "machine": {**bs.machine_info(), **machine},
+        "scales": {"100k": {"stages": {"load": {"wall_s": wall_s}, "similarity": {"wall_s": 2.0}}}},
+    }
+
+
+def test_compare_flags_slow_stages_on_the_same_machine():
+    regressions = bs.compare_to_baseline(results_with(1.5), results_with(1.0), tolerance=0.25)
+    assert [(r["scale"], r["stage"]) for r in regressions] == [("100k", "load")]
+    assert regressions[0]["ratio"] == pytest.approx(1.5)
+    assert bs.compare_to_baseline(results_with(1.2), results_with(1.0), tolerance=0.25) == []
+
+
+def test_compare_skips_a_baseline_from_another_machine():
+    baseline = results_with(1.0, cpus=64, numpy="0.0")
+    assert bs.machine_differences(results_with(5.0), baseline).keys() == {"cpus", "numpy"}
+    with pytest.warns(UserWarning, match="different machine"):
+        assert bs.compare_to_baseline(results_with(5.0), baseline) == []
+
+
+def test_compare_ignores_the_platform_string():
+    # kernel builds differ between otherwise identical hosts; only cpus/python/numpy must match
+    baseline = results_with(1.0, platform="Linux-0.0-other-kernel")
+    assert bs.machine_differences(results_with(1.5), baseline) == {}
+    assert len(bs.compare_to_baseline(results_with(1.5), baseline)) == 1
@@ -0,0 +1,75 @@
+"""
+Tests for cross_validation.py on small synthetic ratings.
+
+Run:
+    python3 -m pytest test_cross_validation.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cross_validation as cv
+from synthetic_ratings import make_synthetic_ratings
+
+
+def synthetic(n_users=120, n_movies=60, seed=4):
+    return make_synthetic_ratings(n_users, n_movies, ratings_per_user=12, seed=seed).rename(
+        columns={"userId": "user_id", "movieId": "movie_id"})
+
+
+# ==========================================================
+# Fold assignment
+# ==========================================================
+
+@pytest.mark.parametrize("n_rows, n_folds", [(1000, 5), (1001, 7), (300, 200)])
+def test_kfold_folds_partition_the_rows(n_rows, n_folds):
+    fold = cv.kfold_assignment(n_rows, n_folds, seed=1)
+    sizes = np.bincount(fold, minlength=n_folds)
+    assert len(fold) == n_rows and fold.min() == 0 and fold.max() == n_folds - 1   # > 127 folds too
+    assert sizes.sum() == n_rows and sizes.max() - sizes.min() <= 1
+    assert np.array_equal(fold, cv.kfold_assignment(n_rows, n_folds, seed=1))
+    assert not np.array_equal(fold, cv.kfold_assignment(n_rows, n_folds, seed=2))
+
+
+@pytest.mark.parametrize("n_folds", [0, 1, 11])
+def test_kfold_rejects_bad_fold_counts(n_folds):
+    with pytest.raises(ValueError, match="n_folds"):
+        cv.kfold_assignment(10, n_folds)
+
+
+def test_leave_last_out_holds_out_each_users_latest_rating():
+    ratings = pd.DataFrame({
+        "user_id":   [2, 1, 2, 1, 3, 2, 1],
+        "movie_id":  [1, 2, 3, 4, 5, 6, 7],
+        "timestamp": [30, 10, 50, 40, 99, 20, 15],
+    })
+    fold = cv.leave_last_out_assignment(ratings)
+    # user 1's latest is row 3 (t=40), user 2's is row 2 (t=50); user 3 has one rating and stays in train
+    assert fold.tolist() == [-1, -1, 0, 0, -1, -1, -1]
+
+
+# ==========================================================
+# Cross-validation
+# ==========================================================
+
+def test_one_worker_and_several_workers_agree():
+    ratings = synthetic()
+    serial = cv.cross_validate(ratings, n_folds=3, n_workers=1)
+    parallel = cv.cross_validate(ratings, n_folds=3, n_workers=3)
+
+    a, b = serial["folds"].drop(columns="seconds"), parallel["folds"].drop(columns="seconds")
+    assert list(a.columns) == cv.FOLD_COLUMNS[:-1] and len(a) == 6
+    pd.testing.assert_frame_equal(a, b)
+    assert a.groupby("model")["n"].sum().max() <= len(ratings)
+    assert list(serial["summary"].index) == ["User-KNN", "Popularity Baseline"]
+
+
+def test_folds_without_predictions_are_reported_as_nan():
+    # every user rates two movies nobody else rated: the held-out movie is never in train
+    ratings = pd.DataFrame({"user_id": np.repeat(np.arange(1, 21), 2), "movie_id": np.arange(1, 41),
+                            "rating": 4.0, "timestamp": np.tile([1, 2], 20)})
+    result = cv.cross_validate(ratings, scheme="leave-last-out", n_workers=1)
+
+    assert result["folds"][["mse", "rmse", "coverage", "n"]].isna().all().all()
+    assert result["summary"].isna().all().all()
@@ -0,0 +1,91 @@
+"""
+Tests for recommender_service.py (Flask test client, small in-memory model).
+
+Run:
+    python3 -m pytest test_recommender_service.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import recommender_service
+from recommender_system import add_ratings, fit_recommender, has_user, user_position
+from test_recommender_system import tied_ratings
+
+
+@pytest.fixture
+def client():
+    model = fit_recommender(tied_ratings(), n_neighbors=10, item_neighbors=10)
+    return recommender_service.create_app(model, cache_size=100).test_client()
+
+
+@pytest.mark.parametrize("query", ["n=0", "n=-3", "n=abc", "n=2.5", "k=0", "k=x"])
+def test_user_recommendations_rejects_bad_counts(client, query):
+    response = client.get(f"/recommendations/1?{query}")
+    assert response.status_code == 400
+    assert "positive integers" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("n", [0, -1, "abc", 2.5, True, [3]])
+def test_new_user_rejects_bad_n(client, n):
+    response = client.post("/recommendations/new-user", json={"rated_movies": [1], "n": n})
+    assert response.status_code == 400
+
+
+def test_valid_requests_are_cached(client):
+    first = client.get("/recommendations/1?n=3&k=4").get_json()
+    second = client.get("/recommendations/1?n=3&k=4").get_json()
+    assert len(first["items"]) == 3 and not first["cached"] and second["cached"]
+    assert client.post("/recommendations/new-user", json={"rated_movies": [1, 2]}).status_code == 200
+
+
+def test_result_from_a_replaced_model_is_not_cached(client, monkeypatch):
+    """A rating batch lands while a miss is being computed: that result must not be cached."""
+    original = recommender_service.recommend_movies_knn
+
+    def slow_recommend(*args, **kwargs):
+        monkeypatch.setattr(recommender_service, "recommend_movies_knn", original)
+        assert client.post("/ratings", json={"ratings": [{"user_id": 1, "movie_id": 2, "rating": 5}]}).status_code == 200
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(recommender_service, "recommend_movies_knn", slow_recommend)
+    assert client.get("/recommendations/3").get_json()["cached"] is False
+    assert client.get("/recommendations/3").get_json()["cached"] is False   # recomputed on the new model
+    assert client.get("/recommendations/3").get_json()["cached"] is True
+    assert client.get("/stats").get_json()["model"]["version"] == 1
+
+
+def test_ratings_evict_only_cold_start_lists_that_can_change():
+    model = fit_recommender(tied_ratings(), n_neighbors=10, item_neighbors=10)
+    client = recommender_service.create_app(model, cache_size=100).test_client()
+    movies = model["item_index"]["ids"].tolist()
+    for movie in movies + [None]:
+        client.post("/recommendations/new-user", json={"rated_movies": [movie] if movie else []})
+
+    batch = [{"user_id": 1, "movie_id": 2, "rating": 5}]
+    assert client.post("/ratings", json={"ratings": batch}).status_code == 200
+
+    updated = dict(model)
+    add_ratings(updated, pd.DataFrame(batch))
+    after = updated["item_index"]
+    moved = [m for i, m in enumerate(movies)
+             if not (np.array_equal(after["neighbours"][i], model["item_index"]["neighbours"][i])
+                     and np.array_equal(after["weights"][i], model["item_index"]["weights"][i]))]
+    cached = [m for m in movies if client.post("/recommendations/new-user", json={"rated_movies": [m]}).get_json()["cached"]]
+    assert 2 in moved and not set(moved) & set(cached)
+    assert 0 < len(cached) < len(movies)
+    assert client.post("/recommendations/new-user", json={"rated_movies": []}).get_json()["cached"] is False
+
+    # whatever was kept matches a fresh computation on the updated model
+    fresh = recommender_service.create_app(updated, cache_size=100).test_client()
+    for movie in cached:
+        body = {"rated_movies": [movie]}
+        assert (client.post("/recommendations/new-user", json=body).get_json()["items"]
+                == fresh.post("/recommendations/new-user", json=body).get_json()["items"])
+
+
+def test_has_user_and_user_position():
+    model = fit_recommender(tied_ratings(), n_neighbors=10, item_neighbors=10)
+    assert has_user(model, 1) and not has_user(model, 10**6)
+    assert user_position(model, [1, 10**6, 60]).tolist() == [0, -1, 59]
@@ -0,0 +1,380 @@
+"""
+Tests for recommender_system.py.
+
+Run:
+    python3 -m pytest test_recommender_system.py
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import recommender_system as rs
+
+
+def write_csv(path, rows, header="userId,movieId,rating,timestamp"):
+    path.write_text(header + "\n" + "\n".join(",".join(str(v) for v in row) for row in rows) + "\n")
+    return str(path)
+
+
+# ==========================================================
+# Data loading
+# ==========================================================
+
+def test_load_narrows_every_chunk(tmp_path):
+    rows = [(1, 10, 4.0, 100), (2, 11, 3.5, 101), (3, "x", 2.0, 102), (4, 12, 5.0, 103), (5, 13, 1.0, 104)]
+    path = write_csv(tmp_path / "ratings.csv", rows)
+
+    ratings = rs.load_and_normalize_ratings(path, chunksize=2, cache=False, include_timestamp=True)
+
+    assert list(ratings.columns) == ["user_id", "movie_id", "rating", "timestamp"]
+    assert ratings.dtypes.to_dict() == {"user_id": np.int32, "movie_id": np.int32,
+                                        "rating": np.float32, "timestamp": np.int64}
+    assert ratings["user_id"].tolist() == [1, 2, 4, 5]   # the unparseable movieId row is dropped
+    assert ratings["rating"].tolist() == [4.0, 3.5, 5.0, 1.0]
+
+
+def test_load_keeps_int64_ids_when_one_chunk_overflows(tmp_path):
+    path = write_csv(tmp_path / "ratings.csv", [(1, 10, 4.0, 0), (2, 2**40, 3.0, 0)])
+    ratings = rs.load_and_normalize_ratings(path, chunksize=1, cache=False)
+    assert ratings["user_id"].dtype == np.int32
+    assert ratings["movie_id"].dtype == np.int64
+    assert ratings["movie_id"].tolist() == [10, 2**40]
+
+
+# ==========================================================
+# Profiling
+# ==========================================================
+
+@pytest.fixture
+def profiling():
+    rs.enable_profiling()
+    yield
+    rs.disable_profiling()
+
+
+@rs.profile_stage("double")
+def double(x):
+    return np.repeat(x, 2)
+
+
+def test_profile_stage_is_a_no_op_when_off():
+    rs.disable_profiling()
+    assert double(np.arange(3)).tolist() == [0, 0, 1, 1, 2, 2]
+    with rs.profile_stage("block") as stage:
+        pass
+    assert stage.result is None
+    assert rs.profiling_report() == {"stages": {}}
+
+
+def test_profile_stage_records_time_and_peak_rss(profiling):
+    for _ in range(3):
+        double(np.arange(1000))
+    with rs.profile_stage("block"):
+        big = np.ones(2**23)   # 64 MiB, touched
+        time.sleep(0.01)
+    del big
+
+    report = rs.profiling_report()
+    assert set(report["stages"]) == {"double", "block"}
+    rec = report["stages"]["double"]
+    assert rec["calls"] == 3 and rec["wall_s"] >= 0 and rec["cpu_s"] >= 0
+    assert rec["size"] == {"shape": [2000], "mb": pytest.approx(2000 * 8 / 2**20)}
+    block = report["stages"]["block"]
+    assert block["calls"] == 1 and block["wall_s"] >= 0.01
+    assert block["peak_rss_mb"] == pytest.approx(rs.peak_rss_mb(), rel=0.5)
+    assert block["peak_rss_growth_mb"] > 40
+    assert report["peak_rss_mb"] == pytest.approx(block["peak_rss_mb"], rel=0.5)
+
+
+# ==========================================================
+# Dense vs sparse backends
+# ==========================================================
+
+def synthetic(n_users, n_movies, per_user=15, seed=3):
+    from synthetic_ratings import make_synthetic_ratings
+
+    return make_synthetic_ratings(n_users, n_movies, ratings_per_user=per_user, seed=seed).rename(
+        columns={"userId": "user_id", "movieId": "movie_id"})[["user_id", "movie_id", "rating"]]
+
+
+def backend_ratings(name):
+    return synthetic(200, 100) if name == "synthetic" else tied_ratings()
+
+
+def both_backends(ratings):
+    dense, sparse = rs.build_user_item_matrix(ratings), rs.build_user_item_matrix(ratings, sparse=True)
+    return (dense, *rs.build_similarity_matrices(dense)), (sparse, *rs.build_similarity_matrices(sparse))
+
+
+@pytest.mark.parametrize("data", ["synthetic", "ties"])
+@pytest.mark.parametrize("k, top_n, weighted", [(5, 5, True), (20, 10, True), (7, 3, False)])
+def test_sparse_recommendations_match_dense(data, k, top_n, weighted):
+    (dense, user_sim, item_sim), (sparse, user_sim_s, item_sim_s) = both_backends(backend_ratings(data))
+    for user_id in dense.index[::3]:
+        a = rs.recommend_movies_knn(dense, user_sim, user_id, k=k, top_n=top_n, weighted=weighted)
+        b = rs.recommend_movies_knn(sparse, user_sim_s, user_id, k=k, top_n=top_n, weighted=weighted)
+        assert a.index.tolist() == b.index.tolist(), user_id
+        np.testing.assert_allclose(a.to_numpy(), b.to_numpy(), rtol=1e-12)
+    for seeds in ([int(dense.columns[0])], dense.columns[[1, 5, 9]].tolist()):
+        a = rs.item_based_similar_recs(item_sim, seeds, top_n=top_n)
+        b = rs.item_based_similar_recs(item_sim_s, seeds, top_n=top_n)
+        assert a.index.tolist() == b.index.tolist(), seeds
+        np.testing.assert_allclose(a.to_numpy(), b.to_numpy(), rtol=1e-12)
+
+
+@pytest.mark.parametrize("data", ["synthetic", "ties"])
+def test_sparse_similarities_and_neighbour_index_match_dense(data):
+    (dense, user_sim, _), (sparse, user_sim_s, _) = both_backends(backend_ratings(data))
+    assert np.array_equal(sparse["user_ids"], dense.index) and np.array_equal(sparse["movie_ids"], dense.columns)
+    np.testing.assert_allclose(user_sim_s["matrix"].toarray(), user_sim.to_numpy(), atol=1e-12)
+
+    a = rs.build_neighbour_index(dense, n_neighbors=10)
+    b = rs.build_neighbour_index(sparse, n_neighbors=10)
+    assert np.array_equal(a["ids"], b["ids"]) and np.array_equal(a["neighbours"], b["neighbours"])
+    np.testing.assert_allclose(a["weights"], b["weights"], rtol=1e-6)
+    a = rs.build_item_neighbour_index(dense, n_neighbors=10)
+    b = rs.build_item_neighbour_index(sparse, n_neighbors=10)
+    assert np.array_equal(a["neighbours"], b["neighbours"])
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+@pytest.mark.parametrize("k, weighted", [(5, True), (10, False)])
+def test_predict_user_knn_batch_matches_row_by_row(sparse, k, weighted):
+    train, test = rs.make_train_test(synthetic(150, 80))
+    test = pd.concat([test, pd.DataFrame({"user_id": [10**6, 1], "movie_id": [1, 10**6]})], ignore_index=True)
+    model = rs.fit_user_knn_predictor(train, sparse=sparse, n_neighbors=10)
+    dense = rs.build_user_item_matrix(train)
+    index = model["neighbour_index"]
+
+    preds, covered = rs.predict_user_knn_batch(model, test["user_id"], test["movie_id"], k=k, weighted=weighted)
+    for p, c, user_id, movie_id in zip(preds, covered, test["user_id"], test["movie_id"]):
+        single = rs.predict_user_knn(model, user_id, movie_id, k=k, weighted=weighted)
+        assert (single is None) == (not c) and (single is None or single == p), (user_id, movie_id)
+        if single is None:
+            continue
+        # and both agree with the neighbours' ratings read straight off the dense matrix
+        u, m = dense.index.get_loc(user_id), dense.columns.get_loc(movie_id)
+        r, w = dense.to_numpy()[index["neighbours"][u, :k], m], index["weights"][u, :k].astype(np.float64)
+        rated = ~np.isnan(r)
+        expected = (w[rated] * r[rated]).sum() / w[rated].sum() if weighted else r[rated].mean()
+        assert single == pytest.approx(expected, rel=1e-12)
+    assert covered.sum() > len(test) // 2 and not covered[-2:].any()
+
+
+@pytest.mark.parametrize("data", ["synthetic", "ties"])
+def test_tiled_item_index_on_disk_matches_in_memory(data, tmp_path):
+    uim = rs.build_user_item_matrix(backend_ratings(data), sparse=True)
+    in_memory = rs.build_item_neighbour_index(uim, n_neighbors=10)
+    # ~5 KB tiles: one to five movies per block, written straight into .npy memmaps
+    tiled = rs.build_item_neighbour_index(uim, n_neighbors=10, memory_budget_mb=0.005, out_dir=str(tmp_path))
+
+    assert isinstance(tiled["neighbours"], np.memmap)
+    for part in ("ids", "neighbours", "weights"):
+        assert np.array_equal(tiled[part], in_memory[part]), part
+    assert np.array_equal(rs.load_neighbour_index(str(tmp_path), mmap_mode=None)["neighbours"], in_memory["neighbours"])
+
+    full = rs.build_similarity_matrices(rs.build_user_item_matrix(backend_ratings(data)))[1].to_numpy()
+    rows = np.arange(len(full))[:, None]
+    np.testing.assert_allclose(tiled["weights"], full[rows, tiled["neighbours"]], atol=1e-6)
+
+
+# ==========================================================
+# Incremental ingestion vs a full refit
+# ==========================================================
+
+def tied_ratings(n_users=60, n_movies=40, per_user=6, seed=0):
+    """Few whole-star ratings per user: many users/movies have identical cosines (ties)."""
+    rng = np.random.default_rng(seed)
+    rows = [(u, m, float(rng.integers(1, 6)))
+            for u in range(1, n_users + 1) for m in rng.choice(np.arange(1, n_movies + 1), per_user, replace=False)]
+    return pd.DataFrame(rows, columns=["user_id", "movie_id", "rating"])
+
+
+def assert_matches_refit(model, ratings, n_neighbors, item_neighbors):
+    refit = rs.fit_recommender(ratings, n_neighbors=n_neighbors, item_neighbors=item_neighbors)
+    a, b = model["uim_train"], refit["uim_train"]
+    assert np.array_equal(a["user_ids"], b["user_ids"]) and np.array_equal(a["movie_ids"], b["movie_ids"])
+    assert (a["matrix"] != b["matrix"]).nnz == 0
+    assert np.array_equal(a["matrix"].indices, b["matrix"].indices) and np.array_equal(a["counts"], b["counts"])
+    for name in ("neighbour_index", "item_index"):
+        for part in ("ids", "neighbours", "weights"):
+            assert np.array_equal(model[name][part], refit[name][part]), (name, part)
+    np.testing.assert_allclose(model["user_norms"], refit["user_norms"])
+    np.testing.assert_allclose(model["item_norms"], refit["item_norms"])
+    for part in ("movie_ids", "counts"):
+        assert np.array_equal(model["popularity"][part], refit["popularity"][part])
+    np.testing.assert_allclose(model["popularity"]["scores"], refit["popularity"]["scores"])
+
+
+def test_add_ratings_matches_refit_with_ties():
+    ratings = tied_ratings()
+    base, batch = ratings.iloc[:300], ratings.iloc[300:]
+    model = rs.fit_recommender(base, n_neighbors=10, item_neighbors=10)
+    rs.add_ratings(model, batch)
+    assert_matches_refit(model, ratings, 10, 10)
+
+
+def test_add_ratings_new_ids_repeats_and_several_batches():
+    ratings = tied_ratings(seed=1)
+    model = rs.fit_recommender(ratings, n_neighbors=10, item_neighbors=10)
+    batches = [
+        pd.DataFrame({"user_id": [61, 61, 62], "movie_id": [1, 41, 41], "rating": [5.0, 4.0, 4.0]}),  # new user + movie
+        ratings.iloc[:20].assign(rating=lambda d: 6 - d["rating"]),                                 # re-rated cells
+        pd.DataFrame({"user_id": [3], "movie_id": [7], "rating": [2.0]}),
+    ]
+    for batch in batches:
+        rs.add_ratings(model, batch)
+        ratings = pd.concat([ratings, batch], ignore_index=True)
+        assert_matches_refit(model, ratings, 10, 10)
+
+
+def test_add_ratings_grows_capped_k():
+    ratings = tied_ratings(n_users=5, n_movies=8, per_user=3)
+    model = rs.fit_recommender(ratings, n_neighbors=10, item_neighbors=10)   # K capped at 4 users / 7 movies
+    batch = pd.DataFrame({"user_id": [6, 7, 8], "movie_id": [1, 9, 10], "rating": [3.0, 4.0, 5.0]})
+    rs.add_ratings(model, batch)
+    assert_matches_refit(model, pd.concat([ratings, batch], ignore_index=True), 10, 10)
+
+
+def test_add_ratings_matches_refit_on_synthetic_data():
+    ratings = synthetic(300, 200)
+    base, batch = ratings.iloc[:-150], ratings.iloc[-150:]
+    model = rs.fit_recommender(base, n_neighbors=20, item_neighbors=20)
+    rs.add_ratings(model, batch)
+    assert_matches_refit(model, ratings, 20, 20)
+
+    # a small batch moves few lists: exactly the users whose neighbour ids / order differ are reported
+    before = {name: model[name]["neighbours"].copy() for name in ("neighbour_index", "item_index")}
+    small = ratings.iloc[[10, 400, 2000]].assign(rating=lambda d: 6 - d["rating"])
+    changed = rs.add_ratings(model, small)
+    for name, key in (("neighbour_index", "neighbour_users"), ("item_index", "neighbour_movies")):
+        after = model[name]["neighbours"]
+        differs = model[name]["ids"][(after != before[name]).any(axis=1)]
+        assert changed[key].tolist() == differs.tolist(), name
+        assert 0 < len(differs) < len(after) // 2, name
+
+
+# ==========================================================
+# Approximate neighbours
+# ==========================================================
+
+def test_lsh_is_exact_below_min_rows_and_close_above():
+    from synthetic_ratings import make_synthetic_ratings
+
+    ratings = make_synthetic_ratings(600, 300, ratings_per_user=20, seed=2).rename(
+        columns={"userId": "user_id", "movieId": "movie_id"})[["user_id", "movie_id", "rating"]]
+    uim = rs.build_user_item_matrix(ratings, sparse=True)
+    exact = rs.build_neighbour_index(uim, n_neighbors=10)
+
+    gated = rs.build_neighbour_index(uim, n_neighbors=10, lsh={})       # 600 users < LSH_MIN_ROWS
+    assert np.array_equal(gated["neighbours"], exact["neighbours"])
+
+    approx = rs.build_neighbour_index(uim, n_neighbors=10, lsh={"min_rows": 0})
+    hits = sum(len(np.intersect1d(e, a)) for e, a in zip(exact["neighbours"], approx["neighbours"]))
+    assert hits / exact["neighbours"].size > 0.8
+
+# ==========================================================
+# Top-N selection
+# ==========================================================
+
+def test_top_n_pairs_matches_a_full_sort():
+    rng = np.random.default_rng(0)
+    n_rows, top_n = 50, 5
+    rows = rng.integers(0, n_rows, 3000)            # unsorted, some rows with < top_n candidates
+    rows[rows == 7] = 8                              # and one row with none
+    cols = rng.permutation(3000) % 400
+    scores = rng.integers(0, 6, 3000) / 2.0          # heavy ties at every cut-off
+    scores[rng.random(3000) < 0.05] = np.nan
+    col_ids = np.arange(400) * 10
+
+    ids, out = rs._top_n_pairs(rows, cols, scores, n_rows, top_n, col_ids)
+
+    keep = ~np.isnan(scores)
+    for row in range(n_rows):
+        mine = keep & (rows == row)
+        order = np.lexsort((cols[mine], -scores[mine]))[:top_n]
+        expected = col_ids[cols[mine][order]]
+        assert ids[row, :len(expected)].tolist() == expected.tolist()
+        assert (ids[row, len(expected):] == -1).all()
+        np.testing.assert_array_equal(out[row, :len(expected)], scores[mine][order])
+    assert (ids[7] == -1).all() and np.isnan(out[7]).all()
+
+
+@pytest.mark.parametrize("data", ["synthetic", "ties"])
+@pytest.mark.parametrize("block_rows", [1024, 7])
+def test_neighbour_index_matches_a_full_argsort(data, block_rows):
+    dense = rs.build_user_item_matrix(backend_ratings(data))
+    full = np.round(rs.build_similarity_matrices(dense)[0].to_numpy(), 12)
+    index = rs.build_neighbour_index(dense, n_neighbors=10, block_rows=block_rows)
+
+    positions = np.arange(len(full))
+    for row in positions:
+        others = positions != row
+        order = np.lexsort((positions[others], -full[row, others]))[:10]
+        assert index["neighbours"][row].tolist() == positions[others][order].tolist(), row
+        np.testing.assert_allclose(index["weights"][row], full[row, others][order], atol=1e-6)
+
+
+# ==========================================================
+# Matrix factorization (ALS)
+# ==========================================================
+
+def test_als_reduces_training_loss():
+    ratings = synthetic(200, 100)
+    y = ratings["rating"].to_numpy(dtype=np.float64)
+    losses = []
+    for n_iters in (1, 2, 5, 15):
+        model = rs.fit_mf_predictor(ratings, n_factors=8, n_iters=n_iters)
+        preds, covered = rs.predict_mf_batch(model, ratings["user_id"], ratings["movie_id"])
+        assert covered.all()
+        losses.append(((preds - y) ** 2).mean())
+    assert losses == sorted(losses, reverse=True), losses
+    assert losses[-1] < 0.5 * ((y - y.mean()) ** 2).mean()   # well below the global-mean baseline
+
+
+def test_als_is_seeded():
+    ratings = synthetic(100, 60)
+    a, b = (rs.fit_mf_predictor(ratings, n_factors=8, n_iters=3, seed=7) for _ in range(2))
+    c = rs.fit_mf_predictor(ratings, n_factors=8, n_iters=3, seed=8)
+    for part in ("user_factors", "item_factors", "user_bias", "item_bias"):
+        assert np.array_equal(a[part], b[part]), part
+    assert not np.array_equal(a["user_factors"], c["user_factors"])
+
+    preds, _ = rs.predict_mf_batch(a, ratings["user_id"][:50], ratings["movie_id"][:50])
+    singles = [rs.predict_mf(a, u, m) for u, m in zip(ratings["user_id"][:50], ratings["movie_id"][:50])]
+    np.testing.assert_allclose(preds, singles, rtol=1e-6)
+
+
+# ==========================================================
+# Model persistence
+# ==========================================================
+
+def test_save_model_round_trip_and_replace(tmp_path):
+    model = rs.fit_recommender(tied_ratings(), n_neighbors=10, item_neighbors=10)
+    path = str(tmp_path / "model")
+    rs.save_model(model, path)
+    rs.save_model(model, path)                       # replacing an earlier save is fine
+
+    loaded = rs.load_model(path, mmap_mode=None)
+    for part in ("ids", "neighbours", "weights"):
+        assert np.array_equal(loaded["neighbour_index"][part], model["neighbour_index"][part])
+    assert (loaded["uim_train"]["matrix"] != model["uim_train"]["matrix"]).nnz == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["model"]   # no temp dirs left behind
+
+
+def test_save_model_refuses_to_replace_other_paths(tmp_path):
+    model = rs.fit_recommender(tied_ratings(), n_neighbors=10, item_neighbors=10)
+    unrelated = tmp_path / "data"
+    unrelated.mkdir()
+    (unrelated / "ratings.csv").write_text("keep me")
+    (tmp_path / "notes.txt").write_text("keep me too")
+
+    for target in (unrelated, tmp_path / "notes.txt"):
+        with pytest.raises(FileExistsError):
+            rs.save_model(model, str(target))
+    assert (unrelated / "ratings.csv").read_text() == "keep me"
+    assert (tmp_path / "notes.txt").read_text() == "keep me too"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["data", "notes.txt"]